@@ -57,6 +57,14 @@ class Environment(Protocol):
 
     def execute(self, command: str, cwd: str = "") -> dict[str, str]: ...
 
+    def upload(self, paths: dict[str | Path, str]) -> None:
+        """Copy local files/directories (keys) to paths in the environment (values)."""
+        ...
+
+    def download(self, paths: dict[str, str | Path]) -> None:
+        """Copy files/directories in the environment (keys) to local paths (values)."""
+        ...
+
     def get_template_vars(self) -> dict[str, Any]: ...
 
 
@@ -9,6 +9,15 @@ from pathlib import Path
 from jinja2 import StrictUndefined, Template
 
 from minisweagent import Environment, Model
+from minisweagent.models import GLOBAL_MODEL_STATS
+from minisweagent.models.utils.tokens import TokenEstimator
+
+
+def _get_prompt_tokens(response: dict) -> int | None:
+    """Number of prompt tokens reported in a model response (litellm or TensorZero style)."""
+    extra = response.get("extra") or {}
+    usage = (extra.get("response") or {}).get("usage") or {}
+    return usage.get("prompt_tokens") or extra.get("input_tokens")
 
 
 @dataclass
@@ -31,6 +40,12 @@ class AgentConfig:
     step_limit: int = 0
     cost_limit: float = 3.0
     max_timeout: int = 300
+    context_limit: int = -1
+    """Maximum number of (estimated) prompt tokens. -1: No limit (prompts that are too long are rejected by the
+    provider), 0: The model's context window (if known). Token counts are estimates, so leave some room."""
+    context_compaction: bool = False
+    """Elide the outputs of the oldest observations instead of stopping when the context limit is reached"""
+    elided_output_template: str = "[Output elided to fit into the context window]"
 
 
 class NonTerminatingException(Exception):
@@ -57,6 +72,10 @@ class LimitsExceeded(TerminatingException):
     """Raised when the agent has reached its cost or step limit."""
 
 
+class ContextLimitReached(TerminatingException):
+    """Raised when the message history no longer fits into the model's context window."""
+
+
 class DefaultAgent:
     def __init__(self, model: Model, env: Environment, *, config_class: Callable = AgentConfig, **kwargs):
         self.config = config_class(**kwargs)
@@ -64,6 +83,14 @@ class DefaultAgent:
         self.model = model
         self.env = env
         self.extra_template_vars = {}
+        self._token_estimator: TokenEstimator | None = None
+        self._context_limit: int | None = None
+        self._templates: dict[str, Template] = {}
+        if hasattr(model, "render_template"):
+            # Models that only accept text render the template blocks with the agent's templates
+            model.render_template = self.render_template_block
+        self.trajectory_writer = None
+        """Receives every message as it is added (see `minisweagent.run.utils.save.start_traj_stream`)"""
 
     def get_template_arguments(self, **kwargs) -> dict:
         """Get all template arguments by merging config, env, model, and extra vars."""
@@ -75,7 +102,10 @@ class DefaultAgent:
 
     def add_message(self, role: str, content: str | list[dict], **kwargs):
         """Add a message with either string content or template content blocks."""
-        self.messages.append({"role": role, "content": content, **kwargs})
+        message = {"role": role, "content": content, **kwargs}
+        self.messages.append(message)
+        if self.trajectory_writer is not None:
+            self.trajectory_writer.add_message(message)
 
     def run(self, task: str, **kwargs) -> tuple[str, str]:
         """Run step() until agent is finished. Return exit status & message"""
@@ -104,12 +134,72 @@ class DefaultAgent:
         """Query the model and return the response."""
         if 0 < self.config.step_limit <= self.model.n_calls or 0 < self.config.cost_limit <= self.model.cost:
             raise LimitsExceeded()
+        GLOBAL_MODEL_STATS.check_limits()  # e.g., the time limit, before spending on another call
+        self.check_context_limit()
         response = self.model.query(self.messages)
+        if self._token_estimator is not None and (prompt_tokens := _get_prompt_tokens(response)):
+            self._token_estimator.calibrate(self.messages, prompt_tokens)
         # Store content_blocks if available (for thought block support), otherwise use content
         message_content = response.get("content_blocks", response["content"])
         self.add_message("assistant", content=message_content)
         return response
 
+    def get_context_limit(self) -> int | None:
+        """Maximum number of prompt tokens (None if unknown or disabled)."""
+        if self._context_limit is None and self.config.context_limit >= 0:
+            limit = self.config.context_limit
+            if limit == 0 and hasattr(self.model, "get_context_limit"):
+                limit = self.model.get_context_limit() or 0
+            self._context_limit = limit if limit > 0 else -1
+        return self._context_limit if self._context_limit and self._context_limit > 0 else None
+
+    def render_template_block(self, block: dict) -> str:
+        """Text of a template block, rendered with the template of the same name (e.g., `instance_template`)."""
+        name = block.get("name")
+        if name not in self._templates:
+            template = getattr(self.config, f"{name}_template", None)
+            if not isinstance(template, str):
+                raise ValueError(f"No template for {name!r}")
+            self._templates[name] = Template(template, undefined=StrictUndefined)
+        return self._templates[name].render(**block.get("arguments", {}))
+
+    def count_tokens(self) -> int:
+        """Estimated number of prompt tokens of the current messages."""
+        if self._token_estimator is None:
+            self._token_estimator = TokenEstimator(render_template=self.render_template_block)
+        return self._token_estimator.count(self.messages)
+
+    def check_context_limit(self):
+        """Compact the messages or raise `ContextLimitReached` if they don't fit into the context window."""
+        if (limit := self.get_context_limit()) is None or self.count_tokens() <= limit:
+            return
+        if self.config.context_compaction:
+            for i in range(1, len(self.messages) - 1):
+                if self._elide_observation(i) and self.count_tokens() <= limit:
+                    return
+        raise ContextLimitReached(
+            f"The conversation (~{self.count_tokens()} tokens) does not fit into the context window ({limit} tokens)."
+        )
+
+    def _elide_observation(self, i: int) -> bool:
+        """Replace the output of the observation `self.messages[i]`. Returns False if there is nothing to elide."""
+        message = self.messages[i]
+        if message["role"] != "user" or isinstance(message["content"], str):
+            return False
+        elided = self.config.elided_output_template
+        content = []
+        for block in message["content"]:
+            output = block.get("arguments", {}).get("output") if block.get("name") == "action_observation" else None
+            if isinstance(output, dict) and output.get("output") != elided:
+                arguments = block["arguments"] | {"output": output | {"output": elided}}
+                block = block | {"arguments": arguments}
+            content.append(block)
+        if content == message["content"]:
+            return False
+        # Replace the message instead of modifying it, so that the token estimator notices the change
+        self.messages[i] = message | {"content": content}
+        return True
+
     def get_observation(self, response: dict) -> dict:
         """Execute the action and return the observation."""
         output = self.execute_action(self.parse_action(response))
@@ -133,7 +223,7 @@ class DefaultAgent:
                 # Cap at max_timeout
                 timeout = min(requested_timeout, self.config.max_timeout)
                 # Remove the timeout comment from the action
-                action_text = action_text[timeout_match.end():].strip()
+                action_text = action_text[timeout_match.end() :].strip()
 
             return {"action": action_text, "timeout": timeout, **response}
 
@@ -3,6 +3,7 @@ Extension of the `default.py` agent that uses Textual for an interactive TUI.
 For a simpler version of an interactive UI that does not require threading and more, see `interactive.py`.
 """
 
+import bisect
 import logging
 import os
 import re
@@ -11,17 +12,23 @@ import time
 import traceback
 from collections.abc import Iterable
 from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
 from typing import Literal
 
+from rich.cells import cell_len, chop_cells
+from rich.segment import Segment
 from rich.spinner import Spinner
+from rich.syntax import Syntax
 from rich.text import Text
 from textual.app import App, ComposeResult, SystemCommand
 from textual.binding import Binding
+from textual.cache import LRUCache
 from textual.containers import Container, Vertical, VerticalScroll
 from textual.css.query import NoMatches
 from textual.events import Key
 from textual.screen import Screen
+from textual.strip import Strip
 from textual.widgets import Footer, Header, Input, Static, TextArea
 
 from minisweagent.agents.default import AgentConfig, DefaultAgent, NonTerminatingException, Submitted
@@ -122,6 +129,212 @@ def _messages_to_steps(messages: list[dict]) -> list[list[dict]]:
     return steps
 
 
+class _StepIndex:
+    def __init__(self):
+        """Messages grouped into steps like `_messages_to_steps`, but updated incrementally as messages are added."""
+        self.steps: list[list[dict]] = []
+        self._n_messages = 0
+        self._last_message: dict | None = None
+
+    def update(self, messages: list[dict]) -> list[list[dict]]:
+        """Group the messages that were added since the last update. If the history was rewritten instead
+        (e.g., a new run), all steps are rebuilt (as new lists, so that widgets of old steps are not reused).
+        """
+        n_known = self._n_messages
+        if len(messages) < n_known or (n_known and messages[n_known - 1] is not self._last_message):
+            self.steps = _messages_to_steps(messages)
+        else:
+            for message in messages[n_known:]:
+                if not self.steps or self.steps[-1][-1]["role"] == "user":
+                    self.steps.append([])
+                self.steps[-1].append(message)
+        self._n_messages = len(messages)
+        self._last_message = messages[-1] if messages else None
+        return self.steps
+
+
+def _get_message_text(message: dict) -> str:
+    if isinstance(message["content"], list):
+        parts = []
+        for item in message["content"]:
+            if item.get("type") == "thought":
+                parts.append(f"[Thought] {item['text']}")
+            else:
+                parts.append(item.get("text", ""))
+        return "\n".join(parts)
+    return str(message["content"])
+
+
+_WORD = re.compile(r"\s*\S+\s*|\s+")
+"""Words with the whitespace that follows them (and the indentation before the first word)"""
+
+
+def _get_row_starts(line: str, width: int) -> list[int]:
+    """Offsets at which the rows of a line start if it is wrapped at whitespace to `width` cells.
+    Words that are longer than a row are split.
+    """
+    starts = [0]
+    if line.isascii():
+        while len(line) - starts[-1] > width:
+            start = starts[-1]
+            space = line.rfind(" ", start + 1, start + width + 1)
+            starts.append(space + 1 if space != -1 else start + width)
+        return starts
+    used = 0
+    for match in _WORD.finditer(line):
+        word = match.group().rstrip()
+        word_width = cell_len(word)
+        if used and used + word_width > width:
+            starts.append(match.start())
+            used = 0
+        if word_width > width:
+            # Wide characters take two cells, so the chunks of a word differ in length
+            offset = match.start()
+            chunks = chop_cells(word, width)
+            for chunk in chunks[:-1]:
+                offset += len(chunk)
+                starts.append(offset)
+            used = cell_len(chunks[-1])
+        else:
+            used += word_width
+        used += len(match.group()) - len(word)
+    return starts
+
+
+@lru_cache(maxsize=32)
+def _get_syntax(lexer: str) -> Syntax:
+    return Syntax("", lexer, theme="ansi_dark")
+
+
+class _WrappedLines:
+    def __init__(self, text: str, width: int):
+        """Rows of a text that is wrapped at whitespace. Only the rows of lines that are wider than `width` are
+        computed upfront (the offsets at which they start), the rows themselves are cut out when they are rendered.
+        """
+        self.width = max(width, 1)
+        self.lines = text.expandtabs(4).replace("\r", "").split("\n")
+        self.row_starts = [0]
+        """Index of the first row of every line (and the total number of rows at the end)"""
+        self.code_lines: dict[int, str] = {}
+        """Lines in fenced code blocks (and the fences) -> lexer of the block (empty if unknown)"""
+        self._offsets: dict[int, list[int]] = {}
+        """Offsets of the rows of lines with more than one row"""
+        self._highlighted: LRUCache[int, Text] = LRUCache(256)
+        lexer = None
+        n_rows = 0
+        for i, line in enumerate(self.lines):
+            if line.startswith("```"):
+                self.code_lines[i] = ""
+                lexer = line[3:].strip().split(" ")[0] if lexer is None else None
+            elif lexer is not None:
+                self.code_lines[i] = lexer
+            if (len(line) if line.isascii() else cell_len(line)) > self.width:
+                offsets = self._offsets[i] = _get_row_starts(line, self.width)
+                n_rows += len(offsets)
+            else:
+                n_rows += 1
+            self.row_starts.append(n_rows)
+
+    @property
+    def n_rows(self) -> int:
+        return self.row_starts[-1]
+
+    def _get_line(self, i: int) -> Text:
+        if not self.code_lines.get(i):
+            return Text(self.lines[i])
+        highlighted = self._highlighted.get(i)
+        if highlighted is None:
+            line = self.lines[i]
+            highlighted = self._highlighted[i] = _get_syntax(self.code_lines[i]).highlight(line)[: len(line)]
+        return highlighted
+
+    def get_row(self, y: int) -> tuple[Text, bool]:
+        """Text of row `y` (with syntax highlighting in code blocks of a known language) and whether it is code."""
+        i = bisect.bisect_right(self.row_starts, y) - 1
+        line = self._get_line(i)
+        if (offsets := self._offsets.get(i)) is not None:
+            offset = y - self.row_starts[i]
+            end = offsets[offset + 1] if offset + 1 < len(offsets) else len(line)
+            line = line[offsets[offset] : end]
+        return line, i in self.code_lines
+
+
+class MessageRenderCache:
+    def __init__(self, maxsize: int = 512):
+        """Texts and wrapped lines of recently shown messages, so that switching between steps doesn't
+        extract or wrap them again.
+        """
+        self._texts: LRUCache[int, tuple[dict, str]] = LRUCache(maxsize)
+        self._wrapped: LRUCache[tuple[int, int], tuple[str, _WrappedLines]] = LRUCache(maxsize)
+
+    def get_text(self, message: dict) -> str:
+        # Keyed by identity, the message is kept in the cache, so that its id can't be reused
+        cached = self._texts.get(id(message))
+        if cached is None or cached[0] is not message:
+            cached = self._texts[id(message)] = (message, _get_message_text(message))
+        return cached[1]
+
+    def get_wrapped(self, text: str, width: int) -> _WrappedLines:
+        cached = self._wrapped.get((id(text), width))
+        if cached is None or cached[0] is not text:
+            cached = self._wrapped[(id(text), width)] = (text, _WrappedLines(text, width))
+        return cached[1]
+
+
+class MessageContent(Static):
+    COMPONENT_CLASSES = {"message-content--code"}
+    DEFAULT_CSS = """
+    MessageContent > .message-content--code {
+        color: $text-accent;
+    }
+    """
+
+    def __init__(self, text: str, *, cache: MessageRenderCache | None = None, **kwargs):
+        """Content of a message that only renders the rows that are visible.
+
+        Long outputs are wrapped lazily (see `_WrappedLines`), so that showing a step with hundreds of KB of
+        output doesn't lay out the whole text.
+        """
+        super().__init__(Text(text), markup=False, **kwargs)
+        self._text = text
+        self._cache = cache or MessageRenderCache(maxsize=4)
+
+    def _get_wrapped(self, width: int) -> _WrappedLines:
+        return self._cache.get_wrapped(self._text, width)
+
+    def get_content_width(self, container, viewport) -> int:
+        return container.width
+
+    def get_content_height(self, container, viewport, width: int) -> int:
+        return self._get_wrapped(width).n_rows
+
+    def render_line(self, y: int) -> Strip:
+        width = self.content_region.width
+        wrapped = self._get_wrapped(width)
+        if width <= 0 or y >= wrapped.n_rows:
+            return Strip.blank(max(width, 0), self.rich_style)
+        row, is_code = wrapped.get_row(y)
+        style = self.rich_style + self.get_component_rich_style("message-content--code") if is_code else self.rich_style
+        segments = Segment.apply_style(row.render(self.app.console), style)
+        return Strip(segments).adjust_cell_length(width, self.rich_style)
+
+
+def mount_step(container: Vertical, messages: list[dict], cache: MessageRenderCache) -> None:
+    """Show the messages of a step (replacing the current content of the container)."""
+    container.remove_children()
+    mount_messages(container, messages, cache)
+
+
+def mount_messages(container: Vertical, messages: list[dict], cache: MessageRenderCache) -> None:
+    """Add messages below the current content of the container."""
+    for message in messages:
+        message_container = Vertical(classes="message-container")
+        container.mount(message_container)
+        role = message["role"].replace("assistant", "mini-swe-agent")
+        message_container.mount(Static(role.upper(), classes="message-header"))
+        message_container.mount(MessageContent(cache.get_text(message), cache=cache, classes="message-content"))
+
+
 class SmartInputContainer(Container):
     def __init__(self, app: "TextualAgent"):
         """Smart input container supporting single-line and multi-line input modes."""
@@ -275,6 +488,11 @@ class TextualAgent(App):
         self.result: str = ""
 
         self._vscroll = VerticalScroll()
+        self._render_cache = MessageRenderCache()
+        self._step_index = _StepIndex()
+        self._mounted_step: list[dict] | None = None
+        """Step that is currently shown (new messages of this step are appended to the existing widgets)"""
+        self._n_mounted_messages = 0
 
     def run(self, task: str, **kwargs) -> tuple[str, str]:
         threading.Thread(target=lambda: self.agent.run(task, **kwargs), daemon=True).start()
@@ -330,7 +548,7 @@ class TextualAgent(App):
 
     def on_message_added(self) -> None:
         auto_follow = self.i_step == self.n_steps - 1 and self._vscroll.scroll_y <= 1
-        self.n_steps = len(_messages_to_steps(self.agent.messages))
+        self.n_steps = len(self._step_index.update(self.agent.messages))
         self.update_content()
         if auto_follow:
             self.action_last_step()
@@ -356,29 +574,21 @@ class TextualAgent(App):
 
     def update_content(self) -> None:
         container = self.query_one("#content", Vertical)
-        container.remove_children()
-        items = _messages_to_steps(self.agent.messages)
+        items = self._step_index.update(self.agent.messages)
 
         if not items:
+            container.remove_children()
             container.mount(Static("Waiting for agent to start..."))
+            self._mounted_step = None
             return
 
-        for message in items[self.i_step]:
-            if isinstance(message["content"], list):
-                parts = []
-                for item in message["content"]:
-                    if item.get("type") == "thought":
-                        parts.append(f"[Thought] {item['text']}")
-                    else:
-                        parts.append(item.get("text", ""))
-                content_str = "\n".join(parts)
-            else:
-                content_str = str(message["content"])
-            message_container = Vertical(classes="message-container")
-            container.mount(message_container)
-            role = message["role"].replace("assistant", "mini-swe-agent")
-            message_container.mount(Static(role.upper(), classes="message-header"))
-            message_container.mount(Static(Text(content_str, no_wrap=False), classes="message-content"))
+        step = items[self.i_step]
+        if step is self._mounted_step:
+            mount_messages(container, step[self._n_mounted_messages :], self._render_cache)
+        else:
+            mount_step(container, step, self._render_cache)
+        self._mounted_step = step
+        self._n_mounted_messages = len(step)
 
         if self.input_container.pending_prompt is not None:
             self.agent_state = "AWAITING_INPUT"
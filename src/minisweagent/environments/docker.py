@@ -4,8 +4,21 @@ import shlex
 import subprocess
 import uuid
 from dataclasses import asdict, dataclass, field
+from pathlib import Path
 from typing import Any
 
+from minisweagent.environments.utils.container_reaper import OWNER_LABEL, get_container_reaper, get_owner_label
+from minisweagent.environments.utils.file_transfer import (
+    download_with_docker_cp,
+    resolve_env_path,
+    upload_with_docker_cp,
+)
+from minisweagent.environments.utils.process_group import (
+    get_container_command,
+    get_container_kill_command,
+    parse_cpu_time,
+)
+
 
 @dataclass
 class DockerEnvironmentConfig:
@@ -57,6 +70,8 @@ class DockerEnvironment:
             container_name,
             "-w",
             self.config.cwd,
+            "--label",
+            f"{OWNER_LABEL}={get_owner_label()}",
             *self.config.run_args,
             self.config.image,
             "sleep",
@@ -74,7 +89,9 @@ class DockerEnvironment:
         self.container_id = result.stdout.strip()
 
     def execute(self, command: str, cwd: str = "", *, timeout: int | None = None) -> dict[str, Any]:
-        """Execute a command in the Docker container and return the result as a dict."""
+        """Execute a command in the Docker container and return the result as a dict.
+        The command runs in its own process group inside the container, which is killed on timeout.
+        """
         cwd = cwd or self.config.cwd
         assert self.container_id, "Container not started"
 
@@ -84,24 +101,59 @@ class DockerEnvironment:
                 cmd.extend(["-e", f"{key}={value}"])
         for key, value in self.config.env.items():
             cmd.extend(["-e", f"{key}={value}"])
-        cmd.extend([self.container_id, "bash", "-lc", command])
+        pgid_file = f"/tmp/.minisweagent-{uuid.uuid4().hex[:8]}.pgid"
+        cmd.extend([self.container_id, *get_container_command(command, pgid_file)])
 
-        result = subprocess.run(
-            cmd,
-            text=True,
-            timeout=timeout or self.config.timeout,
-            encoding="utf-8",
-            errors="replace",
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
+        try:
+            result = subprocess.run(
+                cmd,
+                text=True,
+                timeout=timeout or self.config.timeout,
+                encoding="utf-8",
+                errors="replace",
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+            )
+        except subprocess.TimeoutExpired:
+            self._kill_command(pgid_file)
+            raise
+        output, cpu_time = parse_cpu_time(result.stdout)
+        return {"output": output, "returncode": result.returncode, "cpu_time": cpu_time}
+
+    def _kill_command(self, pgid_file: str) -> None:
+        """Kill a timed out command inside the container (killing the `docker exec` client does not do that)."""
+        cmd = [self.config.executable, "exec", self.container_id, *get_container_kill_command(pgid_file)]
+        try:
+            subprocess.run(cmd, capture_output=True, timeout=30)  # type: ignore[arg-type]
+        except subprocess.TimeoutExpired:
+            self.logger.warning(f"Timed out killing command in container {self.container_id}")
+
+    def upload(self, paths: dict[str | Path, str]) -> None:
+        """Copy local files/directories to the container as a single tar stream (`docker cp -`).
+        Relative target paths are relative to `config.cwd`.
+        """
+        assert self.container_id, "Container not started"
+        upload_with_docker_cp(
+            self.config.executable,
+            self.container_id,
+            {Path(source): resolve_env_path(target, self.config.cwd) for source, target in paths.items()},
         )
-        return {"output": result.stdout, "returncode": result.returncode}
+
+    def download(self, paths: dict[str, str | Path]) -> None:
+        """Copy files/directories from the container by streaming tar archives (`docker cp <path> -`).
+        Relative source paths are relative to `config.cwd`.
+        """
+        assert self.container_id, "Container not started"
+        for source, target in paths.items():
+            download_with_docker_cp(
+                self.config.executable, self.container_id, resolve_env_path(source, self.config.cwd), Path(target)
+            )
 
     def cleanup(self):
-        """Stop and remove the Docker container."""
+        """Schedule the Docker container for removal (see `ContainerReaper`)."""
         if getattr(self, "container_id", None) is not None:  # if init fails early, container_id might not be set
-            cmd = f"(timeout 60 {self.config.executable} stop {self.container_id} || {self.config.executable} rm -f {self.container_id}) >/dev/null 2>&1 &"
-            subprocess.Popen(cmd, shell=True)
+            get_container_reaper(self.config.executable).schedule(self.container_id)  # type: ignore[arg-type]
+            self.container_id = None
 
     def __del__(self):
         """Cleanup container when object is destroyed."""
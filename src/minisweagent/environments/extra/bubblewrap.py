@@ -21,6 +21,8 @@ from dataclasses import asdict, dataclass, field
 from pathlib import Path
 from typing import Any
 
+from minisweagent.environments.utils.file_transfer import copy_path
+
 
 @dataclass
 class BubblewrapEnvironmentConfig:
@@ -100,6 +102,18 @@ class BubblewrapEnvironment:
         )
         return {"output": result.stdout, "returncode": result.returncode}
 
+    def upload(self, paths: dict[str | Path, str]) -> None:
+        """Copy local files/directories. Relative target paths are relative to the working directory."""
+        cwd = Path(self.config.cwd or self.working_dir)
+        for source, target in paths.items():
+            copy_path(Path(source), cwd / target)
+
+    def download(self, paths: dict[str, str | Path]) -> None:
+        """Copy local files/directories. Relative source paths are relative to the working directory."""
+        cwd = Path(self.config.cwd or self.working_dir)
+        for source, target in paths.items():
+            copy_path(cwd / source, Path(target))
+
     def cleanup(self):
         if self.working_dir.exists():
             shutil.rmtree(self.working_dir)
@@ -2,8 +2,12 @@ import os
 import platform
 import subprocess
 from dataclasses import asdict, dataclass, field
+from pathlib import Path
 from typing import Any
 
+from minisweagent.environments.utils.file_transfer import copy_path
+from minisweagent.environments.utils.process_group import get_local_command, kill_process_group, parse_cpu_time
+
 
 @dataclass
 class LocalEnvironmentConfig:
@@ -18,21 +22,56 @@ class LocalEnvironment:
         self.config = config_class(**kwargs)
 
     def execute(self, command: str, cwd: str = "", *, timeout: int | None = None):
-        """Execute a command in the local environment and return the result as a dict."""
+        """Execute a command in the local environment and return the result as a dict.
+        On POSIX systems, the command runs in its own process group, which is killed completely on timeout.
+        """
         cwd = cwd or self.config.cwd or os.getcwd()
-        result = subprocess.run(
-            command,
+        if os.name != "posix":
+            result = subprocess.run(
+                command,
+                shell=True,
+                text=True,
+                cwd=cwd,
+                env=os.environ | self.config.env,
+                timeout=timeout or self.config.timeout,
+                encoding="utf-8",
+                errors="replace",
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+            )
+            return {"output": result.stdout, "returncode": result.returncode, "cpu_time": None}
+        with subprocess.Popen(
+            get_local_command(command),
             shell=True,
             text=True,
             cwd=cwd,
             env=os.environ | self.config.env,
-            timeout=timeout or self.config.timeout,
             encoding="utf-8",
             errors="replace",
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
-        )
-        return {"output": result.stdout, "returncode": result.returncode}
+            start_new_session=True,
+        ) as process:
+            try:
+                output, _ = process.communicate(timeout=timeout or self.config.timeout)
+            except subprocess.TimeoutExpired:
+                kill_process_group(process)
+                process.wait()
+                raise
+        output, cpu_time = parse_cpu_time(output)
+        return {"output": output, "returncode": process.returncode, "cpu_time": cpu_time}
+
+    def upload(self, paths: dict[str | Path, str]) -> None:
+        """Copy local files/directories. Relative target paths are relative to `config.cwd`."""
+        cwd = Path(self.config.cwd or os.getcwd())
+        for source, target in paths.items():
+            copy_path(Path(source), cwd / target)
+
+    def download(self, paths: dict[str, str | Path]) -> None:
+        """Copy local files/directories. Relative source paths are relative to `config.cwd`."""
+        cwd = Path(self.config.cwd or os.getcwd())
+        for source, target in paths.items():
+            copy_path(cwd / source, Path(target))
 
     def get_template_vars(self) -> dict[str, Any]:
         return asdict(self.config) | platform.uname()._asdict()
@@ -7,9 +7,14 @@ import subprocess
 import tempfile
 import uuid
 from dataclasses import asdict, dataclass, field
-from pathlib import Path
+from pathlib import Path, PurePosixPath
 from typing import Any
 
+from minisweagent.environments.utils.file_transfer import copy_path, resolve_env_path
+
+_MAX_SYMLINKS = 40
+"""Like the Linux kernel"""
+
 
 @dataclass
 class SingularityEnvironmentConfig:
@@ -89,6 +94,66 @@ class SingularityEnvironment:
         )
         return {"output": result.stdout, "returncode": result.returncode}
 
+    def _get_sandbox_path(self, path: str | PurePosixPath) -> Path:
+        """Path in the (writable) sandbox directory that corresponds to a path in the container.
+
+        Symlinks are resolved like in the container (absolute links and `..` stay within the sandbox), so that
+        host file operations never follow a link out of the sandbox.
+        """
+        root = self.sandbox_dir.resolve()
+        parts = list(resolve_env_path(str(path), self.config.cwd).parts[1:])
+        resolved: list[str] = []
+        n_links = 0
+        while parts:
+            part = parts.pop(0)
+            if part in ("", "."):
+                continue
+            if part == "..":
+                if resolved:
+                    resolved.pop()
+                continue
+            candidate = root.joinpath(*resolved, part)
+            if not candidate.is_symlink():
+                resolved.append(part)
+                continue
+            n_links += 1
+            if n_links > _MAX_SYMLINKS:
+                raise ValueError(f"Too many levels of symbolic links in {path}")
+            link = PurePosixPath(os.readlink(candidate))
+            if link.is_absolute():
+                resolved = []
+            parts = list(link.parts[1:] if link.is_absolute() else link.parts) + parts
+        sandbox_path = root.joinpath(*resolved)
+        if not sandbox_path.resolve().is_relative_to(root):
+            raise ValueError(f"Path {path} is outside of the sandbox")
+        return sandbox_path
+
+    def _upload(self, source: Path, target: PurePosixPath, *, follow_symlinks: bool = True) -> None:
+        # Like `copy_path`, but every target path is resolved within the sandbox, so that merging into
+        # existing directories cannot write through a symlink in the sandbox.
+        if source.is_dir() and (follow_symlinks or not source.is_symlink()):
+            self._get_sandbox_path(target).mkdir(parents=True, exist_ok=True)
+            for child in source.iterdir():
+                self._upload(child, target / child.name, follow_symlinks=False)
+            return
+        destination = self._get_sandbox_path(target)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(source, destination, follow_symlinks=follow_symlinks)
+
+    def upload(self, paths: dict[str | Path, str]) -> None:
+        """Copy local files/directories directly into the sandbox directory.
+        Relative target paths are relative to `config.cwd`.
+        """
+        for source, target in paths.items():
+            self._upload(Path(source), resolve_env_path(target, self.config.cwd))
+
+    def download(self, paths: dict[str, str | Path]) -> None:
+        """Copy files/directories directly from the sandbox directory.
+        Relative source paths are relative to `config.cwd`.
+        """
+        for source, target in paths.items():
+            copy_path(self._get_sandbox_path(source), Path(target))
+
     def cleanup(self):
         shutil.rmtree(self.sandbox_dir, ignore_errors=True)
 
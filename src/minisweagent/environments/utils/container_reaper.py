@@ -0,0 +1,165 @@
+"""Background removal of the docker containers that mini-swe-agent starts.
+
+Every container started by `DockerEnvironment` is labeled with its owner (host and process ID).
+Instead of starting a `docker stop` process for every container, `cleanup` hands the container
+to a `ContainerReaper`, which removes containers in batches in a background thread.
+When the reaper starts, it also removes containers whose owner process is no longer running
+(e.g., after a batch run was killed), so that they don't keep running until `container_timeout`.
+"""
+
+import atexit
+import logging
+import os
+import socket
+import subprocess
+import threading
+import time
+
+OWNER_LABEL = "minisweagent.owner"
+"""Docker label that marks containers started by mini-swe-agent. Value is `<hostname>:<pid>`."""
+
+
+def get_owner_label() -> str:
+    """Value of the owner label for containers started by this process."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _is_process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ContainerReaper:
+    def __init__(
+        self,
+        executable: str = "docker",
+        *,
+        batch_size: int = 20,
+        batch_delay: float = 1.0,
+        sweep_orphans: bool = True,
+        logger: logging.Logger | None = None,
+    ):
+        """Removes containers in batches in a background thread.
+
+        Args:
+            executable: Path to the docker/container executable.
+            batch_size: Maximum number of containers to remove with a single command.
+            batch_delay: Time in seconds to wait for more containers before removing a batch.
+            sweep_orphans: Remove containers of dead processes on this host when the reaper starts.
+        """
+        self.executable = executable
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.logger = logger or logging.getLogger("minisweagent.environment")
+        self._pending: list[str] = []
+        self._n_in_flight = 0
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(
+            target=self._run, args=(sweep_orphans,), daemon=True, name="minisweagent-container-reaper"
+        )
+        self._thread.start()
+        atexit.register(self.flush)
+
+    @property
+    def n_pending(self) -> int:
+        """Number of containers that are scheduled for removal but not yet removed."""
+        with self._condition:
+            return len(self._pending) + self._n_in_flight
+
+    def schedule(self, container_id: str) -> None:
+        """Schedule a container for removal."""
+        with self._condition:
+            self._pending.append(container_id)
+            self._condition.notify_all()
+
+    def _run(self, sweep_orphans: bool) -> None:
+        if sweep_orphans:
+            self.sweep_orphans()
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending)
+            # Give other containers the chance to join the batch
+            time.sleep(self.batch_delay)
+            with self._condition:
+                batch = self._pending[: self.batch_size]
+                del self._pending[: self.batch_size]
+                self._n_in_flight = len(batch)
+            try:
+                self._remove(batch)
+            finally:
+                with self._condition:
+                    self._n_in_flight = 0
+                    self._condition.notify_all()
+
+    def _remove(self, container_ids: list[str]) -> None:
+        self.logger.debug(f"Removing {len(container_ids)} containers")
+        try:
+            result = subprocess.run(
+                [self.executable, "rm", "-f", *container_ids], capture_output=True, text=True, timeout=120
+            )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            self.logger.warning(f"Error removing containers {container_ids}: {e}")
+            return
+        if result.returncode != 0:
+            self.logger.warning(f"Error removing containers {container_ids}: {result.stderr.strip()}")
+
+    def find_orphans(self) -> list[str]:
+        """IDs of containers whose owner process on this host is no longer running."""
+        try:
+            result = subprocess.run(
+                [
+                    self.executable,
+                    "ps",
+                    "-a",
+                    "--filter",
+                    f"label={OWNER_LABEL}",
+                    "--format",
+                    f'{{{{.ID}}}} {{{{.Label "{OWNER_LABEL}"}}}}',
+                ],
+                capture_output=True,
+                text=True,
+                timeout=60,
+                check=True,
+            )
+        except (OSError, subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+            self.logger.warning(f"Could not list containers to find orphans: {e}")
+            return []
+        hostname = socket.gethostname()
+        orphans = []
+        for line in result.stdout.splitlines():
+            container_id, _, owner = line.strip().partition(" ")
+            host, _, pid = owner.rpartition(":")
+            if host == hostname and pid.isdigit() and not _is_process_alive(int(pid)):
+                orphans.append(container_id)
+        return orphans
+
+    def sweep_orphans(self) -> list[str]:
+        """Schedule all orphaned containers for removal. Returns their IDs."""
+        orphans = self.find_orphans()
+        if orphans:
+            self.logger.info(f"Removing {len(orphans)} orphaned containers from previous runs")
+        for container_id in orphans:
+            self.schedule(container_id)
+        return orphans
+
+    def flush(self, timeout: float = 60) -> bool:
+        """Wait until all scheduled containers are removed. Returns False on timeout."""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._pending and not self._n_in_flight, timeout=timeout)
+
+
+_REAPERS: dict[str, ContainerReaper] = {}
+_REAPERS_LOCK = threading.Lock()
+
+
+def get_container_reaper(executable: str = "docker") -> ContainerReaper:
+    """Get the reaper for the given executable (there is one per process and executable)."""
+    with _REAPERS_LOCK:
+        if executable not in _REAPERS:
+            _REAPERS[executable] = ContainerReaper(executable)
+        return _REAPERS[executable]
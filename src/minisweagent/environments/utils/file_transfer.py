@@ -0,0 +1,79 @@
+"""Helpers for the `upload` and `download` methods of the environments.
+
+Transferring files this way avoids going through `execute`, i.e., through the observation path and
+UTF-8 decoding of the output, so large repositories and binary files can be moved efficiently.
+"""
+
+import shutil
+import subprocess
+import tarfile
+from pathlib import Path, PurePosixPath
+from typing import IO
+
+
+def resolve_env_path(path: str, cwd: str) -> PurePosixPath:
+    """Resolve a path inside the environment. Relative paths are relative to `cwd`."""
+    return PurePosixPath(cwd or "/") / path
+
+
+def copy_path(source: Path, target: Path) -> None:
+    """Copy a file or a directory (recursively, merging with existing directories)."""
+    if source.is_dir():
+        shutil.copytree(source, target, symlinks=True, dirs_exist_ok=True)
+    else:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(source, target)
+
+
+def write_tar(paths: dict[Path, PurePosixPath], fileobj: IO[bytes]) -> None:
+    """Stream a tar archive to `fileobj` that, when extracted at `/`, places every local path
+    (file or directory) at its target path.
+    """
+    with tarfile.open(fileobj=fileobj, mode="w|") as tar:
+        for source, target in paths.items():
+            tar.add(source, arcname=str(target).lstrip("/"))
+
+
+def extract_tar(fileobj: IO[bytes], source_name: str, target: Path) -> None:
+    """Extract a tar stream whose top-level entry is `source_name` (as created by `docker cp <src> -`)
+    such that this entry ends up at `target`.
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with tarfile.open(fileobj=fileobj, mode="r|") as tar:
+        for member in tar:
+            relative_path = PurePosixPath(member.name).relative_to(source_name)
+            member.name = str(PurePosixPath(target.name) / relative_path)
+            if hasattr(tarfile, "data_filter"):
+                tar.extract(member, target.parent, filter="data")
+            else:  # python < 3.10.12
+                tar.extract(member, target.parent)
+
+
+def upload_with_docker_cp(executable: str, container_id: str, paths: dict[Path, PurePosixPath]) -> None:
+    """Copy local files and directories into a container with a single `docker cp` call."""
+    cmd = [executable, "cp", "-", f"{container_id}:/"]
+    process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        write_tar(paths, process.stdin)  # type: ignore[arg-type]
+    except BrokenPipeError:
+        pass  # docker cp failed, we'll get the error below
+    finally:
+        process.stdin.close()  # type: ignore[union-attr]
+    stderr = process.stderr.read()  # type: ignore[union-attr]
+    if process.wait() != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, stderr=stderr)
+
+
+def download_with_docker_cp(executable: str, container_id: str, source: PurePosixPath, target: Path) -> None:
+    """Copy a file or directory out of a container with `docker cp`."""
+    cmd = [executable, "cp", f"{container_id}:{source}", "-"]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        extract_tar(process.stdout, source.name, target)  # type: ignore[arg-type]
+    except tarfile.ReadError:
+        pass  # docker cp failed, we'll get the error below
+    finally:
+        process.stdout.close()  # type: ignore[union-attr]
+    stderr = process.stderr.read()  # type: ignore[union-attr]
+    if process.wait() != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, stderr=stderr)
@@ -0,0 +1,76 @@
+"""Helpers to run commands in their own process group, kill the whole group on timeout
+and report the CPU time that a command used.
+
+Killing the process that runs a command on timeout is not enough: For `DockerEnvironment`, this only kills
+the local `docker exec` client, and for `LocalEnvironment`, the children of the shell survive. Either way, a hung
+test suite keeps burning CPU for all later steps.
+"""
+
+import os
+import re
+import shlex
+import signal
+import subprocess
+
+CPU_TIME_MARKER = "__MSWEA_CPU_TIME__"
+
+_TIMES_PATTERN = re.compile(r"(\d+)m([\d.]+)s\s+(\d+)m([\d.]+)s")
+
+# Runs `$2` with `bash -lc` as a background job. Because of `set -m` (job control), the job gets its own
+# process group, whose ID is written to `$1`, so that another `docker exec` can kill it on timeout.
+_CONTAINER_WRAPPER = f"""set -m
+bash -lc "$2" &
+__mswea_pid=$!
+echo $__mswea_pid > "$1"
+wait $__mswea_pid
+__mswea_rc=$?
+rm -f "$1"
+printf '\\n%s\\n' {CPU_TIME_MARKER}
+times
+exit $__mswea_rc"""
+
+_CONTAINER_KILL = 'kill -KILL -- -"$(cat "$1")" 2>/dev/null; rm -f "$1"'
+
+
+def get_container_command(command: str, pgid_file: str) -> list[str]:
+    """Arguments for `docker exec <container>` (or similar) that run `command` with `bash -lc` in its own
+    process group, so that it can be killed with `get_container_kill_command`.
+    """
+    return ["bash", "-c", _CONTAINER_WRAPPER, "mswea", pgid_file, command]
+
+
+def get_container_kill_command(pgid_file: str) -> list[str]:
+    """Arguments for `docker exec <container>` that kill the process group of a command
+    started with `get_container_command`.
+    """
+    return ["bash", "-c", _CONTAINER_KILL, "mswea", pgid_file]
+
+
+def get_local_command(command: str) -> str:
+    """Wrap a (POSIX) shell command so that its CPU time is printed at the end of its output."""
+    return f"eval {shlex.quote(command)}\n__mswea_rc=$?\nprintf '\\n%s\\n' {CPU_TIME_MARKER}\ntimes\nexit $__mswea_rc"
+
+
+def parse_cpu_time(output: str) -> tuple[str, float | None]:
+    """Remove the CPU time report from the output of a wrapped command.
+
+    Returns:
+        The output of the command and its CPU time in seconds (user + system, including all children
+        that have been waited for). The CPU time is None if the command exited the wrapper early.
+    """
+    head, sep, tail = output.rpartition(f"\n{CPU_TIME_MARKER}\n")
+    if not sep:
+        return output, None
+    times = _TIMES_PATTERN.findall(tail)
+    if not times:
+        return output, None
+    cpu_time = sum(int(minutes) * 60 + float(seconds) for line in times for minutes, seconds in (line[:2], line[2:]))
+    return head, round(cpu_time, 3)
+
+
+def kill_process_group(process: subprocess.Popen) -> None:
+    """Kill the process group of a process that was started with `start_new_session=True`."""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        process.kill()
@@ -5,42 +5,23 @@ You can ignore this file completely if you explicitly set your model in your run
 import copy
 import importlib
 import os
-import threading
 
 from minisweagent import Model
-
-
-class GlobalModelStats:
-    """Global model statistics tracker with optional limits."""
-
-    def __init__(self):
-        self._cost = 0.0
-        self._n_calls = 0
-        self._lock = threading.Lock()
-        self.cost_limit = float(os.getenv("MSWEA_GLOBAL_COST_LIMIT", "0"))
-        self.call_limit = int(os.getenv("MSWEA_GLOBAL_CALL_LIMIT", "0"))
-        if (self.cost_limit > 0 or self.call_limit > 0) and not os.getenv("MSWEA_SILENT_STARTUP"):
-            print(f"Global cost/call limit: ${self.cost_limit:.4f} / {self.call_limit}")
-
-    def add(self, cost: float) -> None:
-        """Add a model call with its cost, checking limits."""
-        with self._lock:
-            self._cost += cost
-            self._n_calls += 1
-        if 0 < self.cost_limit < self._cost or 0 < self.call_limit < self._n_calls + 1:
-            raise RuntimeError(f"Global cost/call limit exceeded: ${self._cost:.4f} / {self._n_calls + 1}")
-
-    @property
-    def cost(self) -> float:
-        return self._cost
-
-    @property
-    def n_calls(self) -> int:
-        return self._n_calls
-
+from minisweagent.models.utils.stats import GlobalLimitExceeded, GlobalModelStats, ModelStatsSnapshot, ModelUsage
 
 GLOBAL_MODEL_STATS = GlobalModelStats()
 
+__all__ = [
+    "GLOBAL_MODEL_STATS",
+    "GlobalLimitExceeded",
+    "GlobalModelStats",
+    "ModelStatsSnapshot",
+    "ModelUsage",
+    "get_model",
+    "get_model_class",
+    "get_model_name",
+]
+
 
 def get_model(input_model_name: str | None = None, config: dict | None = None) -> Model:
     """Get an initialized model object from any kind of user input or settings."""
@@ -82,6 +63,7 @@ _MODEL_CLASS_MAPPING = {
     "anthropic": "minisweagent.models.anthropic.AnthropicModel",
     "litellm": "minisweagent.models.litellm_model.LitellmModel",
     "openrouter": "minisweagent.models.openrouter_model.OpenRouterModel",
+    "openai_responses": "minisweagent.models.openai_responses_model.OpenAIResponsesModel",
     "portkey": "minisweagent.models.portkey_model.PortkeyModel",
     "deterministic": "minisweagent.models.test_models.DeterministicModel",
 }
@@ -0,0 +1,132 @@
+import logging
+import re
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+from minisweagent import Model
+from minisweagent.models.extra.roulette import RouletteModel
+
+logger = logging.getLogger("minisweagent.cascade")
+
+_ACTION_REGEX = re.compile(r"```bash\s*\n(.*?)\n```", re.DOTALL)
+
+
+@dataclass
+class CascadeModelConfig:
+    model_kwargs: list[dict]
+    """Exactly two models: The cheap model that is used by default and the strong model to escalate to"""
+    model_name: str = "cascade"
+    escalate_on_format_error: bool = True
+    """Escalate if the last response did not contain exactly one action"""
+    repeated_actions: int = 2
+    """Escalate if the last n actions were identical (0 to disable)"""
+    nonzero_exit_streak: int = 3
+    """Escalate if the last n actions exited with a non-zero return code (0 to disable)"""
+    escalation_patterns: list[str] = field(
+        default_factory=lambda: [r"COMPLETE_TASK_AND_SUBMIT_FINAL_OUTPUT", r"MINI_SWE_AGENT_FINAL_OUTPUT"]
+    )
+    """If the action proposed by the cheap model matches any of these regular expressions (e.g., a submission or
+    a final edit), it is discarded and the strong model is queried instead.
+    """
+    escalation_steps: int = 1
+    """Number of consecutive steps to use the strong model for once escalated"""
+
+
+def _get_text(content: str | list[dict]) -> str:
+    if isinstance(content, str):
+        return content
+    return "\n".join(block.get("text", "") for block in content if isinstance(block, dict))
+
+
+def _get_returncode(message: dict) -> int | None:
+    """Return code of an observation message (None for other messages)."""
+    if message["role"] != "user" or isinstance(message["content"], str):
+        return None
+    for block in message["content"]:
+        if block.get("type") == "template" and block.get("name") == "action_observation":
+            output = block.get("arguments", {}).get("output", {})
+            return output.get("returncode") if isinstance(output, dict) else None
+    return None
+
+
+class CascadeModel(RouletteModel):
+    def __init__(self, *, config_class: Callable = CascadeModelConfig, **kwargs):
+        """This "meta"-model queries a cheap model and only escalates to a strong model on specific triggers
+        (format errors, repeated actions, a streak of failing commands or actions matching `escalation_patterns`).
+        """
+        super().__init__(config_class=config_class, **kwargs)
+        if len(self.models) != 2:
+            raise ValueError(f"CascadeModel needs exactly two models (cheap, strong), got {len(self.models)}")
+        self.escalations: dict[str, int] = {}
+        """Number of escalations per trigger"""
+        self._n_escalated_steps_left = 0
+        self._escalation_patterns = [re.compile(pattern) for pattern in self.config.escalation_patterns]
+
+    @property
+    def cheap_model(self) -> Model:
+        return self.models[0]
+
+    @property
+    def strong_model(self) -> Model:
+        return self.models[1]
+
+    def get_model_stats(self) -> dict[str, dict]:
+        """Cost and number of calls of every model."""
+        return {
+            role: {"model_name": model.config.model_name, "cost": model.cost, "n_calls": model.n_calls}
+            for role, model in [("cheap", self.cheap_model), ("strong", self.strong_model)]
+        }
+
+    def get_template_vars(self) -> dict:
+        return super().get_template_vars() | {
+            "model_stats": self.get_model_stats(),
+            "escalations": dict(self.escalations),
+        }
+
+    def get_trigger(self, messages: list[dict]) -> str | None:
+        """Name of the trigger that requires escalating this step based on the history (None if there is none)."""
+        responses = [_get_text(m["content"]) for m in messages if m["role"] == "assistant"]
+        actions = [_ACTION_REGEX.findall(response) for response in responses]
+        if self.config.escalate_on_format_error and actions and len(actions[-1]) != 1:
+            return "format_error"
+        n = self.config.repeated_actions
+        if n > 0 and len(actions) >= n and all(len(a) == 1 for a in actions[-n:]):
+            if len({a[0].strip() for a in actions[-n:]}) == 1:
+                return "repeated_actions"
+        n = self.config.nonzero_exit_streak
+        if n > 0:
+            returncodes = [rc for m in messages if (rc := _get_returncode(m)) is not None]
+            if len(returncodes) >= n and all(rc != 0 for rc in returncodes[-n:]):
+                return "nonzero_exit_streak"
+        return None
+
+    def _matches_escalation_pattern(self, response: dict) -> bool:
+        actions = _ACTION_REGEX.findall(response["content"])
+        return any(pattern.search(action) for pattern in self._escalation_patterns for action in actions)
+
+    def _escalate(self, trigger: str, messages: list[dict], **kwargs) -> dict:
+        self.escalations[trigger] = self.escalations.get(trigger, 0) + 1
+        logger.debug(f"Escalating to {self.strong_model.config.model_name} because of {trigger}")
+        self._n_escalated_steps_left = self.config.escalation_steps - 1
+        return self._query(self.strong_model, messages, escalation=trigger, **kwargs)
+
+    def _query(self, model: Model, messages: list[dict], *, escalation: str | None = None, **kwargs) -> dict:
+        response = model.query(messages, **kwargs)
+        response["model_name"] = model.config.model_name
+        response["escalation"] = escalation
+        return response
+
+    def select_model(self) -> Model:
+        return self.strong_model if self._n_escalated_steps_left > 0 else self.cheap_model
+
+    def query(self, messages: list[dict], **kwargs) -> dict:
+        if (trigger := self.get_trigger(messages)) is not None:
+            return self._escalate(trigger, messages, **kwargs)
+        if self._n_escalated_steps_left > 0:
+            self._n_escalated_steps_left -= 1
+            return self._query(self.strong_model, messages, escalation="continued", **kwargs)
+        response = self._query(self.cheap_model, messages, **kwargs)
+        if self._matches_escalation_pattern(response):
+            # The cost of the discarded response is still tracked by the cheap model
+            return self._escalate("escalation_pattern", messages, **kwargs)
+        return response
@@ -0,0 +1,196 @@
+import concurrent.futures
+import logging
+import math
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from minisweagent import Model
+from minisweagent.models.extra.roulette import RouletteModel
+
+logger = logging.getLogger("minisweagent.router")
+
+
+@dataclass
+class LatencyRouterModelConfig:
+    model_kwargs: list[dict]
+    """The models (backends) to route between"""
+    model_name: str = "latency_router"
+    window: int = 50
+    """Number of recent calls per backend that latency percentiles and error rates are based on"""
+    min_samples: int = 2
+    """Backends with fewer recorded calls are tried first (in order), so that every backend gets measured"""
+    hedge: bool = False
+    """Send a duplicate query to the second best backend once the primary takes longer than its
+    `hedge_percentile` latency, and return whichever answers first. The cost of both queries is counted:
+    reading `cost` or `n_calls` waits until the losing query has finished."""
+    hedge_percentile: float = 0.95
+    hedge_min_samples: int = 5
+    """Minimum number of successful calls of the primary backend before queries are hedged"""
+
+
+class _BackendStats:
+    def __init__(self, window: int):
+        self.latencies: deque[float] = deque(maxlen=window)
+        """Latencies of successful calls in seconds"""
+        self.errors: deque[bool] = deque(maxlen=window)
+        self.n_calls = 0
+
+    def record(self, latency: float, *, error: bool) -> None:
+        self.n_calls += 1
+        self.errors.append(error)
+        if not error:
+            self.latencies.append(latency)
+
+    def percentile(self, q: float) -> float | None:
+        """Nearest-rank percentile of the recent latencies (None if there are none)."""
+        if not self.latencies:
+            return None
+        values = sorted(self.latencies)
+        return values[min(max(math.ceil(q * len(values)) - 1, 0), len(values) - 1)]
+
+    @property
+    def error_rate(self) -> float:
+        return sum(self.errors) / len(self.errors) if self.errors else 0.0
+
+    @property
+    def expected_latency(self) -> float:
+        """Expected time until a successful answer: median latency, inflated by retries after errors."""
+        p50 = self.percentile(0.5)
+        if p50 is None or self.error_rate >= 1.0:
+            return math.inf
+        return p50 / (1 - self.error_rate)
+
+    def to_dict(self) -> dict:
+        return {
+            "n_calls": self.n_calls,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "error_rate": self.error_rate,
+        }
+
+
+class LatencyRouterModel(RouletteModel):
+    def __init__(self, *, config_class: Callable = LatencyRouterModelConfig, **kwargs):
+        """This "meta"-model routes every query to the backend with the best expected latency
+        based on the observed latencies and error rates. Failed queries are retried with the next best backend.
+        """
+        super().__init__(config_class=config_class, **kwargs)
+        self._stats = [_BackendStats(self.config.window) for _ in self.models]
+        self._lock = threading.Lock()
+        self._model_locks = [threading.Lock() for _ in self.models]
+        """Held during the queries of a backend, so that its counters (`cost`, `n_calls`) are never updated
+        by two threads at once"""
+        self._losing_queries: set[concurrent.futures.Future] = set()
+        """Hedged queries that are still running after the other query was returned"""
+        self._executor: concurrent.futures.ThreadPoolExecutor | None = None
+        if self.config.hedge:
+            # Losing hedged queries keep running in the background, so allow some extra workers
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=2 * len(self.models), thread_name_prefix="minisweagent-router"
+            )
+
+    def _wait_for_losing_queries(self) -> None:
+        with self._lock:
+            losing_queries = set(self._losing_queries)
+        concurrent.futures.wait(losing_queries)
+
+    @property
+    def cost(self) -> float:
+        self._wait_for_losing_queries()
+        return sum(model.cost for model in self.models)
+
+    @property
+    def n_calls(self) -> int:
+        self._wait_for_losing_queries()
+        return sum(model.n_calls for model in self.models)
+
+    def get_template_vars(self) -> dict:
+        with self._lock:
+            backend_stats = {
+                f"{i}:{model.config.model_name}": stats.to_dict()
+                for i, (model, stats) in enumerate(zip(self.models, self._stats))
+            }
+        return super().get_template_vars() | {"backend_stats": backend_stats}
+
+    def rank_models(self) -> list[int]:
+        """Indices of all backends, best first."""
+        with self._lock:
+            return sorted(
+                range(len(self.models)),
+                key=lambda i: (self._stats[i].n_calls >= self.config.min_samples, self._stats[i].expected_latency),
+            )
+
+    def select_model(self) -> Model:
+        return self.models[self.rank_models()[0]]
+
+    def _timed_query(self, i_model: int, *args, **kwargs) -> dict:
+        start_time = time.monotonic()
+        try:
+            with self._model_locks[i_model]:
+                response = self.models[i_model].query(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self._stats[i_model].record(time.monotonic() - start_time, error=True)
+            raise
+        with self._lock:
+            self._stats[i_model].record(time.monotonic() - start_time, error=False)
+        return response
+
+    def _get_hedge_delay(self, i_model: int) -> float | None:
+        with self._lock:
+            stats = self._stats[i_model]
+            if len(stats.latencies) < self.config.hedge_min_samples:
+                return None
+            return stats.percentile(self.config.hedge_percentile)
+
+    def _hedged_query(self, i_primary: int, i_secondary: int | None, *args, **kwargs) -> dict:
+        assert self._executor is not None
+        futures = {self._executor.submit(self._timed_query, i_primary, *args, **kwargs): i_primary}
+        if i_secondary is not None and (delay := self._get_hedge_delay(i_primary)) is not None:
+            done, _ = concurrent.futures.wait(futures, timeout=delay)
+            if not done:
+                logger.debug(f"Hedging query to backend {i_primary} after {delay:.2f}s with backend {i_secondary}")
+                futures[self._executor.submit(self._timed_query, i_secondary, *args, **kwargs)] = i_secondary
+        pending = set(futures)
+        exception: BaseException | None = None
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if (exception := future.exception()) is None:
+                    self._track_losing_queries(pending)
+                    response = future.result()
+                    response["model_name"] = self.models[futures[future]].config.model_name
+                    response["hedged"] = len(futures) > 1
+                    return response
+        assert exception is not None
+        raise exception
+
+    def _track_losing_queries(self, futures: set[concurrent.futures.Future]) -> None:
+        with self._lock:
+            self._losing_queries |= futures
+        for future in futures:
+            future.add_done_callback(self._forget_losing_query)
+
+    def _forget_losing_query(self, future: concurrent.futures.Future) -> None:
+        with self._lock:
+            self._losing_queries.discard(future)
+
+    def query(self, *args, **kwargs) -> dict:
+        ranking = self.rank_models()
+        exception: Exception | None = None
+        while ranking:
+            i_model = ranking.pop(0)
+            try:
+                if self._executor is not None:
+                    return self._hedged_query(i_model, ranking[0] if ranking else None, *args, **kwargs)
+                response = self._timed_query(i_model, *args, **kwargs)
+                response["model_name"] = self.models[i_model].config.model_name
+                return response
+            except Exception as e:
+                logger.warning(f"Query to backend {self.models[i_model].config.model_name} failed: {e}")
+                exception = e
+        assert exception is not None
+        raise exception
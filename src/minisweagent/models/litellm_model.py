@@ -5,21 +5,47 @@ from dataclasses import asdict, dataclass, field
 from pathlib import Path
 from typing import Any, Literal
 
-import litellm
 from tenacity import (
-    before_sleep_log,
     retry,
-    retry_if_not_exception_type,
+    retry_if_exception,
     stop_after_attempt,
     wait_exponential,
 )
 
 from minisweagent.models import GLOBAL_MODEL_STATS
 from minisweagent.models.utils.cache_control import set_cache_control
+from minisweagent.models.utils.pricing import CostCalculator
 
 logger = logging.getLogger("litellm_model")
 
 
+def _is_retryable(exception: BaseException) -> bool:
+    # litellm takes seconds to import, so it's only imported once a model is actually used
+    import litellm
+
+    return not isinstance(
+        exception,
+        (
+            litellm.exceptions.UnsupportedParamsError,
+            litellm.exceptions.NotFoundError,
+            litellm.exceptions.PermissionDeniedError,
+            litellm.exceptions.ContextWindowExceededError,
+            litellm.exceptions.APIError,
+            litellm.exceptions.AuthenticationError,
+            KeyboardInterrupt,
+        ),
+    )
+
+
+def _get_provider(model_name: str) -> str:
+    import litellm
+
+    try:
+        return litellm.get_llm_provider(model_name)[1]
+    except Exception:
+        return model_name.split("/", 1)[0] if "/" in model_name else ""
+
+
 @dataclass
 class LitellmModelConfig:
     model_name: str
@@ -27,6 +53,8 @@ class LitellmModelConfig:
     litellm_model_registry: Path | str | None = os.getenv("LITELLM_MODEL_REGISTRY_PATH")
     set_cache_control: Literal["default_end"] | None = None
     """Set explicit cache control markers, for example for Anthropic models"""
+    cost_validation: bool = os.getenv("MSWEA_COST_VALIDATION", "false") == "true"
+    """Cross-check every cost calculated from the price table with litellm (slower)."""
 
 
 class LitellmModel:
@@ -35,25 +63,21 @@ class LitellmModel:
         self.cost = 0.0
         self.n_calls = 0
         if self.config.litellm_model_registry and Path(self.config.litellm_model_registry).is_file():
+            import litellm
+
             litellm.utils.register_model(json.loads(Path(self.config.litellm_model_registry).read_text()))
+        self._cost_calculator = CostCalculator(self.config.model_name, validate=self.config.cost_validation)
+        self._provider = _get_provider(self.config.model_name)
 
     @retry(
         stop=stop_after_attempt(10),
         wait=wait_exponential(multiplier=1, min=4, max=60),
-        before_sleep=before_sleep_log(logger, logging.WARNING),
-        retry=retry_if_not_exception_type(
-            (
-                litellm.exceptions.UnsupportedParamsError,
-                litellm.exceptions.NotFoundError,
-                litellm.exceptions.PermissionDeniedError,
-                litellm.exceptions.ContextWindowExceededError,
-                litellm.exceptions.APIError,
-                litellm.exceptions.AuthenticationError,
-                KeyboardInterrupt,
-            )
-        ),
+        before_sleep=GLOBAL_MODEL_STATS.get_before_sleep_hook(logger),
+        retry=retry_if_exception(_is_retryable),
     )
     def _query(self, messages: list[dict[str, str]], **kwargs):
+        import litellm
+
         try:
             return litellm.completion(
                 model=self.config.model_name, messages=messages, **(self.config.model_kwargs | kwargs)
@@ -67,7 +91,7 @@ class LitellmModel:
             messages = set_cache_control(messages, mode=self.config.set_cache_control)
         response = self._query(messages, **kwargs)
         try:
-            cost = litellm.cost_calculator.completion_cost(response)
+            cost = self._cost_calculator.get_cost(response)
         except Exception as e:
             logger.critical(
                 f"Error calculating cost for model {self.config.model_name}: {e}. "
@@ -78,7 +102,13 @@ class LitellmModel:
         self.n_calls += 1
         assert cost >= 0.0, f"Cost is negative: {cost}"
         self.cost += cost
-        GLOBAL_MODEL_STATS.add(cost)
+        GLOBAL_MODEL_STATS.add(
+            cost,
+            model_name=self.config.model_name,
+            provider=self._provider,
+            input_tokens=getattr(response.usage, "prompt_tokens", 0),
+            output_tokens=getattr(response.usage, "completion_tokens", 0),
+        )
         return {
             "content": response.choices[0].message.content or "",  # type: ignore
             "extra": {
@@ -86,5 +116,17 @@ class LitellmModel:
             },
         }
 
+    def get_context_limit(self) -> int | None:
+        """Maximum number of input tokens according to litellm's model registry (None if unknown).
+        `max_tokens` is not used as a fallback, because it is the output token limit for many models.
+        """
+        import litellm
+
+        try:
+            info = litellm.get_model_info(self.config.model_name)
+        except Exception:
+            return None
+        return info.get("max_input_tokens") or None
+
     def get_template_vars(self) -> dict[str, Any]:
         return asdict(self.config) | {"n_model_calls": self.n_calls, "model_cost": self.cost}
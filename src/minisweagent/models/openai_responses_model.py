@@ -0,0 +1,250 @@
+"""Model that keeps the conversation on the server (OpenAI Responses API) and only sends new messages.
+
+Other models send the whole history with every query, so the request size grows with every step.
+This model passes the id of the previous response (`previous_response_id`) instead and only sends the messages
+that were added since then. If the history was changed in between (e.g., compacted) or the server no longer has
+the previous response, the full history is sent instead.
+
+The Responses API only accepts text, so template blocks (e.g., the instance prompt and the observations of
+`DefaultAgent`) are rendered with `render_template`, which the agent sets to its own templates.
+"""
+
+import json
+import logging
+import os
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field
+from types import SimpleNamespace
+from typing import Any
+
+import requests
+from tenacity import (
+    retry,
+    retry_if_not_exception_type,
+    stop_after_attempt,
+    wait_exponential,
+)
+
+from minisweagent.models import GLOBAL_MODEL_STATS
+from minisweagent.models.utils.pricing import ModelPrices, get_model_prices
+from minisweagent.models.utils.tokens import get_message_text
+
+logger = logging.getLogger("openai_responses_model")
+
+
+@dataclass
+class OpenAIResponsesModelConfig:
+    model_name: str
+    model_kwargs: dict[str, Any] = field(default_factory=dict)
+    prices: str | dict[str, float] | None = None
+    """Only used if the server does not report the cost of a response itself. Either a litellm model name or
+    per-token prices in USD with the keys of `ModelPrices` (default: look up `model_name` in litellm's registry).
+    """
+    delta_requests: bool = True
+    """Only send the new messages (with `previous_response_id`). If False, always send the full history."""
+
+
+class OpenAIResponsesAPIError(Exception):
+    """Custom exception for Responses API errors."""
+
+    pass
+
+
+class OpenAIResponsesAuthenticationError(Exception):
+    """Custom exception for Responses API authentication errors."""
+
+    pass
+
+
+class OpenAIResponsesRateLimitError(Exception):
+    """Custom exception for Responses API rate limit errors."""
+
+    pass
+
+
+class PreviousResponseNotFoundError(Exception):
+    """The server no longer has the conversation state of the previous response."""
+
+    pass
+
+
+def _is_previous_response_missing(response: requests.Response) -> bool:
+    try:
+        error = response.json().get("error") or {}
+    except (ValueError, AttributeError):
+        error = {}
+    if not isinstance(error, dict):
+        error = {}
+    if error.get("code") == "previous_response_not_found":
+        return True
+    message = str(error.get("message") or response.text).lower()
+    return "previous response" in message and "not found" in message
+
+
+def _get_output_text(response: dict) -> str:
+    return "".join(
+        block.get("text", "")
+        for item in response.get("output", [])
+        if item.get("type") == "message"
+        for block in item.get("content", [])
+        if block.get("type") == "output_text"
+    )
+
+
+class OpenAIResponsesModel:
+    def __init__(self, **kwargs):
+        self.config = OpenAIResponsesModelConfig(**kwargs)
+        self.cost = 0.0
+        self.n_calls = 0
+        self.n_delta_requests = 0
+        self.n_full_requests = 0
+        self._api_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/") + "/responses"
+        self._api_key = os.getenv("OPENAI_API_KEY", "")
+        self._prices: ModelPrices | None = None
+        # Conversation state of the previous response
+        self._previous_response_id: str | None = None
+        self._sent: list[dict] = []
+        """All messages up to the previous response (kept alive so that they can be compared by identity)"""
+        self._previous_output = ""
+        self.render_template: Callable[[dict], str] | None = None
+        """Renders template blocks (set by the agent, see `DefaultAgent.render_template_block`)"""
+
+    @retry(
+        stop=stop_after_attempt(10),
+        wait=wait_exponential(multiplier=1, min=4, max=60),
+        before_sleep=GLOBAL_MODEL_STATS.get_before_sleep_hook(logger),
+        retry=retry_if_not_exception_type(
+            (
+                OpenAIResponsesAuthenticationError,
+                PreviousResponseNotFoundError,
+                KeyboardInterrupt,
+            )
+        ),
+    )
+    def _query(self, input_items: list[dict], previous_response_id: str | None = None, **kwargs) -> dict:
+        headers = {
+            "Authorization": f"Bearer {self._api_key}",
+            "Content-Type": "application/json",
+        }
+        payload = {
+            "model": self.config.model_name,
+            "input": input_items,
+            "store": self.config.delta_requests,
+            **(self.config.model_kwargs | kwargs),
+        }
+        if previous_response_id is not None:
+            payload["previous_response_id"] = previous_response_id
+
+        try:
+            response = requests.post(self._api_url, headers=headers, data=json.dumps(payload), timeout=60)
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.HTTPError as e:
+            if response.status_code == 401:
+                error_msg = "Authentication failed. You can permanently set your API key with `mini-extra config set OPENAI_API_KEY YOUR_KEY`."
+                raise OpenAIResponsesAuthenticationError(error_msg) from e
+            elif response.status_code == 429:
+                raise OpenAIResponsesRateLimitError("Rate limit exceeded") from e
+            elif previous_response_id is not None and _is_previous_response_missing(response):
+                raise PreviousResponseNotFoundError(response.text) from e
+            else:
+                raise OpenAIResponsesAPIError(f"HTTP {response.status_code}: {response.text}") from e
+        except requests.exceptions.RequestException as e:
+            raise OpenAIResponsesAPIError(f"Request failed: {e}") from e
+
+    def _to_input_item(self, message: dict) -> dict:
+        content = message.get("content")
+        if isinstance(content, list) and any(isinstance(b, dict) and b.get("type") == "template" for b in content):
+            if self.render_template is None:
+                raise OpenAIResponsesAPIError(
+                    "Cannot send template blocks to the Responses API without `render_template` "
+                    "(set by the agent to render them with its templates)."
+                )
+            content = [
+                {"type": "text", "text": self.render_template(b)}
+                if isinstance(b, dict) and b.get("type") == "template"
+                else b
+                for b in content
+            ]
+        return {"role": message["role"], "content": get_message_text(message | {"content": content})}
+
+    def _get_new_messages(self, messages: list[dict]) -> list[dict] | None:
+        """Messages since the previous response, or None if the history doesn't continue the previous response."""
+        n_sent = len(self._sent)
+        if not self.config.delta_requests or self._previous_response_id is None or len(messages) <= n_sent + 1:
+            return None
+        if any(sent is not message and sent != message for sent, message in zip(self._sent, messages)):
+            return None
+        reply = messages[n_sent]
+        if reply.get("role") != "assistant" or get_message_text(reply) != self._previous_output:
+            return None
+        return messages[n_sent + 1 :]
+
+    def _get_cost(self, usage: dict) -> float:
+        if usage.get("cost") is not None:
+            return usage["cost"]
+        if self._prices is None:
+            prices = self.config.prices if self.config.prices is not None else self.config.model_name
+            try:
+                self._prices = get_model_prices(prices) if isinstance(prices, str) else ModelPrices(**prices)
+            except Exception as e:
+                raise OpenAIResponsesAPIError(
+                    f"No cost information available for model {self.config.model_name}: The server did not report "
+                    "the cost and no prices are known. Please set `prices` in the model config."
+                ) from e
+        cached_tokens = (usage.get("input_tokens_details") or {}).get("cached_tokens", 0)
+        openai_style_usage = SimpleNamespace(
+            prompt_tokens=usage.get("input_tokens", 0),
+            completion_tokens=usage.get("output_tokens", 0),
+            cache_read_input_tokens=cached_tokens,
+        )
+        return self._prices.get_cost(openai_style_usage)
+
+    def query(self, messages: list[dict[str, Any]], **kwargs) -> dict:
+        response = None
+        if (new_messages := self._get_new_messages(messages)) is not None:
+            try:
+                response = self._query(
+                    [self._to_input_item(m) for m in new_messages],
+                    previous_response_id=self._previous_response_id,
+                    **kwargs,
+                )
+                self.n_delta_requests += 1
+            except PreviousResponseNotFoundError as e:
+                logger.warning(f"Previous response is no longer available, sending full history: {e}")
+        if response is None:
+            response = self._query([self._to_input_item(m) for m in messages], **kwargs)
+            self.n_full_requests += 1
+
+        usage = response.get("usage") or {}
+        cost = self._get_cost(usage)
+        assert cost >= 0.0, f"Cost is negative: {cost}"
+        self.n_calls += 1
+        self.cost += cost
+        GLOBAL_MODEL_STATS.add(
+            cost,
+            model_name=self.config.model_name,
+            provider="openai",
+            input_tokens=usage.get("input_tokens", 0),
+            output_tokens=usage.get("output_tokens", 0),
+        )
+
+        content = _get_output_text(response)
+        self._previous_response_id = response.get("id")
+        self._sent = list(messages)
+        self._previous_output = content
+        return {
+            "content": content,
+            "extra": {
+                "response": response,  # already is json
+                "input_tokens": usage.get("input_tokens"),
+            },
+        }
+
+    def get_template_vars(self) -> dict[str, Any]:
+        return asdict(self.config) | {
+            "n_model_calls": self.n_calls,
+            "model_cost": self.cost,
+            "n_delta_requests": self.n_delta_requests,
+            "n_full_requests": self.n_full_requests,
+        }
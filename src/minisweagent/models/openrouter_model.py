@@ -6,7 +6,6 @@ from typing import Any, Literal
 
 import requests
 from tenacity import (
-    before_sleep_log,
     retry,
     retry_if_not_exception_type,
     stop_after_attempt,
@@ -50,13 +49,13 @@ class OpenRouterModel:
         self.config = OpenRouterModelConfig(**kwargs)
         self.cost = 0.0
         self.n_calls = 0
-        self._api_url = "https://openrouter.ai/api/v1/chat/completions"
+        self._api_url = os.getenv("OPENROUTER_API_URL", "https://openrouter.ai/api/v1/chat/completions")
         self._api_key = os.getenv("OPENROUTER_API_KEY", "")
 
     @retry(
         stop=stop_after_attempt(10),
         wait=wait_exponential(multiplier=1, min=4, max=60),
-        before_sleep=before_sleep_log(logger, logging.WARNING),
+        before_sleep=GLOBAL_MODEL_STATS.get_before_sleep_hook(logger),
         retry=retry_if_not_exception_type(
             (
                 OpenRouterAuthenticationError,
@@ -111,7 +110,13 @@ class OpenRouterModel:
 
         self.n_calls += 1
         self.cost += cost
-        GLOBAL_MODEL_STATS.add(cost)
+        GLOBAL_MODEL_STATS.add(
+            cost,
+            model_name=self.config.model_name,
+            provider="openrouter",
+            input_tokens=usage.get("prompt_tokens", 0),
+            output_tokens=usage.get("completion_tokens", 0),
+        )
 
         return {
             "content": response["choices"][0]["message"]["content"] or "",
@@ -7,7 +7,6 @@ from typing import Any, Literal
 
 import litellm
 from tenacity import (
-    before_sleep_log,
     retry,
     retry_if_not_exception_type,
     stop_after_attempt,
@@ -16,6 +15,7 @@ from tenacity import (
 
 from minisweagent.models import GLOBAL_MODEL_STATS
 from minisweagent.models.utils.cache_control import set_cache_control
+from minisweagent.models.utils.pricing import CostCalculator
 
 logger = logging.getLogger("portkey_model")
 
@@ -40,6 +40,8 @@ class PortkeyModelConfig:
     """
     set_cache_control: Literal["default_end"] | None = None
     """Set explicit cache control markers, for example for Anthropic models"""
+    cost_validation: bool = os.getenv("MSWEA_COST_VALIDATION", "false") == "true"
+    """Cross-check every cost calculated from the price table with litellm (slower)."""
 
 
 class PortkeyModel:
@@ -53,6 +55,9 @@ class PortkeyModel:
         self.n_calls = 0
         if self.config.litellm_model_registry and Path(self.config.litellm_model_registry).is_file():
             litellm.utils.register_model(json.loads(Path(self.config.litellm_model_registry).read_text()))
+        self._cost_calculator = CostCalculator(
+            self.config.litellm_model_name_override or self.config.model_name, validate=self.config.cost_validation
+        )
 
         # Get API key from environment or raise error
         self._api_key = os.getenv("PORTKEY_API_KEY")
@@ -76,7 +81,7 @@ class PortkeyModel:
     @retry(
         stop=stop_after_attempt(10),
         wait=wait_exponential(multiplier=1, min=4, max=60),
-        before_sleep=before_sleep_log(logger, logging.WARNING),
+        before_sleep=GLOBAL_MODEL_STATS.get_before_sleep_hook(logger),
         retry=retry_if_not_exception_type((KeyboardInterrupt, TypeError, ValueError)),
     )
     def _query(self, messages: list[dict[str, str]], **kwargs):
@@ -91,28 +96,23 @@ class PortkeyModel:
         if self.config.set_cache_control:
             messages = set_cache_control(messages, mode=self.config.set_cache_control)
         response = self._query(messages, **kwargs)
-        response_for_cost_calc = response.model_copy()
-        if self.config.litellm_model_name_override:
-            if response_for_cost_calc.model:
-                response_for_cost_calc.model = self.config.litellm_model_name_override
-        prompt_tokens = response_for_cost_calc.usage.prompt_tokens
-        total_tokens = response_for_cost_calc.usage.total_tokens
-        completion_tokens = response_for_cost_calc.usage.completion_tokens
-        if total_tokens - prompt_tokens - completion_tokens != 0:
+        usage = response.usage
+        prompt_tokens = usage.prompt_tokens
+        if usage.total_tokens - prompt_tokens - usage.completion_tokens != 0:
             # This is most likely related to how portkey treats cached tokens: It doesn't count them towards the prompt tokens (?)
             logger.warning(
-                f"WARNING: Total tokens - prompt tokens - completion tokens != 0: {response_for_cost_calc.model_dump()}."
+                f"WARNING: Total tokens - prompt tokens - completion tokens != 0: {response.model_dump()}."
                 " This is probably a portkey bug or incompatibility with litellm cost tracking. "
                 "Setting prompt tokens based on total tokens and completion tokens. You might want to double check your costs."
             )
-            response_for_cost_calc.usage.prompt_tokens = total_tokens - completion_tokens
+            prompt_tokens = usage.total_tokens - usage.completion_tokens
         try:
-            cost = litellm.cost_calculator.completion_cost(
-                response_for_cost_calc, model=self.config.litellm_model_name_override or None
+            cost = self._cost_calculator.get_cost(
+                response, prompt_tokens=prompt_tokens, model=self.config.litellm_model_name_override or None
             )
         except Exception as e:
             logger.critical(
-                f"Error calculating cost for model {self.config.model_name} based on {response_for_cost_calc.model_dump()}: {e}. "
+                f"Error calculating cost for model {self.config.model_name} based on {response.model_dump()}: {e}. "
                 "Please check the 'Updating the model registry' section in the documentation at "
                 "https://klieret.short.gy/litellm-model-registry Still stuck? Please open a github issue for help!"
             )
@@ -121,7 +121,13 @@ class PortkeyModel:
 
         self.n_calls += 1
         self.cost += cost
-        GLOBAL_MODEL_STATS.add(cost)
+        GLOBAL_MODEL_STATS.add(
+            cost,
+            model_name=self.config.model_name,
+            provider="portkey",
+            input_tokens=prompt_tokens,
+            output_tokens=usage.completion_tokens,
+        )
 
         return {
             "content": response.choices[0].message.content or "",
@@ -1,75 +1,151 @@
+import asyncio
 import logging
 import os
-from dataclasses import asdict, dataclass
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
+from types import SimpleNamespace
 from typing import Any
-from tensorzero import TensorZeroGateway
+
+from tensorzero import AsyncTensorZeroGateway, TensorZeroGateway
 from tensorzero.util import uuid7
 
 from minisweagent.models import GLOBAL_MODEL_STATS
+from minisweagent.models.utils.pricing import ModelPrices, get_model_prices
 
 logger = logging.getLogger("tensorzero_model")
 
 
 @dataclass
 class TensorZeroModelConfig:
-    config_file: Path
+    config_file: Path | None = None
+    """TensorZero config file for the embedded gateway (None when using an HTTP gateway)"""
+    function_name: str = "swe_agent"
+    prices: dict[str, str | dict[str, float]] = field(default_factory=dict)
+    """Prices per variant name (or "default" for all other variants). Values are either litellm model names
+    (e.g., "anthropic/claude-sonnet-4-5-20250929") or per-token prices in USD with the keys of `ModelPrices`
+    (e.g., {"input": 3e-6, "output": 1.5e-5, "cache_read": 3e-7}).
+    Only used if the gateway does not report the cost of an inference itself.
+    """
 
 
 class TensorZeroModel:
     def __init__(self, **kwargs):
         # Extract tags if provided
         self.tags = kwargs.pop("tags", {})
+        # Remove model_kwargs and model_name if present since TensorZero doesn't use them
+        kwargs = {k: v for k, v in kwargs.items() if k not in ("model_kwargs", "model_name")}
 
         # Check for HTTP gateway mode
-        gateway_url = os.getenv("TENSORZERO_GATEWAY_URL")
-
-        if gateway_url:
+        self._gateway_url = os.getenv("TENSORZERO_GATEWAY_URL")
+        self._clickhouse_url = os.getenv("TENSORZERO_CLICKHOUSE_URL")
+        if self._gateway_url:
             # HTTP gateway mode - config file not required
-            self.client = TensorZeroGateway.build_http(gateway_url=gateway_url)
-            self.config = None
+            kwargs["config_file"] = None
         else:
-            # Embedded gateway mode - existing logic
-            # Remove model_kwargs and model_name if present since TensorZero doesn't use them
-            kwargs_for_config = {k: v for k, v in kwargs.items()
-                                 if k not in ("model_kwargs", "model_name")}
-
+            # Embedded gateway mode
             # Determine config file path with priority: env var > kwarg > default bundled config
-            config_file_path = (
+            kwargs["config_file"] = Path(
                 os.getenv("TENSORZERO_CONFIG_PATH")
-                or kwargs_for_config.get("config_file")
-                or str(Path(__file__).parent / "config" / "tensorzero.toml")
-            )
-            # Convert to absolute path
-            config_file_path = Path(config_file_path).resolve()
-
-            # Update kwargs with resolved path
-            kwargs_for_config["config_file"] = config_file_path
-
-            self.config = TensorZeroModelConfig(**kwargs_for_config)
-            clickhouse_url = os.getenv("TENSORZERO_CLICKHOUSE_URL")
+                or kwargs.get("config_file")
+                or Path(__file__).parent / "config" / "tensorzero.toml"
+            ).resolve()
+        self.config = TensorZeroModelConfig(**kwargs)
 
+        if self._gateway_url:
+            self.client = TensorZeroGateway.build_http(gateway_url=self._gateway_url)
+        else:
             # Use native TensorZero client with embedded gateway
             self.client = TensorZeroGateway.build_embedded(
-                config_file=str(self.config.config_file), clickhouse_url=clickhouse_url
+                config_file=str(self.config.config_file), clickhouse_url=self._clickhouse_url
             )
+        self._async_client: AsyncTensorZeroGateway | None = None
+        self._async_client_loop: asyncio.AbstractEventLoop | None = None
 
+        self._prices: dict[str, ModelPrices] = {
+            name: get_model_prices(prices) if isinstance(prices, str) else ModelPrices(**prices)
+            for name, prices in self.config.prices.items()
+        }
         self.cost = 0.0
         self.n_calls = 0
         self.episode_id = uuid7()
+        self.inferences: list[dict[str, Any]] = []
+        """Metadata of all inferences of this episode"""
 
-    def query(self, messages: list[dict[str, Any]], **kwargs) -> dict:
-        # Use native TensorZero inference API
+    def _get_inference_kwargs(self, messages: list[dict[str, Any]], **kwargs) -> dict[str, Any]:
         inference_kwargs = {"tags": self.tags} if self.tags else {}
         inference_kwargs.update(kwargs)
-        response = self.client.inference(
-            function_name="swe_agent", input={"messages": messages}, episode_id=str(self.episode_id), **inference_kwargs
+        return {
+            "function_name": self.config.function_name,
+            "input": {"messages": messages},
+            "episode_id": str(self.episode_id),
+            **inference_kwargs,
+        }
+
+    def query(self, messages: list[dict[str, Any]], **kwargs) -> dict:
+        response = self.client.inference(**self._get_inference_kwargs(messages, **kwargs))
+        return self._process_response(response)
+
+    async def _get_async_client(self) -> AsyncTensorZeroGateway:
+        # The client is bound to the event loop that it was created in
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client_loop is not loop:
+            if self._gateway_url:
+                client = AsyncTensorZeroGateway.build_http(gateway_url=self._gateway_url, async_setup=True)
+            else:
+                client = AsyncTensorZeroGateway.build_embedded(
+                    config_file=str(self.config.config_file), clickhouse_url=self._clickhouse_url, async_setup=True
+                )
+            self._async_client = await client  # type: ignore[misc]
+            self._async_client_loop = loop
+        return self._async_client  # type: ignore[return-value]
+
+    async def aquery(self, messages: list[dict[str, Any]], **kwargs) -> dict:
+        """Like `query`, but uses TensorZero's async gateway."""
+        client = await self._get_async_client()
+        response = await client.inference(**self._get_inference_kwargs(messages, **kwargs))
+        return self._process_response(response)
+
+    def _get_cost(self, response: Any) -> float:
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return 0.0
+        if getattr(usage, "cost", None) is not None:
+            return usage.cost
+        prices = self._prices.get(response.variant_name, self._prices.get("default"))
+        if prices is None:
+            return 0.0
+        cache_read = usage.provider_cache_read_input_tokens or 0
+        cache_write = usage.provider_cache_write_input_tokens or 0
+        openai_style_usage = SimpleNamespace(
+            prompt_tokens=usage.input_tokens,
+            completion_tokens=usage.output_tokens,
+            cache_read_input_tokens=cache_read,
+            cache_creation_input_tokens=cache_write,
         )
+        return prices.get_cost(openai_style_usage)
 
-        cost = 0
+    def _process_response(self, response: Any) -> dict:
+        cost = self._get_cost(response)
+        assert cost >= 0.0, f"Cost is negative: {cost}"
         self.n_calls += 1
         self.cost += cost
-        GLOBAL_MODEL_STATS.add(cost)
+        usage = getattr(response, "usage", None)
+        GLOBAL_MODEL_STATS.add(
+            cost,
+            model_name=response.variant_name,
+            provider="tensorzero",
+            input_tokens=getattr(usage, "input_tokens", 0),
+            output_tokens=getattr(usage, "output_tokens", 0),
+        )
+
+        inference = {
+            "inference_id": str(response.inference_id),
+            "variant_name": response.variant_name,
+            "input_tokens": getattr(usage, "input_tokens", None),
+            "output_tokens": getattr(usage, "output_tokens", None),
+            "cost": cost,
+        }
+        self.inferences.append(inference)
 
         # Extract content from TensorZero response
         # Build structured content blocks and extract text for action parsing
@@ -88,18 +164,15 @@ class TensorZeroModel:
                 content_blocks.append(thought_block)
             # Ignore unknown types for now
 
-        print("Agent: ", text_content)
-
-        # Write episode_id to .episode_id file
-        Path(".episode_id").write_text(str(self.episode_id))
-
         return {
             "content": text_content,  # Plain text for action parsing
             "content_blocks": content_blocks,  # Structured for message history
+            "extra": inference,
         }
 
+    def get_episode_info(self) -> dict[str, Any]:
+        """Episode metadata to be saved with the trajectory."""
+        return {"episode_id": str(self.episode_id), "inferences": list(self.inferences)}
+
     def get_template_vars(self) -> dict[str, Any]:
-        base_vars = {"n_model_calls": self.n_calls, "model_cost": self.cost}
-        if self.config:
-            return asdict(self.config) | base_vars
-        return base_vars
+        return asdict(self.config) | {"n_model_calls": self.n_calls, "model_cost": self.cost}
@@ -35,7 +35,7 @@ class DeterministicModel:
             return self.query(messages, **kwargs)
         self.n_calls += 1
         self.cost += self.config.cost_per_call
-        GLOBAL_MODEL_STATS.add(self.config.cost_per_call)
+        GLOBAL_MODEL_STATS.add(self.config.cost_per_call, model_name=self.config.model_name)
         return {"content": output}
 
     def get_template_vars(self) -> dict[str, Any]:
@@ -0,0 +1,132 @@
+"""Cost calculation from per-token prices that are looked up once per model.
+
+`litellm.cost_calculator.completion_cost` resolves the model name and looks up the model registry
+on every call. Instead, `CostCalculator` resolves the prices once (from litellm's model registry,
+including models registered via `litellm_model_registry`) and then only multiplies usage counts.
+"""
+
+import logging
+import math
+from dataclasses import dataclass
+from typing import Any
+
+logger = logging.getLogger("minisweagent.pricing")
+
+LONG_CONTEXT_THRESHOLD = 200_000
+"""Number of prompt tokens above which the `*_above_200k_tokens` prices apply."""
+
+
+@dataclass(frozen=True)
+class ModelPrices:
+    """Prices in USD per token. Optional prices default to the input/output price."""
+
+    input: float
+    output: float
+    cache_read: float | None = None
+    cache_write: float | None = None
+    reasoning: float | None = None
+    long_context: "ModelPrices | None" = None
+    """Prices that apply to requests with more than `LONG_CONTEXT_THRESHOLD` prompt tokens"""
+
+    @classmethod
+    def from_model_info(cls, info: dict[str, Any], *, suffix: str = "") -> "ModelPrices":
+        """Create prices from a litellm model registry entry."""
+        if info.get(f"input_cost_per_token{suffix}") is None or info.get(f"output_cost_per_token{suffix}") is None:
+            raise ValueError(f"No input/output token prices{suffix} in model info")
+        long_context = None
+        if not suffix and info.get("input_cost_per_token_above_200k_tokens") is not None:
+            fallback = {
+                f"{key}_above_200k_tokens": info[key]
+                for key in ["output_cost_per_token", "cache_read_input_token_cost", "cache_creation_input_token_cost"]
+                if info.get(key) is not None
+            }
+            long_context = cls.from_model_info(
+                fallback | {k: v for k, v in info.items() if v is not None}, suffix="_above_200k_tokens"
+            )
+        return cls(
+            input=info[f"input_cost_per_token{suffix}"],
+            output=info[f"output_cost_per_token{suffix}"],
+            cache_read=info.get(f"cache_read_input_token_cost{suffix}"),
+            cache_write=info.get(f"cache_creation_input_token_cost{suffix}"),
+            reasoning=info.get("output_cost_per_reasoning_token"),
+            long_context=long_context,
+        )
+
+    def get_cost(self, usage: Any, *, prompt_tokens: int | None = None) -> float:
+        """Calculate the cost of a call from its (OpenAI-style) usage object.
+
+        Args:
+            usage: `response.usage`
+            prompt_tokens: Overrides `usage.prompt_tokens`
+        """
+        if prompt_tokens is None:
+            prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+        if self.long_context is not None and prompt_tokens > LONG_CONTEXT_THRESHOLD:
+            return self.long_context.get_cost(usage, prompt_tokens=prompt_tokens)
+        prompt_details = getattr(usage, "prompt_tokens_details", None)
+        cache_read = getattr(prompt_details, "cached_tokens", None) or getattr(usage, "cache_read_input_tokens", 0) or 0
+        cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+        completion_tokens = getattr(usage, "completion_tokens", None) or 0
+        reasoning_tokens = getattr(getattr(usage, "completion_tokens_details", None), "reasoning_tokens", None) or 0
+        uncached = max(prompt_tokens - cache_read - cache_write, 0)
+        input_cost = (
+            uncached * self.input
+            + cache_read * (self.input if self.cache_read is None else self.cache_read)
+            + cache_write * (self.input if self.cache_write is None else self.cache_write)
+        )
+        output_cost = (completion_tokens - reasoning_tokens) * self.output + reasoning_tokens * (
+            self.output if self.reasoning is None else self.reasoning
+        )
+        return input_cost + output_cost
+
+
+def get_model_prices(model_name: str) -> ModelPrices:
+    """Look up the prices of a model in litellm's model registry."""
+    import litellm
+
+    return ModelPrices.from_model_info(dict(litellm.get_model_info(model_name)))
+
+
+class CostCalculator:
+    def __init__(self, model_name: str, *, validate: bool = False):
+        """Calculates the cost of model calls from prices that are resolved once.
+        If the model is not in litellm's registry, falls back to `litellm.cost_calculator.completion_cost`.
+
+        Args:
+            model_name: Name of the model in litellm's model registry
+            validate: Also calculate every cost with litellm, warn about differences and return litellm's cost
+        """
+        self.model_name = model_name
+        self.validate = validate
+        self.prices: ModelPrices | None = None
+        try:
+            self.prices = get_model_prices(model_name)
+        except Exception as e:
+            logger.debug(f"No prices for {model_name!r}, will calculate costs with litellm for every call: {e}")
+
+    def get_cost(self, response: Any, *, prompt_tokens: int | None = None, **litellm_kwargs) -> float:
+        """Calculate the cost of a model response.
+
+        Args:
+            response: The (OpenAI-style) response of the model
+            prompt_tokens: Overrides `response.usage.prompt_tokens`
+            **litellm_kwargs: Passed on to `litellm.cost_calculator.completion_cost`
+        """
+        cost = None
+        if self.prices is not None:
+            cost = self.prices.get_cost(response.usage, prompt_tokens=prompt_tokens)
+            if not self.validate:
+                return cost
+        litellm_cost = self._get_litellm_cost(response, prompt_tokens=prompt_tokens, **litellm_kwargs)
+        if cost is not None and not math.isclose(cost, litellm_cost, rel_tol=1e-6, abs_tol=1e-12):
+            logger.warning(f"Cost mismatch for {self.model_name}: price table ${cost:.6f}, litellm ${litellm_cost:.6f}")
+        return litellm_cost
+
+    @staticmethod
+    def _get_litellm_cost(response: Any, *, prompt_tokens: int | None = None, **litellm_kwargs) -> float:
+        import litellm
+
+        if prompt_tokens is not None and prompt_tokens != response.usage.prompt_tokens:
+            response = response.model_copy(deep=True)
+            response.usage.prompt_tokens = prompt_tokens
+        return litellm.cost_calculator.completion_cost(response, **litellm_kwargs)
@@ -0,0 +1,229 @@
+"""Process-wide statistics of all model calls (cost, calls, tokens) with optional global limits.
+
+Every thread accumulates into its own shard, so model calls in different threads (e.g., in batch runs)
+don't contend for a common lock. Shards are merged when the statistics are read.
+Only if limits are set, calls also update shared totals under a lock, so that limits are checked atomically.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+from tenacity import before_sleep_log
+
+
+class GlobalLimitExceeded(RuntimeError):
+    """Raised when the global cost/call/token/time limit is exceeded."""
+
+
+@dataclass(frozen=True)
+class ModelUsage:
+    cost: float = 0.0
+    n_calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+    def __add__(self, other: "ModelUsage") -> "ModelUsage":
+        return ModelUsage(
+            cost=self.cost + other.cost,
+            n_calls=self.n_calls + other.n_calls,
+            input_tokens=self.input_tokens + other.input_tokens,
+            output_tokens=self.output_tokens + other.output_tokens,
+        )
+
+
+@dataclass(frozen=True)
+class ModelStatsSnapshot:
+    """Statistics at one point in time."""
+
+    total: ModelUsage
+    by_model: dict[str, ModelUsage] = field(default_factory=dict)
+    by_provider: dict[str, ModelUsage] = field(default_factory=dict)
+    elapsed: float = 0.0
+    """Seconds since the statistics were created or reset"""
+
+    @property
+    def cost(self) -> float:
+        return self.total.cost
+
+    @property
+    def n_calls(self) -> int:
+        return self.total.n_calls
+
+    def to_dict(self) -> dict:
+        return {
+            "total": asdict(self.total),
+            "by_model": {name: asdict(usage) for name, usage in self.by_model.items()},
+            "by_provider": {name: asdict(usage) for name, usage in self.by_provider.items()},
+            "elapsed": self.elapsed,
+        }
+
+
+class _Shard:
+    def __init__(self, generation: int):
+        self.generation = generation
+        # Only contended while the shard is being read
+        self.lock = threading.Lock()
+        self.usage: dict[tuple[str, str], list] = {}
+        """(model name, provider) -> [cost, n_calls, input tokens, output tokens]"""
+
+    def add(self, key: tuple[str, str], cost: float, input_tokens: int, output_tokens: int) -> None:
+        with self.lock:
+            if (values := self.usage.get(key)) is None:
+                values = self.usage[key] = [0.0, 0, 0, 0]
+            values[0] += cost
+            values[1] += 1
+            values[2] += input_tokens
+            values[3] += output_tokens
+
+    def items(self) -> list[tuple[tuple[str, str], ModelUsage]]:
+        with self.lock:
+            return [(key, ModelUsage(*values)) for key, values in self.usage.items()]
+
+
+class GlobalModelStats:
+    """Global model statistics tracker with optional limits."""
+
+    def __init__(self):
+        self.cost_limit = float(os.getenv("MSWEA_GLOBAL_COST_LIMIT", "0"))
+        self.call_limit = int(os.getenv("MSWEA_GLOBAL_CALL_LIMIT", "0"))
+        self.token_limit = int(os.getenv("MSWEA_GLOBAL_TOKEN_LIMIT", "0"))
+        """Maximum number of input + output tokens"""
+        self.time_limit = float(os.getenv("MSWEA_GLOBAL_TIME_LIMIT", "0"))
+        """Maximum wall-clock time in seconds (since the statistics were created or reset)"""
+        self._local = threading.local()
+        self._shards: list[_Shard] = []
+        self._shards_lock = threading.Lock()
+        self._generation = 0
+        self._limit_lock = threading.Lock()
+        self._totals: ModelUsage | None = None
+        """Totals for checking limits. Only maintained while limits are set."""
+        self._start_time = time.monotonic()
+        self._errors: Counter[str] = Counter()
+        self._errors_lock = threading.Lock()
+        if not os.getenv("MSWEA_SILENT_STARTUP"):
+            if self.cost_limit > 0 or self.call_limit > 0:
+                print(f"Global cost/call limit: ${self.cost_limit:.4f} / {self.call_limit}")
+            if self.token_limit > 0 or self.time_limit > 0:
+                print(f"Global token/time limit: {self.token_limit} / {self.time_limit:.0f}s")
+
+    @property
+    def has_limits(self) -> bool:
+        return self.cost_limit > 0 or self.call_limit > 0 or self.token_limit > 0 or self.time_limit > 0
+
+    def _get_shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None or shard.generation != self._generation:
+            with self._shards_lock:
+                shard = _Shard(self._generation)
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def add(
+        self,
+        cost: float,
+        *,
+        model_name: str = "",
+        provider: str = "",
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+    ) -> None:
+        """Add a model call with its cost (and token usage), checking limits."""
+        shard = self._get_shard()
+        key, input_tokens, output_tokens = (model_name, provider), input_tokens or 0, output_tokens or 0
+        if not self.has_limits:
+            shard.add(key, cost, input_tokens, output_tokens)
+            # Totals are recomputed from the shards once limits are set (again)
+            self._totals = None
+            return
+        with self._limit_lock:
+            shard.add(key, cost, input_tokens, output_tokens)
+            if self._totals is None:
+                self._totals = self.snapshot().total
+            else:
+                self._totals += ModelUsage(cost, 1, input_tokens, output_tokens)
+            self._check_limits(self._totals)
+
+    def _check_limits(self, totals: ModelUsage) -> None:
+        elapsed = time.monotonic() - self._start_time
+        if 0 < self.cost_limit < totals.cost or 0 < self.call_limit <= totals.n_calls:
+            msg = f"Global cost/call limit exceeded: ${totals.cost:.4f} / {totals.n_calls} calls"
+        elif 0 < self.token_limit < totals.total_tokens:
+            msg = f"Global token limit exceeded: {totals.total_tokens} tokens"
+        elif 0 < self.time_limit < elapsed:
+            msg = f"Global time limit exceeded: {elapsed:.0f}s"
+        else:
+            return
+        raise GlobalLimitExceeded(msg)
+
+    def check_limits(self) -> None:
+        """Raise `GlobalLimitExceeded` if any limit is already exceeded (e.g., before making a call)."""
+        if self.has_limits:
+            self._check_limits(self.snapshot().total)
+
+    def snapshot(self) -> ModelStatsSnapshot:
+        """Merge the statistics of all threads."""
+        with self._shards_lock:
+            shards = list(self._shards)
+        total = ModelUsage()
+        by_model: dict[str, ModelUsage] = {}
+        by_provider: dict[str, ModelUsage] = {}
+        for shard in shards:
+            for (model_name, provider), usage in shard.items():
+                total += usage
+                by_model[model_name] = by_model.get(model_name, ModelUsage()) + usage
+                by_provider[provider] = by_provider.get(provider, ModelUsage()) + usage
+        return ModelStatsSnapshot(
+            total=total, by_model=by_model, by_provider=by_provider, elapsed=time.monotonic() - self._start_time
+        )
+
+    def add_error(self, error_type: str) -> None:
+        """Count a failed model call (e.g., a rate limit error that is retried)."""
+        with self._errors_lock:
+            self._errors[error_type] += 1
+
+    @property
+    def errors(self) -> dict[str, int]:
+        """Number of failed model calls by exception class name."""
+        with self._errors_lock:
+            return dict(self._errors)
+
+    def get_before_sleep_hook(self, logger: logging.Logger) -> Callable[[Any], None]:
+        """`before_sleep` hook for tenacity retries of model calls: Logs the error and counts it."""
+        log = before_sleep_log(logger, logging.WARNING)
+
+        def hook(retry_state) -> None:
+            if retry_state.outcome is not None and (exception := retry_state.outcome.exception()) is not None:
+                self.add_error(type(exception).__name__)
+            log(retry_state)
+
+        return hook
+
+    def reset(self) -> None:
+        """Discard all statistics and restart the clock of the time limit."""
+        # Same lock order as `add`
+        with self._limit_lock, self._shards_lock:
+            self._generation += 1
+            self._shards = []
+            self._totals = None
+            self._start_time = time.monotonic()
+        with self._errors_lock:
+            self._errors.clear()
+
+    @property
+    def cost(self) -> float:
+        return self.snapshot().cost
+
+    @property
+    def n_calls(self) -> int:
+        return self.snapshot().n_calls
@@ -0,0 +1,150 @@
+"""Local estimates of the number of prompt tokens of a message history.
+
+Used to check the context window before sending a query, so that an overlong history doesn't cost a full round trip
+that ends in a `ContextWindowExceededError`.
+"""
+
+import functools
+import json
+import logging
+from collections.abc import Callable
+from typing import Any
+
+logger = logging.getLogger("minisweagent.tokens")
+
+BYTES_PER_TOKEN = 3.5
+"""Average number of UTF-8 bytes per token for the fallback heuristic. Shell output and code tokenize worse than
+prose (~4 bytes per token), so this errs on the side of overestimating.
+"""
+
+TOKENS_PER_MESSAGE = 4
+"""Overhead of the chat format per message (role, separators)."""
+
+
+@functools.cache
+def _get_tiktoken_encode(encoding: str) -> Callable[[str], int] | None:
+    try:
+        import tiktoken
+
+        enc = tiktoken.get_encoding(encoding)
+    except Exception as e:
+        # tiktoken is optional and downloads its encodings on first use
+        logger.debug(f"Tokenizer {encoding!r} not available, estimating tokens from bytes: {e}")
+        return None
+    return lambda text: len(enc.encode(text, disallowed_special=()))
+
+
+def get_message_text(message: dict, render_template: Callable[[dict], str] | None = None) -> str:
+    """All text of a message that counts towards the prompt.
+
+    Args:
+        render_template: Renders template blocks like the model sees them. Without it (or if it fails), template
+            blocks are counted by the JSON of their arguments.
+    """
+    content = message.get("content")
+    if content is None:
+        return ""
+    if isinstance(content, str):
+        return content
+    parts = []
+    for block in content:
+        if not isinstance(block, dict):
+            parts.append(str(block))
+        elif block.get("type") == "template":
+            parts.append(_render_template_block(block, render_template))
+        else:
+            parts.append(str(block.get("text", "")))
+    return "\n".join(parts)
+
+
+def _render_template_block(block: dict, render_template: Callable[[dict], str] | None) -> str:
+    if render_template is not None:
+        try:
+            return render_template(block)
+        except Exception as e:
+            logger.debug(f"Cannot render template block {block.get('name')!r}, counting its arguments: {e}")
+    return json.dumps(block.get("arguments", {}), default=str)
+
+
+class TokenEstimator:
+    def __init__(
+        self,
+        *,
+        encoding: str | None = "o200k_base",
+        bytes_per_token: float = BYTES_PER_TOKEN,
+        render_template: Callable[[dict], str] | None = None,
+    ):
+        """Estimates the number of prompt tokens of a message history.
+
+        Counts are cached per message, so every call only counts the messages that are new (or were replaced).
+
+        Args:
+            encoding: tiktoken encoding to count tokens with. Falls back to a byte heuristic if tiktoken or
+                the encoding is not available (or if None).
+            bytes_per_token: Initial ratio for the byte heuristic. Updated by `calibrate`.
+            render_template: Renders template blocks (see `get_message_text`)
+        """
+        self.bytes_per_token = bytes_per_token
+        self.render_template = render_template
+        self._encode = _get_tiktoken_encode(encoding) if encoding else None
+        self._messages: list[dict] = []
+        """Counted messages (kept alive so that they can be compared by identity)"""
+        self._units: list[int] = []
+        """Tokens (with tokenizer) or UTF-8 bytes (heuristic) of the content of every counted message"""
+        self._n_units = 0
+
+    @property
+    def uses_tokenizer(self) -> bool:
+        return self._encode is not None
+
+    def _count_units(self, text: str) -> int:
+        if self._encode is not None:
+            return self._encode(text)
+        return len(text.encode("utf-8"))
+
+    def _to_tokens(self, n_units: int, n_messages: int) -> int:
+        if self._encode is None:
+            n_units = int(n_units / self.bytes_per_token) + 1
+        return n_units + TOKENS_PER_MESSAGE * n_messages
+
+    def count_text(self, text: str) -> int:
+        return self._to_tokens(self._count_units(text), 0)
+
+    def count_message(self, message: dict) -> int:
+        return self._to_tokens(self._count_units(get_message_text(message, self.render_template)), 1)
+
+    def _update(self, messages: list[dict[str, Any]]) -> None:
+        # Messages that were replaced (e.g., compacted) or removed are counted again. Comparing by identity is cheap
+        # compared to tokenizing, so this doesn't need to assume that the history is only ever appended to.
+        n_valid = 0
+        for cached, message in zip(self._messages, messages):
+            if cached is not message:
+                break
+            n_valid += 1
+        if n_valid < len(self._messages):
+            self._n_units -= sum(self._units[n_valid:])
+            del self._messages[n_valid:], self._units[n_valid:]
+        for message in messages[n_valid:]:
+            n_units = self._count_units(get_message_text(message, self.render_template))
+            self._messages.append(message)
+            self._units.append(n_units)
+            self._n_units += n_units
+
+    def count(self, messages: list[dict[str, Any]]) -> int:
+        """Estimated number of prompt tokens of the messages."""
+        self._update(messages)
+        return self._to_tokens(self._n_units, len(self._messages))
+
+    def calibrate(self, messages: list[dict[str, Any]], prompt_tokens: int) -> None:
+        """Adjust the byte heuristic to the number of prompt tokens that the model reported for the messages.
+        Does nothing if a tokenizer is used.
+        """
+        if self._encode is not None or not messages:
+            return
+        self._update(messages)
+        n_content_tokens = prompt_tokens - TOKENS_PER_MESSAGE * len(messages)
+        if self._n_units <= 0 or n_content_tokens <= 0:
+            return
+        # Moving average, so that a single odd response (e.g., with a system prompt that isn't part of
+        # the messages) doesn't throw off the estimate
+        self.bytes_per_token = 0.5 * self.bytes_per_token + 0.5 * self._n_units / n_content_tokens
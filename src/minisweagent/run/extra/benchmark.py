@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+
+"""Throughput benchmark for batch runs.
+
+Runs `swebench`-style batches (`process_instance` with a thread pool) with a scripted model that has injected latency
+and measures steps per second, the framework overhead per step, peak memory and how this scales with the number of
+workers. Results are saved as JSON, so that they can be compared across commits:
+
+```bash
+mini-extra benchmark -o before.json
+git checkout my-branch
+mini-extra benchmark -o after.json --compare before.json
+```
+"""
+
+import concurrent.futures
+import json
+import logging
+import multiprocessing
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import typer
+import yaml
+from rich.console import Console
+from rich.table import Table
+
+from minisweagent.agents.default import DefaultAgent
+from minisweagent.config import builtin_config_dir
+from minisweagent.models.test_models import DeterministicModel
+from minisweagent.models.utils.cache_control import set_cache_control
+from minisweagent.utils.log import logger
+
+app = typer.Typer(rich_markup_mode="rich", add_completion=False)
+console = Console(highlight=False)
+
+DEFAULT_WORKERS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+
+OVERHEAD_PHASES = ["agent_loop", "templating", "cache_control", "serialization", "saving"]
+"""Framework overhead (everything except model latency and command execution)"""
+
+
+@dataclass
+class BenchmarkConfig:
+    workers: int = 1
+    n_instances: int = 0
+    """Number of instances (0: twice the number of workers)"""
+    n_steps: int = 10
+    """Number of steps per instance (the last step submits)"""
+    latency: float = 0.05
+    """Injected model latency per step in seconds"""
+    output_bytes: int = 2_000
+    """Size of the output of every command"""
+    environment_class: str = "local"
+    agent_config: Path = builtin_config_dir / "extra" / "swebench.yaml"
+    """Config file whose `agent` section is used"""
+
+
+class PhaseTimer:
+    """Thread-safe accumulator of the time spent per phase."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.seconds: dict[str, float] = defaultdict(float)
+        self.counts: dict[str, int] = defaultdict(int)
+        self.nested_seconds: dict[str, float] = defaultdict(float)
+        """Time of the phases that were measured within another phase (by outer phase)"""
+
+    def add(self, phase: str, seconds: float, *, outer: str | None = None) -> None:
+        with self._lock:
+            self.seconds[phase] += seconds
+            self.counts[phase] += 1
+            if outer is not None:
+                self.nested_seconds[outer] += seconds
+
+    @contextmanager
+    def measure(self, phase: str) -> Iterator[None]:
+        stack = self._local.__dict__.setdefault("stack", [])
+        outer = stack[-1] if stack else None
+        stack.append(phase)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stack.pop()
+            self.add(phase, time.perf_counter() - start, outer=outer)
+
+    def wrap(self, phase: str, function: Callable) -> Callable:
+        def wrapper(*args, **kwargs):
+            with self.measure(phase):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+
+_TIMER = PhaseTimer()
+
+
+class BenchmarkModel(DeterministicModel):
+    """`DeterministicModel` with injected latency that also does the client-side work of an API model
+    (cache control markers, serializing the request).
+    """
+
+    def __init__(self, *, latency: float = 0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency
+
+    def query(self, messages: list[dict], **kwargs) -> dict:
+        with _TIMER.measure("cache_control"):
+            messages = set_cache_control(messages, mode="default_end")
+        with _TIMER.measure("serialization"):
+            json.dumps({"messages": messages})
+        with _TIMER.measure("model_latency"):
+            time.sleep(self.latency)
+        return super().query(messages, **kwargs)
+
+
+def _get_outputs(config: BenchmarkConfig) -> list[str]:
+    command = f"head -c {config.output_bytes} /dev/zero | tr '\\0' x"
+    outputs = [f"Step {i}\n```bash\n{command}\n```" for i in range(config.n_steps - 1)]
+    return outputs + ["Done\n```bash\necho COMPLETE_TASK_AND_SUBMIT_FINAL_OUTPUT\n```"]
+
+
+def _get_peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes on Linux
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+@contextmanager
+def _instrumented() -> Iterator[None]:
+    """Time the phases of `process_instance` by temporarily wrapping the functions that implement them."""
+    from minisweagent.run.extra import swebench
+
+    patches = [
+        (swebench.ProgressTrackingAgent, "step", "step"),
+        (DefaultAgent, "execute_action", "execution"),
+        (DefaultAgent, "get_template_arguments", "templating"),
+        (swebench, "save_traj", "saving"),
+        (swebench, "update_preds_file", "saving"),
+    ]
+    originals = [(obj, name, obj.__dict__[name]) for obj, name, _ in patches]
+    try:
+        for obj, name, phase in patches:
+            setattr(obj, name, _TIMER.wrap(phase, getattr(obj, name)))
+        yield
+    finally:
+        for obj, name, original in originals:
+            setattr(obj, name, original)
+
+
+def run_benchmark(config: BenchmarkConfig) -> dict:
+    """Run one batch and return its measurements."""
+    from minisweagent.run.extra.swebench import process_instance
+    from minisweagent.run.extra.utils.batch_progress import RunBatchProgressManager
+
+    global _TIMER
+    _TIMER = PhaseTimer()
+    n_instances = config.n_instances or 2 * config.workers
+    agent_config = yaml.safe_load(Path(config.agent_config).read_text()).get("agent", {})
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        run_config = {
+            "agent": agent_config | {"step_limit": 0, "cost_limit": 0},
+            "environment": {"environment_class": config.environment_class, "cwd": tmp_dir, "timeout": 60},
+            "model": {
+                "model_class": f"{__name__}.BenchmarkModel",
+                "model_name": "benchmark",
+                "outputs": _get_outputs(config),
+                "latency": config.latency,
+                "cost_per_call": 0.0,
+            },
+        }
+        if config.environment_class == "docker":
+            run_config["environment"]["cwd"] = "/"
+        instances = [
+            {
+                "instance_id": f"benchmark__{i:05d}",
+                "problem_statement": "Benchmark task",
+                "image_name": "python:3.11-slim",
+            }
+            for i in range(n_instances)
+        ]
+        output_dir = Path(tmp_dir) / "output"
+        progress_manager = RunBatchProgressManager(n_instances, headless=True)
+        log_level = logger.level
+        logger.setLevel(logging.WARNING)
+        start_time = time.perf_counter()
+        try:
+            with (
+                progress_manager,
+                _instrumented(),
+                concurrent.futures.ThreadPoolExecutor(max_workers=config.workers) as executor,
+            ):
+                futures = [
+                    executor.submit(process_instance, instance, output_dir, run_config, progress_manager)
+                    for instance in instances
+                ]
+                for future in concurrent.futures.as_completed(futures):
+                    future.result()
+        finally:
+            logger.setLevel(log_level)
+        wall_time = time.perf_counter() - start_time
+
+    seconds = _TIMER.seconds
+    n_steps = _TIMER.counts["step"]
+    # Everything in a step that isn't one of the other phases is attributed to the agent loop itself
+    agent_loop = seconds["step"] - _TIMER.nested_seconds["step"]
+    phases = dict(seconds) | {"agent_loop": agent_loop}
+    overhead = {phase: phases.get(phase, 0.0) / max(n_steps, 1) for phase in OVERHEAD_PHASES}
+    return {
+        "config": asdict(config) | {"agent_config": str(config.agent_config), "n_instances": n_instances},
+        "n_steps": n_steps,
+        "wall_time": wall_time,
+        "steps_per_sec": n_steps / wall_time,
+        "instances_per_sec": n_instances / wall_time,
+        "overhead_per_step": overhead | {"total": sum(overhead.values())},
+        "model_latency_per_step": seconds["model_latency"] / max(n_steps, 1),
+        "execution_per_step": seconds["execution"] / max(n_steps, 1),
+        "peak_rss_mb": _get_peak_rss_mb(),
+    }
+
+
+def _run_isolated(config: BenchmarkConfig) -> dict:
+    """Run the benchmark in a fresh process, so that the peak memory is measured per run."""
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(run_benchmark, config).result()
+
+
+def _get_metadata() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, cwd=Path(__file__).parent, check=True
+        ).stdout.strip()
+    except Exception:
+        commit = None
+    from minisweagent import __version__
+
+    return {
+        "version": __version__,
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": multiprocessing.cpu_count(),
+        "timestamp": time.time(),
+    }
+
+
+def print_results(results: list[dict], baseline: list[dict] | None = None) -> None:
+    baseline_by_workers = {r["config"]["workers"]: r for r in baseline or []}
+    table = Table()
+    for column in ["workers", "steps/s", "overhead/step [ms]", "peak RSS [MB]"]:
+        table.add_column(column, justify="right")
+    if baseline is not None:
+        table.add_column("steps/s vs. baseline", justify="right")
+    for result in results:
+        row = [
+            str(result["config"]["workers"]),
+            f"{result['steps_per_sec']:.1f}",
+            f"{1000 * result['overhead_per_step']['total']:.2f}",
+            f"{result['peak_rss_mb']:.0f}",
+        ]
+        if baseline is not None:
+            old = baseline_by_workers.get(result["config"]["workers"])
+            row.append(f"{result['steps_per_sec'] / old['steps_per_sec'] - 1:+.1%}" if old else "-")
+        table.add_row(*row)
+    console.print(table)
+
+
+# fmt: off
+@app.command()
+def main(
+    workers: str = typer.Option(",".join(map(str, DEFAULT_WORKERS)), "-w", "--workers", help="Comma-separated numbers of workers"),
+    n_instances: int = typer.Option(0, "-n", "--instances", help="Number of instances per run (0: twice the number of workers)"),
+    n_steps: int = typer.Option(10, "--steps", help="Number of steps per instance"),
+    latency: float = typer.Option(0.05, "--latency", help="Injected model latency per step in seconds"),
+    output_bytes: int = typer.Option(2_000, "--output-bytes", help="Size of the output of every command"),
+    environment_class: str = typer.Option("local", "--environment-class", help="Environment to run commands in"),
+    output: Path = typer.Option(Path("benchmark.json"), "-o", "--output", help="JSON file to save the results to"),
+    compare: Path | None = typer.Option(None, "--compare", help="Results of a previous run to compare to"),
+    isolate: bool = typer.Option(True, "--isolate/--no-isolate", help="Run every configuration in a fresh process"),
+) -> None:
+    # fmt: on
+    """Measure the throughput of batch runs for different numbers of workers."""
+    results = []
+    for n_workers in [int(w) for w in workers.split(",") if w.strip()]:
+        config = BenchmarkConfig(
+            workers=n_workers,
+            n_instances=n_instances,
+            n_steps=n_steps,
+            latency=latency,
+            output_bytes=output_bytes,
+            environment_class=environment_class,
+        )
+        console.print(f"Running with {n_workers} workers...")
+        results.append(_run_isolated(config) if isolate else run_benchmark(config))
+        output.write_text(json.dumps({"metadata": _get_metadata(), "results": results}, indent=2))
+    baseline = json.loads(compare.read_text())["results"] if compare is not None else None
+    print_results(results, baseline)
+    console.print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    app()
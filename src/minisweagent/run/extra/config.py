@@ -9,7 +9,6 @@ import os
 import subprocess
 
 from dotenv import set_key, unset_key
-from prompt_toolkit import prompt
 from rich.console import Console
 from rich.rule import Rule
 from typer import Argument, Typer
@@ -25,6 +24,13 @@ app = Typer(
 console = Console(highlight=False)
 
 
+def prompt(*args, **kwargs) -> str:
+    """`prompt_toolkit.prompt`, imported on first use because `mini` imports this module on every start."""
+    from prompt_toolkit import prompt as _prompt
+
+    return _prompt(*args, **kwargs)
+
+
 _SETUP_HELP = """To get started, we need to set up your global config file.
 
 You can edit it manually or use the [bold green]mini-extra config set[/bold green] or [bold green]mini-extra config edit[/bold green] commands.
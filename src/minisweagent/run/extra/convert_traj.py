@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+"""Convert trajectories between formats.
+
+[not dim]
+By default, streaming (`*.traj.jsonl`) and compact (`*.traj.json.gz`, `*.traj.json.zst`) trajectories are converted
+to the `mini-swe-agent-1` format (`*.traj.json`). Use `--format json.zst` to compact the trajectories of a run
+with a shared blob directory instead.
+Every trajectory is saved next to the original (or in the output directory, keeping the directory structure).
+[/not dim]
+"""
+
+from pathlib import Path
+
+import typer
+from rich.console import Console
+
+from minisweagent.run.utils.save import convert_traj, find_trajectories
+
+app = typer.Typer(rich_markup_mode="rich", add_completion=False)
+console = Console(highlight=False)
+
+FORMATS = ["json", "json.gz", "json.zst"]
+
+
+def _find_trajectories(path: Path) -> list[Path]:
+    if path.is_file():
+        return [path]
+    if path.is_dir():
+        return find_trajectories(path)
+    raise typer.BadParameter(f"Error: Path '{path}' does not exist")
+
+
+def _get_target_name(source: Path, traj_format: str) -> str:
+    stem = source.name.split(".traj.")[0] if ".traj." in source.name else source.name.split(".")[0]
+    return f"{stem}.traj.{traj_format}"
+
+
+# fmt: off
+@app.command(help=__doc__)
+def main(
+    paths: list[Path] = typer.Argument(..., help="Trajectory files or directories to search for trajectory files"),
+    traj_format: str = typer.Option("json", "-f", "--format", help=f"Target format (one of {', '.join(FORMATS)})"),
+    output_dir: Path | None = typer.Option(None, "-o", "--output", help="Directory to save the converted trajectories to"),
+    blob_dir: Path | None = typer.Option(None, "--blob-dir", help="Compact formats: Shared blob directory (default: blobs in every file)"),
+    delete: bool = typer.Option(False, "--delete", help="Delete the original trajectories after converting them"),
+) -> None:
+    # fmt: on
+    if traj_format not in FORMATS:
+        raise typer.BadParameter(f"Unknown format {traj_format!r}, use one of {', '.join(FORMATS)}")
+    n_converted = 0
+    for path in paths:
+        for source in _find_trajectories(path):
+            target = source.with_name(_get_target_name(source, traj_format))
+            if output_dir is not None:
+                target = output_dir / (target.relative_to(path) if path.is_dir() else target.name)
+            if target == source:
+                continue
+            convert_traj(source, target, blob_dir=blob_dir)
+            if delete:
+                source.unlink()
+            n_converted += 1
+    console.print(f"Converted {n_converted} trajectories")
+
+
+if __name__ == "__main__":
+    app()
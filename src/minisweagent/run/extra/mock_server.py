@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+
+"""Local stand-in for an OpenAI-compatible API (for load testing without a real provider).
+
+Supports chat completions and, with server-side conversation state, the Responses API (`previous_response_id`).
+
+Replays scripted outputs (like `DeterministicModel`) or the assistant messages of saved trajectories,
+with configurable latency, token usage, streaming and injected errors. For example:
+
+```bash
+mini-extra mock-server --trajectory run.traj.json --latency lognormal --latency-mean 2 --error-rate-429 0.05
+mini -m openai/mock -c mini.yaml  # with model_kwargs: {api_base: "http://127.0.0.1:8000/v1", api_key: "mock"}
+```
+"""
+
+import collections
+import json
+import math
+import random
+import threading
+import time
+import uuid
+import zlib
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Literal
+
+import typer
+
+from minisweagent.models.utils.tokens import TokenEstimator, get_message_text
+from minisweagent.run.utils.save import iter_traj_messages
+
+app = typer.Typer(rich_markup_mode="rich", add_completion=False)
+
+DEFAULT_OUTPUTS = ["```bash\necho 'COMPLETE_TASK_AND_SUBMIT_FINAL_OUTPUT'\n```"]
+
+
+@dataclass
+class MockServerConfig:
+    outputs: list[str] = field(default_factory=lambda: list(DEFAULT_OUTPUTS))
+    """Outputs that are returned in sequence (like `DeterministicModel`). The last output is repeated."""
+    trajectories: list[str | Path] = field(default_factory=list)
+    """Trajectory files whose assistant messages are replayed (instead of `outputs`).
+    Every conversation replays one trajectory, selected by its first message."""
+    latency: Literal["constant", "uniform", "exponential", "lognormal"] = "constant"
+    latency_mean: float = 0.0
+    """Mean latency per request in seconds"""
+    latency_spread: float = 0.0
+    """Half-width of the uniform distribution or sigma of the lognormal distribution"""
+    stream_chunk_size: int = 20
+    """Number of characters per chunk when streaming"""
+    error_rate_429: float = 0.0
+    error_rate_5xx: float = 0.0
+    error_status_codes: list[int] = field(default_factory=lambda: [500, 502, 503])
+    retry_after: float | None = 1.0
+    """Value of the `Retry-After` header of 429/503 responses (None to omit it)"""
+    input_cost_per_token: float = 1e-6
+    output_cost_per_token: float = 2e-6
+    """Prices that the reported `usage.cost` is based on (some clients require a non-zero cost)"""
+    max_stored_responses: int = 10_000
+    """Responses API: Number of responses that are kept for `previous_response_id` (older ones are forgotten)"""
+    state_loss_rate: float = 0.0
+    """Responses API: Fraction of requests for which the previous response is treated as lost"""
+    seed: int | None = None
+
+
+def _get_scripts(config: MockServerConfig) -> list[list[str]]:
+    scripts = []
+    for path in config.trajectories:
+        messages = iter_traj_messages(Path(path))
+        scripts.append([get_message_text(m) for m in messages if m["role"] == "assistant"])
+    scripts = [script for script in scripts if script]
+    return scripts or [config.outputs]
+
+
+class MockLLMServer:
+    def __init__(self, config: MockServerConfig | None = None, *, host: str = "127.0.0.1", port: int = 0, **kwargs):
+        """OpenAI-compatible chat completions server that runs in a background thread.
+
+        Args:
+            config: Server config (or pass its fields as keyword arguments)
+            port: Port to listen on (0: any free port)
+        """
+        self.config = config or MockServerConfig(**kwargs)
+        self._scripts = _get_scripts(self.config)
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self.stats = {
+            "n_requests": 0,
+            "n_completions": 0,
+            "n_errors": 0,
+            "n_concurrent": 0,
+            "max_concurrent": 0,
+            "request_bytes": 0,
+        }
+        self._responses: collections.OrderedDict[str, list[dict]] = collections.OrderedDict()
+        """Responses API: Conversation (including the output) of every stored response"""
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.mock_server = self  # type: ignore[attr-defined]
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        """Base URL of the API (use as `api_base`)."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def serve_forever(self) -> None:
+        """Serve in the current thread (until interrupted)."""
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._httpd.server_close()
+
+    def start(self) -> "MockLLMServer":
+        """Serve in a background thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True, name="minisweagent-mock-server")
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "MockLLMServer":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def sample_latency(self) -> float:
+        c = self.config
+        with self._lock:
+            match c.latency:
+                case "constant":
+                    return c.latency_mean
+                case "uniform":
+                    return max(
+                        self._random.uniform(c.latency_mean - c.latency_spread, c.latency_mean + c.latency_spread), 0
+                    )
+                case "exponential":
+                    return self._random.expovariate(1 / c.latency_mean) if c.latency_mean > 0 else 0.0
+                case "lognormal":
+                    # Parametrized such that the mean is `latency_mean`
+                    if c.latency_mean <= 0:
+                        return 0.0
+                    mu = math.log(c.latency_mean) - c.latency_spread**2 / 2
+                    return self._random.lognormvariate(mu, c.latency_spread)
+        raise ValueError(f"Unknown latency distribution: {c.latency}")
+
+    def sample_error(self) -> int | None:
+        """Status code of an injected error (None for no error)."""
+        with self._lock:
+            x = self._random.random()
+            if x < self.config.error_rate_429:
+                return 429
+            if x < self.config.error_rate_429 + self.config.error_rate_5xx:
+                return self._random.choice(self.config.error_status_codes)
+        return None
+
+    def get_output(self, messages: list[dict]) -> str:
+        """The next output of the conversation: Outputs are replayed by the number of previous assistant messages."""
+        first = get_message_text(messages[0]) if messages else ""
+        script = self._scripts[zlib.crc32(first.encode()) % len(self._scripts)]
+        n_previous = sum(1 for m in messages if m.get("role") == "assistant")
+        return script[min(n_previous, len(script) - 1)]
+
+    def get_usage(self, messages: list[dict], content: str) -> dict[str, Any]:
+        estimator = TokenEstimator(encoding=None)
+        prompt_tokens = estimator.count(messages)
+        completion_tokens = estimator.count_text(content)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "cost": prompt_tokens * self.config.input_cost_per_token
+            + completion_tokens * self.config.output_cost_per_token,
+        }
+
+    def get_conversation(self, previous_response_id: str | None) -> list[dict] | None:
+        """Responses API: The conversation up to a previous response (None if it is unknown or lost)."""
+        if previous_response_id is None:
+            return []
+        with self._lock:
+            if self._random.random() < self.config.state_loss_rate:
+                self._responses.pop(previous_response_id, None)
+            return self._responses.get(previous_response_id)
+
+    def store_response(self, response_id: str, conversation: list[dict]) -> None:
+        with self._lock:
+            self._responses[response_id] = conversation
+            while len(self._responses) > self.config.max_stored_responses:
+                self._responses.popitem(last=False)
+
+    def _update_stats(self, **deltas: int) -> None:
+        with self._lock:
+            for key, delta in deltas.items():
+                self.stats[key] += delta
+            self.stats["max_concurrent"] = max(self.stats["max_concurrent"], self.stats["n_concurrent"])
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def mock_server(self) -> MockLLMServer:
+        return self.server.mock_server  # type: ignore[attr-defined]
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def _send_json(self, status: int, data: dict, headers: dict[str, str] | None = None) -> None:
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]})
+        elif self.path.rstrip("/").endswith("/stats"):
+            with self.mock_server._lock:
+                self._send_json(200, dict(self.mock_server.stats))
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "not_found"}})
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        request = json.loads(body or b"{}")
+        server = self.mock_server
+        server._update_stats(n_requests=1, n_concurrent=1, request_bytes=len(body))
+        try:
+            path = self.path.rstrip("/")
+            if not path.endswith(("/chat/completions", "/responses")):
+                return self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "not_found"}})
+            time.sleep(server.sample_latency())
+            if (status := server.sample_error()) is not None:
+                server._update_stats(n_errors=1)
+                return self._send_error(status)
+            server._update_stats(n_completions=1)
+            if path.endswith("/responses"):
+                self._send_response(request)
+            else:
+                self._send_completion(request)
+        finally:
+            server._update_stats(n_concurrent=-1)
+
+    def _send_error(self, status: int) -> None:
+        headers = {}
+        if status in (429, 503) and self.mock_server.config.retry_after is not None:
+            headers["Retry-After"] = f"{self.mock_server.config.retry_after:g}"
+        error_type = "rate_limit_error" if status == 429 else "server_error"
+        message = f"Injected error ({status})"
+        self._send_json(status, {"error": {"message": message, "type": error_type, "code": status}}, headers)
+
+    def _send_response(self, request: dict) -> None:
+        """Responses API (non-streaming, text only)."""
+        server = self.mock_server
+        previous_response_id = request.get("previous_response_id")
+        conversation = server.get_conversation(previous_response_id)
+        if conversation is None:
+            error = {
+                "message": f"Previous response with id '{previous_response_id}' not found.",
+                "type": "invalid_request_error",
+                "param": "previous_response_id",
+                "code": "previous_response_not_found",
+            }
+            return self._send_json(404, {"error": error})
+        new_input = request.get("input", [])
+        if isinstance(new_input, str):
+            new_input = [{"role": "user", "content": new_input}]
+        messages = conversation + new_input
+        content = server.get_output(messages)
+        usage = server.get_usage(messages, content)
+        response_id = f"resp_mock_{uuid.uuid4().hex}"
+        if request.get("store", True):
+            server.store_response(response_id, messages + [{"role": "assistant", "content": content}])
+        output_message = {
+            "type": "message",
+            "id": f"msg_mock_{uuid.uuid4().hex}",
+            "role": "assistant",
+            "status": "completed",
+            "content": [{"type": "output_text", "text": content, "annotations": []}],
+        }
+        response = {
+            "id": response_id,
+            "object": "response",
+            "created_at": int(time.time()),
+            "status": "completed",
+            "model": request.get("model", "mock"),
+            "previous_response_id": previous_response_id,
+            "output": [output_message],
+            "usage": {
+                "input_tokens": usage["prompt_tokens"],
+                "output_tokens": usage["completion_tokens"],
+                "total_tokens": usage["total_tokens"],
+                "cost": usage["cost"],
+            },
+        }
+        return self._send_json(200, response)
+
+    def _send_completion(self, request: dict) -> None:
+        server = self.mock_server
+        messages = request.get("messages", [])
+        content = server.get_output(messages)
+        usage = server.get_usage(messages, content)
+        base = {
+            "id": f"chatcmpl-mock-{server.stats['n_requests']}",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+        }
+        if request.get("stream"):
+            self._stream_completion(
+                base, content, usage, include_usage=(request.get("stream_options") or {}).get("include_usage")
+            )
+        else:
+            message = {"role": "assistant", "content": content}
+            choice = {"index": 0, "message": message, "finish_reason": "stop"}
+            self._send_json(200, base | {"object": "chat.completion", "choices": [choice], "usage": usage})
+
+    def _stream_completion(self, base: dict, content: str, usage: dict, *, include_usage: bool = False) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        chunk_size = max(self.mock_server.config.stream_chunk_size, 1)
+        deltas = [{"role": "assistant", "content": ""}]
+        deltas += [{"content": content[i : i + chunk_size]} for i in range(0, len(content), chunk_size)]
+        chunks = [{"choices": [{"index": 0, "delta": delta, "finish_reason": None}]} for delta in deltas]
+        chunks.append({"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if include_usage:
+            chunks.append({"choices": [], "usage": usage})
+        for chunk in chunks:
+            data = base | {"object": "chat.completion.chunk"} | chunk
+            self.wfile.write(f"data: {json.dumps(data)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+# fmt: off
+@app.command()
+def main(
+    output: list[str] = typer.Option([], "-o", "--output", help="Output to return (repeat for a sequence)"),
+    trajectory: list[Path] = typer.Option([], "-t", "--trajectory", help="Trajectory to replay (repeat for several)"),
+    host: str = typer.Option("127.0.0.1", "--host"),
+    port: int = typer.Option(8000, "-p", "--port"),
+    latency: str = typer.Option("constant", "--latency", help="Latency distribution: constant, uniform, exponential or lognormal"),
+    latency_mean: float = typer.Option(0.0, "--latency-mean", help="Mean latency in seconds"),
+    latency_spread: float = typer.Option(0.0, "--latency-spread", help="Half-width (uniform) or sigma (lognormal)"),
+    error_rate_429: float = typer.Option(0.0, "--error-rate-429", help="Fraction of requests that fail with 429"),
+    error_rate_5xx: float = typer.Option(0.0, "--error-rate-5xx", help="Fraction of requests that fail with 500/502/503"),
+    retry_after: float = typer.Option(1.0, "--retry-after", help="Retry-After header in seconds (negative to omit)"),
+    state_loss_rate: float = typer.Option(0.0, "--state-loss-rate", help="Fraction of requests that lose the previous response (Responses API)"),
+    seed: int | None = typer.Option(None, "--seed", help="Random seed"),
+) -> None:
+    # fmt: on
+    """Run an OpenAI-compatible stand-in LLM server."""
+    config = MockServerConfig(
+        outputs=output or list(DEFAULT_OUTPUTS),
+        trajectories=list(trajectory),
+        latency=latency,  # type: ignore[arg-type]
+        latency_mean=latency_mean,
+        latency_spread=latency_spread,
+        error_rate_429=error_rate_429,
+        error_rate_5xx=error_rate_5xx,
+        retry_after=retry_after if retry_after >= 0 else None,
+        state_loss_rate=state_loss_rate,
+        seed=seed,
+    )
+    server = MockLLMServer(config, host=host, port=port)
+    print(f"Serving OpenAI-compatible API at {server.url} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"Stats: {server.stats}")
+
+
+if __name__ == "__main__":
+    app()
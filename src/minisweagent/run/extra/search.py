@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+"""Search the actions and observations of all trajectories of a run.
+
+[not dim]
+The actions and observations are indexed in the trajectory catalog of the run directory (SQLite full-text search).
+The index is updated incrementally before every query, so only new or modified trajectories are read again.
+
+```bash
+mini-extra search query "pip install" path/to/output/ --kind action
+mini-extra search query "ModuleNotFoundError" path/to/output/ --open  # browse the hits in the inspector
+```
+[/not dim]
+"""
+
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Annotated
+
+import typer
+from rich.console import Console
+from rich.markup import escape
+from rich.table import Table
+
+from minisweagent.run.utils.catalog import SEARCH_KINDS, SearchHit, TrajectoryCatalog
+
+app = typer.Typer(rich_markup_mode="rich", add_completion=False, help=__doc__)
+console = Console(highlight=False)
+
+_HIGHLIGHT = ("\x02", "\x03")
+
+
+def _open_catalog(path: Path, catalog_path: Path | None) -> TrajectoryCatalog:
+    if not path.is_dir():
+        raise typer.BadParameter(f"Error: Directory '{path}' does not exist")
+    return TrajectoryCatalog(path, db_path=catalog_path)
+
+
+def _update_index(catalog: TrajectoryCatalog, workers: int) -> dict[str, int]:
+    catalog.update(workers=workers)
+    try:
+        return catalog.update_search_index(workers=workers)
+    except sqlite3.OperationalError as e:
+        raise typer.BadParameter(f"Cannot build the search index (requires SQLite with FTS5): {e}") from e
+
+
+def _format_snippet(snippet: str) -> str:
+    start, end = _HIGHLIGHT
+    return escape(" ".join(snippet.split())).replace(start, "[bold red]").replace(end, "[/bold red]")
+
+
+def print_hits(hits: list[SearchHit]) -> None:
+    table = Table()
+    for column in ["instance", "step", "kind", "match"]:
+        table.add_column(column)
+    for hit in hits:
+        # Steps are shown starting at 1, like in the inspector
+        table.add_row(hit.instance_id or hit.path, str(hit.step + 1), hit.kind, _format_snippet(hit.snippet))
+    console.print(table)
+
+
+# fmt: off
+@app.command()
+def index(
+    path: Annotated[Path, typer.Argument(help="Run directory")] = Path("."),
+    workers: Annotated[int, typer.Option("-w", "--workers", help="Number of processes that read trajectories")] = os.cpu_count() or 1,
+    catalog_path: Annotated[Path | None, typer.Option("--catalog-path", help="Catalog database (default: .traj_catalog.sqlite in the directory)")] = None,
+) -> None:
+    # fmt: on
+    """Build or update the search index of a run directory."""
+    start_time = time.perf_counter()
+    with _open_catalog(path, catalog_path) as catalog:
+        changes = _update_index(catalog, workers)
+        n_trajectories = len(catalog.query())
+    console.print(
+        f"Indexed {n_trajectories} trajectories ({changes['updated']} updated, {changes['removed']} removed) "
+        f"in {time.perf_counter() - start_time:.1f}s"
+    )
+
+
+# fmt: off
+@app.command()
+def query(
+    text: Annotated[str, typer.Argument(help="Text to search for (case-insensitive, at least three characters)")],
+    path: Annotated[Path, typer.Argument(help="Run directory")] = Path("."),
+    kind: Annotated[str | None, typer.Option("-k", "--kind", help=f"Only search in {' or '.join(SEARCH_KINDS)}s")] = None,
+    instance_id: Annotated[str | None, typer.Option("-i", "--instance", help="Only search instances matching this glob pattern")] = None,
+    limit: Annotated[int, typer.Option("-n", "--limit", help="Maximum number of hits (0: all)")] = 100,
+    raw: Annotated[bool, typer.Option("--raw", help="Interpret the text as an SQLite FTS5 query (e.g., '\"pip install\" NOT numpy')")] = False,
+    open_inspector: Annotated[bool, typer.Option("--open", help="Browse the matching trajectories in the inspector, starting at the first hit")] = False,
+    workers: Annotated[int, typer.Option("-w", "--workers", help="Number of processes that read trajectories")] = os.cpu_count() or 1,
+    catalog_path: Annotated[Path | None, typer.Option("--catalog-path", help="Catalog database (default: .traj_catalog.sqlite in the directory)")] = None,
+) -> None:
+    # fmt: on
+    """Find the steps whose action or observation contains the text."""
+    with _open_catalog(path, catalog_path) as catalog:
+        _update_index(catalog, workers)
+        start_time = time.perf_counter()
+        try:
+            hits = catalog.search(
+                text, kind=kind, instance_id=instance_id, limit=limit or None, raw=raw, highlight=_HIGHLIGHT
+            )
+        except ValueError as e:
+            raise typer.BadParameter(str(e)) from e
+        elapsed = time.perf_counter() - start_time
+        entries = {entry.path: entry for entry in catalog.query()}
+        root = catalog.root
+    print_hits(hits)
+    start_steps: dict[str, int] = {}  # first hit of every trajectory
+    for hit in hits:
+        start_steps.setdefault(hit.path, hit.step)
+    console.print(f"{len(hits)} hits in {len(start_steps)} trajectories ({1000 * elapsed:.0f}ms)")
+    if open_inspector and hits:
+        from minisweagent.run.inspector import TrajectoryInspector
+
+        paths = list(start_steps)
+        TrajectoryInspector(
+            [root / p for p in paths], [entries[p] for p in paths], start_steps=list(start_steps.values())
+        ).run()
+
+
+if __name__ == "__main__":
+    app()
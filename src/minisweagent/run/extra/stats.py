@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+
+"""Summarize the trajectories of a run.
+
+[not dim]
+Counts, cost, steps and run time, grouped by exit status, repository, model and number of steps.
+Trajectories are read in parallel and indexed in the catalog of the run directory (see the inspector),
+so only new or modified trajectories are read again the next time.
+
+Compare two runs side by side with `--compare`:
+
+```bash
+mini-extra stats runs/baseline --compare runs/new
+```
+[/not dim]
+"""
+
+import csv
+import io
+import json
+import os
+import statistics
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Annotated, Any
+
+import typer
+from rich.console import Console
+from rich.table import Table
+
+from minisweagent.run.utils.catalog import TrajectoryCatalog, TrajectoryEntry, get_all_metadata
+from minisweagent.run.utils.save import find_trajectories
+
+app = typer.Typer(rich_markup_mode="rich", add_completion=False)
+console = Console(highlight=False)
+
+GROUP_BY = ["exit_status", "repo", "model", "steps"]
+FORMATS = ["table", "csv", "json"]
+STEP_BUCKETS = [5, 10, 20, 50, 100]
+"""Upper bounds (exclusive) of the step count groups"""
+
+METRICS = ["n", "share", "submitted", "cost_total", "cost_mean", "steps_mean", "steps_median", "duration_mean"]
+
+
+def get_repo(instance_id: str | None) -> str:
+    """Repository of a SWE-bench style instance id (`django__django-12345` -> `django/django`)."""
+    if not instance_id or "__" not in instance_id:
+        return "-"
+    return instance_id.rsplit("-", 1)[0].replace("__", "/", 1)
+
+
+def get_steps_bucket(n_steps: int | None) -> str:
+    if n_steps is None:
+        return "-"
+    lower = 0
+    for upper in STEP_BUCKETS:
+        if n_steps < upper:
+            return f"{lower}-{upper - 1}"
+        lower = upper
+    return f"{lower}+"
+
+
+def get_group(entry: TrajectoryEntry, group_by: str) -> str:
+    if group_by == "exit_status":
+        return entry.exit_status or ("Unreadable" if entry.error else "-")
+    if group_by == "repo":
+        return get_repo(entry.instance_id)
+    if group_by == "model":
+        return entry.model_name or "-"
+    if group_by == "steps":
+        return get_steps_bucket(entry.n_steps)
+    raise ValueError(f"Cannot group by {group_by!r}, use one of {', '.join(GROUP_BY)}")
+
+
+def _mean(values: list[float]) -> float | None:
+    return statistics.fmean(values) if values else None
+
+
+def get_metrics(entries: list[TrajectoryEntry], n_total: int) -> dict[str, Any]:
+    costs = [e.cost for e in entries if e.cost is not None]
+    steps = [e.n_steps for e in entries if e.n_steps is not None]
+    durations = [e.duration for e in entries if e.duration is not None]
+    return {
+        "n": len(entries),
+        "share": len(entries) / n_total if n_total else None,
+        "submitted": sum(bool(e.has_submission) for e in entries) / len(entries) if entries else None,
+        "cost_total": sum(costs),
+        "cost_mean": _mean(costs),
+        "steps_mean": _mean(steps),
+        "steps_median": statistics.median(steps) if steps else None,
+        "duration_mean": _mean(durations),
+    }
+
+
+def aggregate(entries: list[TrajectoryEntry], group_by: str) -> dict[str, dict[str, Any]]:
+    """Metrics per group (most frequent group first)."""
+    groups: dict[str, list[TrajectoryEntry]] = defaultdict(list)
+    for entry in entries:
+        groups[get_group(entry, group_by)].append(entry)
+    return {
+        group: get_metrics(group_entries, len(entries))
+        for group, group_entries in sorted(groups.items(), key=lambda item: (-len(item[1]), item[0]))
+    }
+
+
+def get_summary(entries: list[TrajectoryEntry], group_by: list[str]) -> dict[str, Any]:
+    return {"total": get_metrics(entries, len(entries))} | {by: aggregate(entries, by) for by in group_by}
+
+
+def get_transitions(entries: list[TrajectoryEntry], other: list[TrajectoryEntry]) -> Counter:
+    """Number of instances per (exit status, exit status in the other run) for instances that are in both runs."""
+    other_by_id = {e.instance_id: e for e in other}
+    return Counter(
+        (get_group(e, "exit_status"), get_group(other_by_id[e.instance_id], "exit_status"))
+        for e in entries
+        if e.instance_id in other_by_id
+    )
+
+
+def load_entries(path: Path, *, workers: int, use_catalog: bool = True) -> list[TrajectoryEntry]:
+    if path.is_file():
+        paths = [path]
+    elif not path.is_dir():
+        raise typer.BadParameter(f"Error: Path '{path}' does not exist")
+    elif use_catalog:
+        with TrajectoryCatalog(path) as catalog:
+            catalog.update(workers=workers)
+            return catalog.query()
+    else:
+        paths = find_trajectories(path)
+    return [
+        TrajectoryEntry(path=str(p), mtime=0.0, size=0, error=error, **metadata)
+        for p, (metadata, error) in zip(paths, get_all_metadata(paths, workers=workers))
+    ]
+
+
+def _format(metric: str, value: Any) -> str:
+    if value is None:
+        return "-"
+    if metric in ("share", "submitted"):
+        return f"{value:.1%}"
+    if metric.startswith("cost"):
+        return f"${value:.2f}"
+    if metric.startswith("steps"):
+        return f"{value:.1f}"
+    if metric.startswith("duration"):
+        return f"{value:.0f}s"
+    return str(value)
+
+
+def _iter_rows(summary: dict[str, Any], other: dict[str, Any] | None = None):
+    """(grouping, group, metrics, metrics in the other run) for all groups of both runs (grouping "total" first)."""
+    for by, groups in summary.items():
+        other_groups = (other or {}).get(by, {})
+        if by == "total":
+            groups, other_groups = {"all": groups}, {"all": other_groups} if other is not None else {}
+        for group in list(groups) + [g for g in other_groups if g not in groups]:
+            yield by, group, groups.get(group, {}), other_groups.get(group, {})
+
+
+def print_tables(summary: dict[str, Any], other: dict[str, Any] | None = None) -> None:
+    """Print one table per grouping. With `other`, every cell shows `<value> → <value in other run>`."""
+    tables: dict[str, Table] = {}
+    for by, group, metrics, other_metrics in _iter_rows(summary, other):
+        if by not in tables:
+            tables[by] = Table(title=by)
+            tables[by].add_column(by if by != "total" else "")
+            for metric in METRICS:
+                tables[by].add_column(metric, justify="right")
+        row = [group]
+        for metric in METRICS:
+            cell = _format(metric, metrics.get(metric))
+            if other is not None:
+                cell += f" → {_format(metric, other_metrics.get(metric))}"
+            row.append(cell)
+        tables[by].add_row(*row)
+    for table in tables.values():
+        console.print(table)
+
+
+def print_transitions(transitions: Counter) -> None:
+    table = Table(title="exit status changes")
+    for column in ["exit status", "compared run", "instances"]:
+        table.add_column(column)
+    for (status, other_status), n in transitions.most_common():
+        if status != other_status:
+            table.add_row(status, other_status, str(n))
+    console.print(table)
+
+
+def to_csv(summary: dict[str, Any], other: dict[str, Any] | None = None) -> str:
+    """One row per group (columns `group_by` and `group`). With `other`, the metrics of the other run are added
+    with the suffix `_compare`.
+    """
+    columns = ["group_by", "group"] + METRICS
+    if other is not None:
+        columns += [f"{metric}_compare" for metric in METRICS]
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=columns, restval="")
+    writer.writeheader()
+    for by, group, metrics, other_metrics in _iter_rows(summary, other):
+        row = {"group_by": by, "group": group} | metrics
+        if other is not None:
+            row |= {f"{metric}_compare": value for metric, value in other_metrics.items()}
+        writer.writerow(row)
+    return output.getvalue()
+
+
+# fmt: off
+@app.command(help=__doc__)
+def main(
+    path: Annotated[Path, typer.Argument(help="Run directory (or a single trajectory)")] = Path("."),
+    compare: Annotated[Path | None, typer.Option("-c", "--compare", help="Second run to compare to")] = None,
+    group_by: Annotated[str, typer.Option("-b", "--by", help=f"Comma-separated groupings ({', '.join(GROUP_BY)})")] = ",".join(GROUP_BY),
+    output_format: Annotated[str, typer.Option("-f", "--format", help=f"Output format ({', '.join(FORMATS)})")] = "table",
+    output: Annotated[Path | None, typer.Option("-o", "--output", help="Save csv/json output to this file instead of printing it")] = None,
+    workers: Annotated[int, typer.Option("-w", "--workers", help="Number of processes that read trajectories")] = os.cpu_count() or 1,
+    use_catalog: Annotated[bool, typer.Option("--catalog/--no-catalog", help="Index the trajectories in the catalog of the run directory")] = True,
+) -> None:
+    # fmt: on
+    if output_format not in FORMATS:
+        raise typer.BadParameter(f"Unknown format {output_format!r}, use one of {', '.join(FORMATS)}")
+    groupings = [by.strip() for by in group_by.split(",") if by.strip()]
+    if unknown := [by for by in groupings if by not in GROUP_BY]:
+        raise typer.BadParameter(f"Cannot group by {', '.join(unknown)}, use one of {', '.join(GROUP_BY)}")
+    entries = load_entries(path, workers=workers, use_catalog=use_catalog)
+    summary = get_summary(entries, groupings)
+    other_entries = load_entries(compare, workers=workers, use_catalog=use_catalog) if compare is not None else None
+    other = get_summary(other_entries, groupings) if other_entries is not None else None
+
+    if output_format == "table":
+        print_tables(summary, other)
+        if other_entries is not None:
+            print_transitions(get_transitions(entries, other_entries))
+        return
+    if output_format == "csv":
+        text = to_csv(summary, other)
+    else:
+        data: dict[str, Any] = {"run": str(path), "summary": summary}
+        if other_entries is not None:
+            transitions = get_transitions(entries, other_entries)
+            data |= {
+                "compare": {"run": str(compare), "summary": other},
+                "transitions": [{"exit_status": a, "compare_exit_status": b, "n": n} for (a, b), n in transitions.items()],
+            }
+        text = json.dumps(data, indent=2)
+    if output is not None:
+        output.write_text(text)
+        console.print(f"Saved to {output}")
+    else:
+        print(text, end="" if text.endswith("\n") else "\n")
+
+
+if __name__ == "__main__":
+    app()
@@ -10,13 +10,13 @@ import re
 import threading
 import time
 import traceback
+from contextlib import nullcontext
 from pathlib import Path
+from typing import Annotated
 
 import typer
 import yaml
-from datasets import load_dataset
 from jinja2 import StrictUndefined, Template
-from rich.live import Live
 
 from minisweagent import Environment
 from minisweagent.agents.default import DefaultAgent
@@ -24,8 +24,26 @@ from minisweagent.config import builtin_config_dir, get_config_path
 from minisweagent.environments import get_environment
 from minisweagent.models import get_model
 from minisweagent.run.extra.utils.batch_progress import RunBatchProgressManager
-from minisweagent.run.utils.save import save_traj
-from minisweagent.utils.log import add_file_handler, logger
+from minisweagent.run.extra.utils.docker_images import DockerImageManager
+from minisweagent.run.extra.utils.metrics import BATCH_METRICS, MetricsServer
+from minisweagent.run.extra.utils.retry import (
+    EnvironmentStartupError,
+    RetryBudget,
+    RetryConfig,
+    classify_failure,
+    get_backoff,
+    get_environment_config,
+)
+from minisweagent.run.utils.save import TRAJECTORY_PATTERNS, save_traj, start_traj_stream
+from minisweagent.utils.log import (
+    add_file_handler,
+    add_instance_file_handler,
+    log_context,
+    log_queue,
+    logger,
+    remove_handler,
+    update_log_context,
+)
 
 _HELP_TEXT = """Run mini-SWE-agent on SWEBench instances.
 
@@ -63,8 +81,18 @@ class ProgressTrackingAgent(DefaultAgent):
         self.progress_manager.update_instance_status(
             self.instance_id, f"Step {self.model.n_calls + 1:3d} (${self.model.cost:.2f})"
         )
+        BATCH_METRICS.steps.inc()
+        update_log_context(step=self.model.n_calls + 1)
         return super().step()
 
+    def query(self) -> dict:
+        with BATCH_METRICS.model_latency.time():
+            return super().query()
+
+    def execute_action(self, action: dict) -> dict:
+        with BATCH_METRICS.execution_latency.time():
+            return super().execute_action(action)
+
 
 def get_swebench_docker_image_name(instance: dict) -> str:
     """Get the image name for a SWEBench instance."""
@@ -90,10 +118,24 @@ def get_sb_environment(config: dict, instance: dict) -> Environment:
         startup_command = Template(startup_command, undefined=StrictUndefined).render(**instance)
         out = env.execute(startup_command)
         if out["returncode"] != 0:
-            raise RuntimeError(f"Error executing startup command: {out}")
+            raise EnvironmentStartupError(f"Error executing startup command: {out}")
     return env
 
 
+def get_image_manager(config: dict, instances: list[dict]) -> DockerImageManager | None:
+    """Set up the image manager if it is enabled with `run.image_manager.enabled` and docker is used."""
+    manager_config = config.get("run", {}).get("image_manager", {})
+    env_config = config.get("environment", {})
+    if not manager_config.get("enabled") or env_config.get("environment_class", "docker") != "docker":
+        return None
+    if "executable" in env_config:
+        manager_config = {"executable": env_config["executable"]} | manager_config
+    manager = DockerImageManager(**manager_config)
+    manager.scan()
+    manager.schedule([get_swebench_docker_image_name(instance) for instance in instances])
+    return manager
+
+
 def update_preds_file(output_path: Path, instance_id: str, model_name: str, result: str):
     """Update the output JSON file with results from a single instance."""
     with _OUTPUT_FILE_LOCK:
@@ -124,48 +166,123 @@ def process_instance(
     output_dir: Path,
     config: dict,
     progress_manager: RunBatchProgressManager,
+    retry_budget: RetryBudget | None = None,
+    image_manager: DockerImageManager | None = None,
 ) -> None:
-    """Process a single SWEBench instance."""
+    """Process a single SWEBench instance.
+
+    Infrastructure errors (see `minisweagent.run.extra.utils.retry`) are retried with exponential backoff
+    as configured in `run.retry`. The retry history is saved in the trajectory.
+    """
     instance_id = instance["instance_id"]
     instance_dir = output_dir / instance_id
     # avoid inconsistent state if something here fails and there's leftover previous files
     remove_from_preds_file(output_dir / "preds.json", instance_id)
-    (instance_dir / f"{instance_id}.traj.json").unlink(missing_ok=True)
+    for pattern in TRAJECTORY_PATTERNS:
+        (instance_dir / pattern.replace("*", instance_id)).unlink(missing_ok=True)
+    # "jsonl": Append every message to the trajectory as it is added (see `start_traj_stream`)
+    # "json.gz"/"json.zst": Compact trajectories with blobs shared by all instances (see `run.utils.compact`)
+    traj_format = config.get("run", {}).get("trajectory_format", "json")
+    traj_path = instance_dir / f"{instance_id}.traj.{traj_format}"
+    retry_config = RetryConfig(**config.get("run", {}).get("retry", {}))
+    if retry_budget is None:
+        retry_budget = RetryBudget(retry_config.budget)
     model = get_model(config=config.get("model", {}))
     task = instance["problem_statement"]
 
     progress_manager.on_instance_start(instance_id)
-    progress_manager.update_instance_status(instance_id, "Pulling/starting docker")
+    BATCH_METRICS.instances_running.inc()
 
     agent = None
     extra_info = None
-
-    try:
-        env = get_sb_environment(config, instance)
-        agent = ProgressTrackingAgent(
-            model,
-            env,
-            progress_manager=progress_manager,
-            instance_id=instance_id,
-            **config.get("agent", {}),
-        )
-        exit_status, result = agent.run(task)
-    except Exception as e:
-        logger.error(f"Error processing instance {instance_id}: {e}", exc_info=True)
-        exit_status, result = type(e).__name__, str(e)
-        extra_info = {"traceback": traceback.format_exc()}
-    finally:
-        save_traj(
-            agent,
-            instance_dir / f"{instance_id}.traj.json",
-            exit_status=exit_status,
-            result=result,
-            extra_info=extra_info,
-            instance_id=instance_id,
-            print_fct=logger.info,
-        )
-        update_preds_file(output_dir / "preds.json", instance_id, model.config.model_name, result)
-        progress_manager.on_instance_end(instance_id, exit_status)
+    exit_status, result = None, None
+    retry_history: list[dict] = []
+    attempt = 1
+    start_time = time.time()
+
+    with log_context(instance_id=instance_id):
+        try:
+            while True:
+                progress_manager.update_instance_status(instance_id, "Pulling/starting docker")
+                phase = "environment"
+                image, env = None, None
+                startup_time = time.perf_counter()
+                try:
+                    if image_manager is not None:
+                        image_manager.acquire(get_swebench_docker_image_name(instance))
+                        image = get_swebench_docker_image_name(instance)
+                    attempt_config = config | {
+                        "environment": get_environment_config(config.get("environment", {}), attempt, retry_config)
+                    }
+                    env = get_sb_environment(attempt_config, instance)
+                    BATCH_METRICS.environment_startup.observe(time.perf_counter() - startup_time)
+                    phase = "agent"
+                    agent = ProgressTrackingAgent(
+                        model,
+                        env,
+                        progress_manager=progress_manager,
+                        instance_id=instance_id,
+                        **config.get("agent", {}),
+                    )
+                    if traj_format == "jsonl":
+                        start_traj_stream(agent, traj_path, instance_id=instance_id)
+                    exit_status, result = agent.run(task)
+                except Exception as e:
+                    logger.error(f"Error processing instance {instance_id}: {e}", exc_info=True)
+                    exit_status, result = type(e).__name__, str(e)
+                    category = classify_failure(e, phase=phase, config=retry_config)  # type: ignore[arg-type]
+                    extra_info = {"traceback": traceback.format_exc(), "failure_category": category}
+                    if category == "infrastructure" and attempt < retry_config.max_attempts and retry_budget.acquire():
+                        wait = get_backoff(attempt + 1, retry_config)
+                        retry_history.append(
+                            {
+                                "attempt": attempt,
+                                "phase": phase,
+                                "exit_status": exit_status,
+                                "error": result,
+                                "instance_cost": model.cost,
+                                "api_calls": model.n_calls,
+                                "wait": wait,
+                            }
+                        )
+                        logger.warning(
+                            f"Infrastructure error for {instance_id} (attempt {attempt}/{retry_config.max_attempts}), "
+                            f"retrying in {wait:.1f}s: {exit_status}"
+                        )
+                        progress_manager.update_instance_status(instance_id, f"Retry {attempt + 1} in {wait:.0f}s")
+                        BATCH_METRICS.instance_retries.inc(phase=phase)
+                        time.sleep(wait)
+                        attempt += 1
+                        if agent is not None and agent.trajectory_writer is not None:
+                            agent.trajectory_writer.close()
+                        agent, extra_info = None, None
+                        model = get_model(config=config.get("model", {}))
+                        continue
+                finally:
+                    if env is not None and hasattr(env, "cleanup"):
+                        # don't rely on __del__ to stop the container
+                        env.cleanup()
+                    if image is not None:
+                        image_manager.release(image)  # type: ignore[union-attr]
+                break
+        finally:
+            if retry_history:
+                extra_info = (extra_info or {}) | {"retries": retry_history}
+            extra_info = (extra_info or {}) | {"duration": time.time() - start_time}
+            save_traj(
+                agent,
+                traj_path,
+                exit_status=exit_status,
+                result=result,
+                extra_info=extra_info,
+                instance_id=instance_id,
+                print_fct=logger.info,
+                blob_dir=output_dir / "blobs",
+            )
+            update_preds_file(output_dir / "preds.json", instance_id, model.config.model_name, result)
+            progress_manager.on_instance_end(instance_id, exit_status)
+            BATCH_METRICS.instances_running.dec()
+            BATCH_METRICS.instances_completed.inc(exit_status=str(exit_status))
 
 
 def filter_instances(
@@ -203,12 +320,20 @@ def main(
     redo_existing: bool = typer.Option(False, "--redo-existing", help="Redo existing instances", rich_help_panel="Data selection"),
     config_spec: Path = typer.Option( builtin_config_dir / "extra" / "swebench.yaml", "-c", "--config", help="Path to a config file", rich_help_panel="Basic"),
     environment_class: str | None = typer.Option( None, "--environment-class", help="Environment type to use. Recommended are docker or singularity", rich_help_panel="Advanced"),
+    # New options are annotated (instead of using `typer.Option` as default), so that their defaults also apply when `main` is called from Python
+    headless: Annotated[bool, typer.Option("--headless", help="Log the progress instead of showing a live display (default if stdout is not a terminal)", rich_help_panel="Advanced")] = False,
+    metrics_port: Annotated[int | None, typer.Option("--metrics-port", help="Serve Prometheus metrics of the run on this port (at /metrics)", rich_help_panel="Advanced")] = None,
+    metrics_host: Annotated[str, typer.Option("--metrics-host", help="Interface for the metrics endpoint (0.0.0.0 to allow scraping from other hosts)", rich_help_panel="Advanced")] = "127.0.0.1",
+    json_logs: Annotated[bool, typer.Option("--json-logs", help="Write the log files as JSON lines (with instance_id and step of every record)", rich_help_panel="Advanced")] = False,
+    instance_logs: Annotated[bool, typer.Option("--instance-logs/--no-instance-logs", help="Also write the log of every instance to its output directory", rich_help_panel="Advanced")] = True,
 ) -> None:
     # fmt: on
+    from datasets import load_dataset  # slow to import
+
     output_path = Path(output)
     output_path.mkdir(parents=True, exist_ok=True)
     logger.info(f"Results will be saved to {output_path}")
-    add_file_handler(output_path / "minisweagent.log")
+    add_file_handler(output_path / ("minisweagent.log.jsonl" if json_logs else "minisweagent.log"), json_lines=json_logs)
 
     dataset_path = DATASET_MAPPING.get(subset, subset)
     logger.info(f"Loading dataset {dataset_path}, split {split}...")
@@ -231,7 +356,11 @@ def main(
     if model_class is not None:
         config.setdefault("model", {})["model_class"] = model_class
 
-    progress_manager = RunBatchProgressManager(len(instances), output_path / f"exit_statuses_{time.time()}.yaml")
+    progress_manager = RunBatchProgressManager(
+        len(instances), output_path / f"exit_statuses_{time.time()}.yaml", headless=True if headless else None
+    )
+    retry_budget = RetryBudget(RetryConfig(**config.get("run", {}).get("retry", {})).budget)
+    image_manager = get_image_manager(config, instances)
 
     def process_futures(futures: dict[concurrent.futures.Future, str]):
         for future in concurrent.futures.as_completed(futures):
@@ -244,12 +373,20 @@ def main(
                 logger.error(f"Error in future for instance {instance_id}: {e}", exc_info=True)
                 progress_manager.on_uncaught_exception(instance_id, e)
 
-    with Live(progress_manager.render_group, refresh_per_second=4):
+    metrics_server = None
+    if metrics_port is not None:
+        metrics_server = MetricsServer(host=metrics_host, port=metrics_port)
+        logger.info(f"Serving metrics at {metrics_server.url}")
+
+    instance_log_handler = add_instance_file_handler(output_path, json_lines=json_logs) if instance_logs else None
+
+    # Terminal and file output happen in a background thread, so that logging never blocks the workers
+    with log_queue(), progress_manager, metrics_server or nullcontext():
         with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
             futures = {
-                executor.submit(process_instance, instance, output_path, config, progress_manager): instance[
-                    "instance_id"
-                ]
+                executor.submit(
+                    process_instance, instance, output_path, config, progress_manager, retry_budget, image_manager
+                ): instance["instance_id"]
                 for instance in instances
             }
             try:
@@ -260,6 +397,11 @@ def main(
                     if not future.running() and not future.done():
                         future.cancel()
                 process_futures(futures)
+            finally:
+                if image_manager is not None:
+                    image_manager.shutdown()
+                if instance_log_handler is not None:
+                    remove_handler(instance_log_handler)
 
 
 if __name__ == "__main__":
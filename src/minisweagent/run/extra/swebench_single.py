@@ -5,7 +5,6 @@ from pathlib import Path
 
 import typer
 import yaml
-from datasets import load_dataset
 
 from minisweagent import global_config_dir
 from minisweagent.agents.interactive import InteractiveAgent
@@ -38,6 +37,8 @@ def main(
 ) -> None:
     # fmt: on
     """Run on a single SWE-Bench instance."""
+    from datasets import load_dataset  # slow to import
+
     dataset_path = DATASET_MAPPING.get(subset, subset)
     logger.info(f"Loading dataset from {dataset_path}, split {split}...")
     instances = {
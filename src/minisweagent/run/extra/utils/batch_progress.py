@@ -1,15 +1,22 @@
 """This module contains an auxiliary class for rendering progress of a batch run.
-It's identical to the one used in swe-agent.
+It's based on the one used in swe-agent, but workers only post events that are applied by a single renderer thread.
 """
 
 import collections
+import json
+import logging
+import os
+import queue
+import sys
+import threading
 import time
+from contextlib import nullcontext
 from datetime import timedelta
 from pathlib import Path
-from threading import Lock
 
 import yaml
 from rich.console import Group
+from rich.live import Live
 from rich.progress import (
     BarColumn,
     MofNCompleteColumn,
@@ -24,6 +31,8 @@ from rich.table import Table
 
 import minisweagent.models
 
+logger = logging.getLogger("minisweagent.progress")
+
 
 def _shorten_str(s: str, max_len: int, shorten_left=False) -> str:
     if not shorten_left:
@@ -38,20 +47,47 @@ class RunBatchProgressManager:
         self,
         num_instances: int,
         yaml_report_path: Path | None = None,
+        *,
+        headless: bool | None = None,
+        refresh_per_second: float = 4,
+        report_interval: float = 5.0,
+        log_interval: float = 60.0,
     ):
         """This class manages a progress bar/UI for run-batch
 
+        Workers only put events in a queue (without taking any locks). While the manager is running (`start`/`stop`
+        or as a context manager), a renderer thread applies all pending events at a fixed frame rate, so that
+        many status updates of the same instance are coalesced into one.
+
         Args:
             num_instances: Number of task instances
-            yaml_report_path: Path to save a yaml report of the instances and their exit statuses
+            yaml_report_path: Path to save a report of the instances and their exit statuses
+                (JSON if the suffix is `.json`, else YAML). Only rewritten if something changed, at most every
+                `report_interval` seconds, and when the manager stops.
+            headless: Don't show the live progress display, but log a summary every `log_interval` seconds instead
+                (e.g., for cluster jobs). Default: headless if stdout is not a terminal.
         """
 
         self._spinner_tasks: dict[str, TaskID] = {}
         """We need to map instance ID to the task ID that is used by the rich progress bar."""
 
-        self._lock = Lock()
+        self._events: queue.SimpleQueue[tuple[str, str, str | None]] = queue.SimpleQueue()
+        self._lock = threading.RLock()
+        """Only taken by the threads that apply events (renderer and readers), never by the workers"""
         self._start_time = time.time()
         self._total_instances = num_instances
+        self._n_completed = 0
+        self.headless = headless if headless is not None else not sys.stdout.isatty()
+        self._refresh_interval = 1 / refresh_per_second
+        self._report_interval = report_interval
+        self._log_interval = log_interval
+        self._table_outdated = False
+        self._report_outdated = False
+        self._last_report_time = 0.0
+        self._last_log_time = time.time()
+        self._n_completed_at_last_log = 0
+        self._thread: threading.Thread | None = None
+        self._stop_event = threading.Event()
 
         self._instances_by_exit_status = collections.defaultdict(list)
         self._main_progress_bar = Progress(
@@ -84,18 +120,69 @@ class RunBatchProgressManager:
 
     @property
     def n_completed(self) -> int:
-        return sum(len(instances) for instances in self._instances_by_exit_status.values())
+        with self._lock:
+            self._apply_events()
+            return self._n_completed
 
     def _get_eta_text(self) -> str:
         """Calculate estimated time remaining based on current progress."""
         try:
             estimated_remaining = (
-                (time.time() - self._start_time) / self.n_completed * (self._total_instances - self.n_completed)
+                (time.time() - self._start_time) / self._n_completed * (self._total_instances - self._n_completed)
             )
             return f"eta: {timedelta(seconds=int(estimated_remaining))}"
         except ZeroDivisionError:
             return ""
 
+    # --- Called by the workers ---
+
+    def update_instance_status(self, instance_id: str, message: str):
+        self._events.put(("status", instance_id, message))
+
+    def on_instance_start(self, instance_id: str):
+        self._events.put(("start", instance_id, None))
+
+    def on_instance_end(self, instance_id: str, exit_status: str | None) -> None:
+        self._events.put(("end", instance_id, exit_status))
+
+    def on_uncaught_exception(self, instance_id: str, exception: Exception) -> None:
+        self.on_instance_end(instance_id, f"Uncaught {type(exception).__name__}")
+
+    # --- Applying events ---
+
+    def _apply_events(self) -> None:
+        """Apply all pending events (lock must be held). Only the latest status of every instance is shown."""
+        statuses: dict[str, str] = {}
+        while True:
+            try:
+                kind, instance_id, value = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "start":
+                self._spinner_tasks[instance_id] = self._task_progress_bar.add_task(
+                    description=f"Task {instance_id}",
+                    status="Task initialized",
+                    total=None,
+                    instance_id=instance_id,
+                )
+            elif kind == "status":
+                statuses[instance_id] = value  # type: ignore[assignment]
+            else:
+                statuses.pop(instance_id, None)
+                if (task_id := self._spinner_tasks.pop(instance_id, None)) is not None:
+                    self._task_progress_bar.remove_task(task_id)
+                self._instances_by_exit_status[value].append(instance_id)
+                self._n_completed += 1
+                self._main_progress_bar.update(self._main_task_id, advance=1)
+                self._table_outdated = self._report_outdated = True
+        for instance_id, message in statuses.items():
+            if instance_id in self._spinner_tasks:
+                self._task_progress_bar.update(
+                    self._spinner_tasks[instance_id],
+                    status=_shorten_str(message, 30),
+                    instance_id=_shorten_str(instance_id, 25, shorten_left=True),
+                )
+
     def update_exit_status_table(self):
         # We cannot update the existing table, so we need to create a new one and
         # assign it back to the render group.
@@ -103,76 +190,138 @@ class RunBatchProgressManager:
         t.add_column("Exit Status")
         t.add_column("Count", justify="right", style="bold cyan")
         t.add_column("Most recent instances")
-        t.show_header = False
         with self._lock:
-            t.show_header = True
             # Sort by number of instances in descending order
             sorted_items = sorted(self._instances_by_exit_status.items(), key=lambda x: len(x[1]), reverse=True)
             for status, instances in sorted_items:
-                instances_str = _shorten_str(", ".join(reversed(instances)), 55)
+                instances_str = _shorten_str(", ".join(reversed(instances[-10:])), 55)
                 t.add_row(status, str(len(instances)), instances_str)
-        assert self.render_group is not None
+            self._table_outdated = False
         self.render_group.renderables[0] = t
 
-    def _update_total_costs(self) -> None:
+    def _update(self) -> None:
+        """Apply pending events and update everything that is shown (once per frame)."""
         with self._lock:
+            self._apply_events()
+            if self._table_outdated and not self.headless:
+                self.update_exit_status_table()
             self._main_progress_bar.update(
                 self._main_task_id,
                 total_cost=f"{minisweagent.models.GLOBAL_MODEL_STATS.cost:.2f}",
                 eta=self._get_eta_text(),
             )
+            self._maybe_save_report()
 
-    def update_instance_status(self, instance_id: str, message: str):
-        assert self._task_progress_bar is not None
-        assert self._main_progress_bar is not None
-        with self._lock:
-            self._task_progress_bar.update(
-                self._spinner_tasks[instance_id],
-                status=_shorten_str(message, 30),
-                instance_id=_shorten_str(instance_id, 25, shorten_left=True),
-            )
-        self._update_total_costs()
+    def _maybe_save_report(self, *, force: bool = False) -> None:
+        if self._yaml_report_path is None or not self._report_outdated:
+            return
+        if force or time.time() - self._last_report_time >= self._report_interval:
+            self._save_overview_data(self._yaml_report_path)
+            self._report_outdated = False
+            self._last_report_time = time.time()
 
-    def on_instance_start(self, instance_id: str):
+    def get_summary(self) -> str:
+        """One-line summary of the progress (e.g., for logs)."""
         with self._lock:
-            self._spinner_tasks[instance_id] = self._task_progress_bar.add_task(
-                description=f"Task {instance_id}",
-                status="Task initialized",
-                total=None,
-                instance_id=instance_id,
+            self._apply_events()
+            statuses = ", ".join(
+                f"{status}: {len(instances)}"
+                for status, instances in sorted(self._instances_by_exit_status.items(), key=lambda x: -len(x[1]))
+            )
+            return (
+                f"{self._n_completed}/{self._total_instances} instances completed"
+                + (f" ({statuses})" if statuses else "")
+                + f", {len(self._spinner_tasks)} running, cost ${minisweagent.models.GLOBAL_MODEL_STATS.cost:.2f}"
+                + (f", {eta}" if (eta := self._get_eta_text()) else "")
             )
 
-    def on_instance_end(self, instance_id: str, exit_status: str | None) -> None:
-        self._instances_by_exit_status[exit_status].append(instance_id)
+    def _maybe_log_summary(self, *, force: bool = False) -> None:
+        if force or time.time() - self._last_log_time >= self._log_interval:
+            if force or self._n_completed != self._n_completed_at_last_log:
+                logger.info(self.get_summary())
+            self._last_log_time = time.time()
+            self._n_completed_at_last_log = self._n_completed
+
+    # --- Renderer thread ---
+
+    def _run_renderer(self) -> None:
+        live = Live(self.render_group, auto_refresh=False) if not self.headless else None
+        with live or nullcontext():
+            while not self._stop_event.wait(self._refresh_interval):
+                self._update()
+                if live is not None:
+                    live.refresh()
+                else:
+                    self._maybe_log_summary()
+            self.flush()
+            if live is not None:
+                live.refresh()
+            else:
+                self._maybe_log_summary(force=True)
+
+    def start(self) -> None:
+        """Start showing the progress (or logging it in headless mode) in a background thread."""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run_renderer, name="progress-renderer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the renderer thread after applying all pending events and saving the report."""
+        if self._thread is None:
+            self.flush()
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def __enter__(self) -> "RunBatchProgressManager":
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def flush(self) -> None:
+        """Apply all pending events and save the report now."""
         with self._lock:
-            try:
-                self._task_progress_bar.remove_task(self._spinner_tasks[instance_id])
-            except KeyError:
-                pass
-            self._main_progress_bar.update(TaskID(0), advance=1, eta=self._get_eta_text())
-        self.update_exit_status_table()
-        self._update_total_costs()
-        if self._yaml_report_path is not None:
-            self._save_overview_data_yaml(self._yaml_report_path)
+            self._update()
+            self._maybe_save_report(force=True)
 
-    def on_uncaught_exception(self, instance_id: str, exception: Exception) -> None:
-        self.on_instance_end(instance_id, f"Uncaught {type(exception).__name__}")
+    # --- Reports ---
 
     def print_report(self) -> None:
         """Print complete list of instances and their exit statuses."""
-        for status, instances in self._instances_by_exit_status.items():
-            print(f"{status}: {len(instances)}")
-            for instance in instances:
-                print(f"  {instance}")
+        with self._lock:
+            self._apply_events()
+            for status, instances in self._instances_by_exit_status.items():
+                print(f"{status}: {len(instances)}")
+                for instance in instances:
+                    print(f"  {instance}")
 
     def _get_overview_data(self) -> dict:
         """Get data like exit statuses, total costs, etc."""
-        return {
-            # convert defaultdict to dict because of serialization
-            "instances_by_exit_status": dict(self._instances_by_exit_status),
-        }
-
-    def _save_overview_data_yaml(self, path: Path) -> None:
-        """Save a yaml report of the instances and their exit statuses."""
         with self._lock:
-            path.write_text(yaml.dump(self._get_overview_data(), indent=4))
+            self._apply_events()
+            return {
+                # convert defaultdict to dict because of serialization
+                "instances_by_exit_status": {k: list(v) for k, v in self._instances_by_exit_status.items()},
+            }
+
+    def _save_overview_data(self, path: Path) -> None:
+        """Save a report of the instances and their exit statuses. The report groups all instances by exit status,
+        so it is rewritten as a whole (not appended to). It is written to a temporary file first, so that readers
+        never see a partial report.
+        """
+        data = self._get_overview_data()
+        text = json.dumps(data, indent=2) if path.suffix == ".json" else yaml.dump(data, indent=4)
+        # Created with open() (unlike tempfile.mkstemp) so that the report has the usual permissions (umask)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(tmp_path, "w") as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
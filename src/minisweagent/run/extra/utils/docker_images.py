@@ -0,0 +1,222 @@
+"""Docker image management for batch runs.
+
+Without it, every `DockerEnvironment` lets `docker run` pull its image implicitly. With many workers,
+this means that the same image is pulled several times in parallel and that the disk fills up with
+images of instances that have long finished. The `DockerImageManager`
+
+- deduplicates concurrent pulls of the same image,
+- pre-pulls the images of upcoming instances with bounded parallelism,
+- removes least-recently-used images once the images it tracks exceed a disk budget.
+"""
+
+import concurrent.futures
+import logging
+import os
+import re
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, field
+
+
+@dataclass
+class DockerImageManagerConfig:
+    enabled: bool = False
+    """Whether to use the image manager at all (only has an effect for the docker environment)."""
+    executable: str = os.getenv("MSWEA_DOCKER_EXECUTABLE", "docker")
+    """Path to the docker/container executable."""
+    pull_timeout: int = 600
+    """Timeout in seconds for pulling a single image."""
+    max_parallel_pulls: int = 4
+    """Maximum number of images that are pulled at the same time."""
+    prefetch: int = 4
+    """Number of images of upcoming instances to pull ahead of time."""
+    disk_budget_gb: float = 0
+    """Remove least-recently-used images once the images tracked by the manager exceed this size.
+    Note that layers shared between images are counted once per image, so this is an upper bound.
+    Set to 0 to never remove images.
+    """
+    evictable_pattern: str = r"sweb\.eval\."
+    """Only images matching this regular expression are ever removed."""
+
+
+@dataclass
+class _ImageState:
+    size: int = 0
+    """Size in bytes (0 if unknown or not pulled yet)"""
+    last_used: float = 0.0
+    in_use: int = 0
+    """Number of instances currently using the image"""
+    pull: concurrent.futures.Future | None = field(default=None, repr=False)
+
+
+class DockerImageManager:
+    def __init__(
+        self, *, config_class: type = DockerImageManagerConfig, logger: logging.Logger | None = None, **kwargs
+    ):
+        """Pulls, pre-pulls and removes docker images for a batch run.
+        See `DockerImageManagerConfig` for keyword arguments.
+        """
+        self.config = config_class(**kwargs)
+        self.logger = logger or logging.getLogger("minisweagent.images")
+        self._lock = threading.RLock()
+        self._images: dict[str, _ImageState] = {}
+        self._queue: list[str] = []
+        self._queue_index: dict[str, int] = {}
+        self._i_queue = 0
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.config.max_parallel_pulls, thread_name_prefix="minisweagent-image-pull"
+        )
+
+    def _run(self, *args: str, timeout: int = 60) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            [self.config.executable, *args], capture_output=True, text=True, timeout=timeout, check=True
+        )
+
+    def _get_sizes(self, images: list[str]) -> dict[str, int]:
+        """Sizes in bytes of images that exist locally."""
+        sizes = {}
+        for image in images:
+            try:
+                sizes[image] = int(self._run("image", "inspect", "--format", "{{.Size}}", image).stdout.strip() or 0)
+            except (subprocess.CalledProcessError, subprocess.TimeoutExpired, ValueError):
+                pass
+        return sizes
+
+    def scan(self) -> None:
+        """Track evictable images that already exist locally (e.g., from previous runs).
+        They count as least recently used.
+        """
+        try:
+            output = self._run("images", "--format", "{{.Repository}}:{{.Tag}}").stdout
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+            self.logger.warning(f"Could not list local docker images: {e}")
+            return
+        images = [line.strip() for line in output.splitlines() if re.search(self.config.evictable_pattern, line)]
+        sizes = self._get_sizes(images)
+        with self._lock:
+            for image, size in sizes.items():
+                self._images.setdefault(image, _ImageState(size=size))
+        self.logger.info(f"Found {len(sizes)} local images ({sum(sizes.values()) / 1e9:.1f} GB)")
+        self.evict()
+
+    def schedule(self, images: list[str]) -> None:
+        """Set the images of all queued instances in the order in which they will be processed."""
+        with self._lock:
+            self._queue = list(images)
+            self._queue_index = {}
+            for i, image in enumerate(self._queue):
+                self._queue_index.setdefault(image, i)
+            self._i_queue = 0
+        self._prefetch()
+
+    def pull(self, image: str) -> concurrent.futures.Future:
+        """Pull the image in the background unless it is already being pulled or has been pulled.
+        Concurrent calls for the same image share the same future.
+        """
+        with self._lock:
+            state = self._images.setdefault(image, _ImageState())
+            if state.pull is None or (
+                state.pull.done() and (state.pull.cancelled() or state.pull.exception() is not None)
+            ):
+                state.pull = self._executor.submit(self._pull, image)
+            return state.pull
+
+    def _pull(self, image: str) -> None:
+        sizes = self._get_sizes([image])
+        if image not in sizes:
+            self.logger.info(f"Pulling image {image}")
+            start_time = time.time()
+            self._run("pull", image, timeout=self.config.pull_timeout)
+            self.logger.info(f"Pulled image {image} in {time.time() - start_time:.1f}s")
+            sizes = self._get_sizes([image])
+        with self._lock:
+            state = self._images.setdefault(image, _ImageState())
+            state.size = sizes.get(image, 0)
+            state.last_used = time.time()
+        self.evict()
+
+    def _prefetch(self) -> None:
+        if self.config.prefetch <= 0:
+            return
+        with self._lock:
+            upcoming = self._queue[self._i_queue : self._i_queue + self.config.prefetch]
+        for image in upcoming:
+            self.pull(image)
+
+    def acquire(self, image: str) -> None:
+        """Make sure that the image exists locally and protect it from eviction until `release` is called.
+        Raises the exception of the pull if it failed.
+        """
+        with self._lock:
+            self._images.setdefault(image, _ImageState()).in_use += 1
+            if (i_queue := self._queue_index.get(image)) is not None:
+                self._i_queue = max(self._i_queue, i_queue + 1)
+            future = self.pull(image)
+        self._prefetch()
+        try:
+            future.result()
+        except BaseException:
+            self.release(image)
+            raise
+
+    def release(self, image: str) -> None:
+        """Mark the image as no longer used by an instance."""
+        with self._lock:
+            if (state := self._images.get(image)) is not None:
+                state.in_use = max(state.in_use - 1, 0)
+                state.last_used = time.time()
+        self.evict()
+
+    @property
+    def disk_usage(self) -> int:
+        """Total size in bytes of all tracked images."""
+        with self._lock:
+            return sum(state.size for state in self._images.values())
+
+    @property
+    def n_pending_pulls(self) -> int:
+        with self._lock:
+            return sum(1 for state in self._images.values() if state.pull is not None and not state.pull.done())
+
+    def _is_evictable(self, image: str, state: _ImageState, protected: set[str]) -> bool:
+        return (
+            state.in_use == 0
+            and state.size > 0
+            and (state.pull is None or state.pull.done())
+            and image not in protected
+            and re.search(self.config.evictable_pattern, image) is not None
+        )
+
+    def evict(self) -> None:
+        """Remove least-recently-used images until the tracked images fit into the disk budget."""
+        budget = self.config.disk_budget_gb * 1e9
+        if budget <= 0:
+            return
+        victims: dict[str, _ImageState] = {}
+        with self._lock:
+            total = self.disk_usage
+            # Don't remove images that we're about to use
+            protected = set(self._queue[self._i_queue : self._i_queue + self.config.prefetch])
+            candidates = sorted(
+                (item for item in self._images.items() if self._is_evictable(*item, protected)),
+                key=lambda item: item[1].last_used,
+            )
+            for image, state in candidates:
+                if total <= budget:
+                    break
+                victims[image] = self._images.pop(image)
+                total -= state.size
+        for image, state in victims.items():
+            try:
+                self._run("rmi", image)
+                self.logger.info(f"Removed image {image} ({state.size / 1e9:.1f} GB)")
+            except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+                # Most likely a container still uses it; try again next time
+                self.logger.debug(f"Could not remove image {image}: {e}")
+                with self._lock:
+                    self._images.setdefault(image, state)
+
+    def shutdown(self) -> None:
+        """Cancel all pending pre-pulls."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
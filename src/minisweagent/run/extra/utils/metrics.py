@@ -0,0 +1,267 @@
+"""Prometheus metrics of batch runs.
+
+The batch runner records its metrics in `BATCH_METRICS` (counters and histograms with a lock each, so recording
+is cheap). The model usage is read from `GLOBAL_MODEL_STATS` whenever the metrics are scraped.
+`MetricsServer` serves all of them in the Prometheus text format, e.g.:
+
+```bash
+mini-extra swebench ... --metrics-port 9100
+curl localhost:9100/metrics
+```
+"""
+
+import bisect
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from minisweagent.models import GLOBAL_MODEL_STATS
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+STARTUP_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric {self.name} has labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @abstractmethod
+    def _samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        """(sample name, labels, value) of all samples"""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value in self._samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class _ScrapedCounter(Gauge):
+    """Counter whose values are copied from another source when the metrics are scraped."""
+
+    kind = "counter"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: tuple[float, ...] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        self._values: dict[tuple[str, ...], list[float]] = {}
+        """Labels -> [count per bucket (not cumulative) ..., count above the last bucket, sum]"""
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        i_bucket = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            if (values := self._values.get(key)) is None:
+                values = self._values[key] = [0] * (len(self.buckets) + 2)
+            values[i_bucket] += 1
+            values[-1] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of the block (also if it raises)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def get_count(self, **labels: str) -> int:
+        with self._lock:
+            values = self._values.get(self._key(labels))
+            return int(sum(values[:-1])) if values else 0
+
+    def _samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        with self._lock:
+            all_values = {key: list(values) for key, values in self._values.items()}
+        for key, values in sorted(all_values.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for upper, count in zip([*self.buckets, math.inf], values[:-1]):
+                cumulative += count
+                yield f"{self.name}_bucket", labels | {"le": _format_value(upper)}, cumulative
+            yield f"{self.name}_sum", labels, values[-1]
+            yield f"{self.name}_count", labels, cumulative
+
+
+class BatchMetrics:
+    def __init__(self):
+        """Metrics of a batch run (see the module docstring)."""
+        self.instances_running = Gauge("mswea_instances_running", "Instances that are being processed")
+        self.instances_completed = Counter(
+            "mswea_instances_completed_total", "Instances that finished, by exit status", ("exit_status",)
+        )
+        self.steps = Counter("mswea_agent_steps_total", "Agent steps of all instances")
+        self.model_latency = Histogram("mswea_model_query_seconds", "Duration of model queries (including retries)")
+        self.execution_latency = Histogram(
+            "mswea_environment_execute_seconds", "Duration of command executions in the environment"
+        )
+        self.environment_startup = Histogram(
+            "mswea_environment_startup_seconds",
+            "Time to start the environment of an instance (e.g., pull and start a container)",
+            buckets=STARTUP_BUCKETS,
+        )
+        self.instance_retries = Counter(
+            "mswea_instance_retries_total", "Retries of instances after infrastructure errors", ("phase",)
+        )
+        self._metrics = [
+            self.instances_running,
+            self.instances_completed,
+            self.steps,
+            self.model_latency,
+            self.execution_latency,
+            self.environment_startup,
+            self.instance_retries,
+        ]
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text format (including the usage in `GLOBAL_MODEL_STATS`)."""
+        return "".join(metric.render() for metric in self._metrics) + _render_model_stats()
+
+
+def _render_model_stats() -> str:
+    snapshot = GLOBAL_MODEL_STATS.snapshot()
+    cost = _ScrapedCounter("mswea_model_cost_dollars_total", "Spend on model calls in USD", ("model",))
+    calls = _ScrapedCounter("mswea_model_calls_total", "Model calls", ("model",))
+    tokens = _ScrapedCounter("mswea_model_tokens_total", "Tokens of model calls", ("model", "direction"))
+    errors = _ScrapedCounter(
+        "mswea_model_errors_total", "Failed model calls that were retried, by error type", ("error_type",)
+    )
+    rate_limits = _ScrapedCounter("mswea_model_rate_limit_errors_total", "Rate limit (HTTP 429) errors of model calls")
+    for model, usage in snapshot.by_model.items():
+        cost.set(usage.cost, model=model)
+        calls.set(usage.n_calls, model=model)
+        tokens.set(usage.input_tokens, model=model, direction="input")
+        tokens.set(usage.output_tokens, model=model, direction="output")
+    model_errors = GLOBAL_MODEL_STATS.errors
+    for error_type, count in model_errors.items():
+        errors.set(count, error_type=error_type)
+    rate_limits.set(sum(count for error_type, count in model_errors.items() if "RateLimit" in error_type))
+    return "".join(metric.render() for metric in [cost, calls, tokens, errors, rate_limits])
+
+
+BATCH_METRICS = BatchMetrics()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0].rstrip("/") not in ("/metrics", ""):
+            self.send_error(404)
+            return
+        body = self.server.metrics.render().encode()  # type: ignore[attr-defined]
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MetricsServer:
+    def __init__(self, *, host: str = "127.0.0.1", port: int = 0, metrics: BatchMetrics | None = None):
+        """Serve the metrics at `/metrics` from a background thread.
+
+        Args:
+            host: Interface to listen on (use `0.0.0.0` to allow scraping from other hosts)
+            port: Port to listen on (0: any free port)
+        """
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.metrics = metrics or BATCH_METRICS  # type: ignore[attr-defined]
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self) -> "MetricsServer":
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, daemon=True, name="minisweagent-metrics-server"
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "MetricsServer":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
@@ -0,0 +1,107 @@
+"""Classification of batch-run failures and automatic retries of infrastructure errors.
+
+A failing instance can either be an *agent outcome* (the agent crashed, hit a limit, produced garbage)
+or an *infrastructure error* (the docker image could not be pulled, the `env_startup_command` failed,
+the model provider was unreachable). Only the latter are worth retrying automatically.
+"""
+
+import random
+import threading
+from dataclasses import dataclass, field
+from typing import Literal
+
+FailureCategory = Literal["infrastructure", "agent"]
+
+
+@dataclass
+class RetryConfig:
+    max_attempts: int = 3
+    """Maximum number of attempts per instance (including the first one). Set to 1 to disable retries."""
+    budget: int = 50
+    """Maximum number of retries for the whole run (shared by all workers). Set to 0 for no limit."""
+    backoff_base: float = 10.0
+    """Wait time in seconds before the first retry. Doubles with every further attempt."""
+    backoff_max: float = 300.0
+    """Maximum wait time in seconds between attempts."""
+    backoff_jitter: float = 0.25
+    """Random jitter added to the wait time, as a fraction of the wait time."""
+    infrastructure_exceptions: list[str] = field(
+        default_factory=lambda: [
+            "TimeoutExpired",
+            "CalledProcessError",
+            "EnvironmentStartupError",
+            "APIConnectionError",
+            "ServiceUnavailableError",
+            "InternalServerError",
+            "RateLimitError",
+            "OpenRouterRateLimitError",
+        ]
+    )
+    """Names of exception classes (or of any of their base classes) that are considered infrastructure errors
+    when they are raised while the agent is running. Errors raised while setting up the environment are always
+    considered infrastructure errors.
+    """
+    environment_overrides: list[dict] = field(default_factory=list)
+    """Overrides to the environment config for retries. The n-th retry uses entry `(n - 1) % len(...)`.
+    For example, this can be used to retry with a different `executable` (e.g., a wrapper that talks to another
+    docker host) or a different `environment_class`.
+    """
+
+
+class EnvironmentStartupError(RuntimeError):
+    """Raised when the environment could be created, but its startup command failed."""
+
+
+def classify_failure(
+    exception: BaseException, *, phase: Literal["environment", "agent"], config: RetryConfig
+) -> FailureCategory:
+    """Decide whether an exception is an infrastructure error or an agent outcome."""
+    if phase == "environment":
+        return "infrastructure"
+    names = {cls.__name__ for cls in type(exception).__mro__}
+    if names & set(config.infrastructure_exceptions):
+        return "infrastructure"
+    return "agent"
+
+
+def get_backoff(attempt: int, config: RetryConfig) -> float:
+    """Wait time before `attempt` (the first retry is attempt 2)."""
+    wait = min(config.backoff_base * 2 ** max(attempt - 2, 0), config.backoff_max)
+    return wait * (1 + random.uniform(0, config.backoff_jitter))
+
+
+def get_environment_config(env_config: dict, attempt: int, config: RetryConfig) -> dict:
+    """Environment config for the given attempt (the first attempt is attempt 1)."""
+    if attempt <= 1 or not config.environment_overrides:
+        return dict(env_config)
+    return env_config | config.environment_overrides[(attempt - 2) % len(config.environment_overrides)]
+
+
+class RetryBudget:
+    def __init__(self, limit: int = 0):
+        """Thread-safe retry budget shared by all workers of a run.
+
+        Args:
+            limit: Maximum number of retries. 0 means no limit.
+        """
+        self.limit = limit
+        self._used = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        """Take one retry from the budget. Returns False if the budget is exhausted."""
+        with self._lock:
+            if 0 < self.limit <= self._used:
+                return False
+            self._used += 1
+            return True
+
+    @property
+    def used(self) -> int:
+        return self._used
+
+    @property
+    def remaining(self) -> int | None:
+        if self.limit <= 0:
+            return None
+        return max(self.limit - self._used, 0)
@@ -9,16 +9,19 @@ More information about the usage: [bold green]https://mini-swe-agent.com/latest/
 
 import json
 import os
+import sqlite3
 from pathlib import Path
+from typing import Annotated
 
 import typer
-from rich.text import Text
 from textual.app import App, ComposeResult
 from textual.binding import Binding
 from textual.containers import Container, Vertical, VerticalScroll
 from textual.widgets import Footer, Header, Static
 
-from minisweagent.agents.interactive_textual import _messages_to_steps
+from minisweagent.agents.interactive_textual import MessageRenderCache, _messages_to_steps, mount_step
+from minisweagent.run.utils.catalog import TrajectoryCatalog, TrajectoryEntry
+from minisweagent.run.utils.save import find_trajectories, iter_traj_messages
 
 app = typer.Typer(rich_markup_mode="rich", add_completion=False)
 
@@ -33,10 +36,25 @@ class TrajectoryInspector(App):
         Binding("k,up", "scroll_up", "Scroll up"),
         Binding("L", "next_trajectory", "Next trajectory"),
         Binding("H", "previous_trajectory", "Previous trajectory"),
+        Binding("f", "next_failure", "Next failure"),
+        Binding("F", "previous_failure", "Previous failure"),
         Binding("q", "quit", "Quit"),
     ]
 
-    def __init__(self, trajectory_files: list[Path]):
+    def __init__(
+        self,
+        trajectory_files: list[Path],
+        entries: list[TrajectoryEntry] | None = None,
+        *,
+        start_steps: list[int] | None = None,
+    ):
+        """Browse trajectories. Message bodies are only loaded when navigating to a trajectory.
+
+        Args:
+            trajectory_files: Trajectories to browse
+            entries: Catalog entries of the trajectories (same order), shown in the title and used to jump to failures
+            start_steps: Step to show first for every trajectory (same order, e.g., the steps of search results)
+        """
         css_path = os.environ.get(
             "MSWEA_INSPECTOR_STYLE_PATH", str(Path(__file__).parent.parent / "config" / "mini.tcss")
         )
@@ -44,6 +62,9 @@ class TrajectoryInspector(App):
 
         super().__init__()
         self.trajectory_files = trajectory_files
+        self.entries = entries
+        self.start_steps = start_steps
+        self._render_cache = MessageRenderCache()
         self._i_trajectory = 0
         self._i_step = 0
         self.messages = []
@@ -100,18 +121,11 @@ class TrajectoryInspector(App):
 
         trajectory_file = self.trajectory_files[self.i_trajectory]
         try:
-            data = json.loads(trajectory_file.read_text())
-
-            if isinstance(data, list):
-                self.messages = data
-            elif isinstance(data, dict) and "messages" in data:
-                self.messages = data["messages"]
-            else:
-                raise ValueError("Unrecognized trajectory format")
-
+            self.messages = list(iter_traj_messages(trajectory_file))
             self.steps = _messages_to_steps(self.messages)
-            self._i_step = 0
-        except (json.JSONDecodeError, FileNotFoundError, ValueError) as e:
+            start_step = self.start_steps[self.i_trajectory] if self.start_steps else 0
+            self._i_step = max(0, min(start_step, self.n_steps - 1))
+        except (json.JSONDecodeError, FileNotFoundError, ValueError, KeyError, TypeError) as e:
             self.messages = []
             self.steps = []
             self.notify(f"Error loading {trajectory_file.name}: {e}", severity="error")
@@ -143,28 +157,17 @@ class TrajectoryInspector(App):
             self.title = "Trajectory Inspector - No Data"
             return
 
-        for message in self.steps[self.i_step]:
-            if isinstance(message["content"], list):
-                parts = []
-                for item in message["content"]:
-                    if item.get("type") == "thought":
-                        parts.append(f"[Thought] {item['text']}")
-                    else:
-                        parts.append(item.get("text", ""))
-                content_str = "\n".join(parts)
-            else:
-                content_str = str(message["content"])
-            message_container = Vertical(classes="message-container")
-            container.mount(message_container)
-            role = message["role"].replace("assistant", "mini-swe-agent")
-            message_container.mount(Static(role.upper(), classes="message-header"))
-            message_container.mount(Static(Text(content_str, no_wrap=False), classes="message-content"))
+        mount_step(container, self.steps[self.i_step], self._render_cache)
 
         self.title = (
             f"Trajectory {self.i_trajectory + 1}/{self.n_trajectories} - "
             f"{self.current_trajectory_name} - "
             f"Step {self.i_step + 1}/{self.n_steps}"
         )
+        if self.entries:
+            entry = self.entries[self.i_trajectory]
+            cost = f"${entry.cost:.2f}" if entry.cost is not None else "-"
+            self.sub_title = f"{entry.exit_status} - {cost} - {entry.n_steps} steps - {entry.model_name}"
 
     # --- Navigation actions ---
 
@@ -186,6 +189,27 @@ class TrajectoryInspector(App):
     def action_previous_trajectory(self) -> None:
         self.i_trajectory -= 1
 
+    def _jump_to_failure(self, direction: int) -> None:
+        """Failures are trajectories with an exit status other than `Submitted`. Trajectories without exit status
+        (e.g., unreadable or still running) are skipped.
+        """
+        if not self.entries:
+            self.notify("Jumping to failures requires the catalog", severity="warning")
+            return
+        i = self.i_trajectory + direction
+        while 0 <= i < self.n_trajectories:
+            if self.entries[i].exit_status not in ("Submitted", None):
+                self.i_trajectory = i
+                return
+            i += direction
+        self.notify("No more failures")
+
+    def action_next_failure(self) -> None:
+        self._jump_to_failure(1)
+
+    def action_previous_failure(self) -> None:
+        self._jump_to_failure(-1)
+
     def action_scroll_down(self) -> None:
         vs = self.query_one(VerticalScroll)
         vs.scroll_to(y=vs.scroll_target_y + 15)
@@ -195,22 +219,55 @@ class TrajectoryInspector(App):
         vs.scroll_to(y=vs.scroll_target_y - 15)
 
 
+def _query_catalog(path: Path, catalog_path: Path | None, **filters) -> tuple[list[Path], list[TrajectoryEntry]]:
+    with TrajectoryCatalog(path, db_path=catalog_path) as catalog:
+        catalog.update()
+        entries = catalog.query(**filters)
+        return [catalog.get_path(entry) for entry in entries], entries
+
+
+# fmt: off
+# Options are annotated (instead of using `typer.Option` as default), so that `main` can also be called from Python
 @app.command(help=__doc__)
 def main(
     path: str = typer.Argument(".", help="Directory to search for trajectory files or specific trajectory file"),
+    exit_status: Annotated[str | None, typer.Option("-s", "--exit-status", help="Only show trajectories with this exit status ('!Submitted' for all failures)")] = None,
+    instance_id: Annotated[str | None, typer.Option("-i", "--instance", help="Only show instances matching this glob pattern")] = None,
+    sort_by: Annotated[str, typer.Option("--sort", help="Sort by path, instance_id, exit_status, cost, n_steps, mtime, ...")] = "path",
+    descending: Annotated[bool, typer.Option("--desc", help="Sort in descending order")] = False,
+    use_catalog: Annotated[bool, typer.Option("--catalog/--no-catalog", help="Index the trajectories of a directory (enables filtering and sorting)")] = True,
+    catalog_path: Annotated[Path | None, typer.Option("--catalog-path", help="Catalog database (default: .traj_catalog.sqlite in the directory)")] = None,
 ) -> None:
+    # fmt: on
     path_obj = Path(path)
 
+    entries = None
+    filters = {"exit_status": exit_status, "instance_id": instance_id, "sort_by": sort_by, "descending": descending}
+    is_filtered = exit_status is not None or instance_id is not None or sort_by != "path" or descending
     if path_obj.is_file():
         trajectory_files = [path_obj]
     elif path_obj.is_dir():
-        trajectory_files = sorted(path_obj.rglob("*.traj.json"))
+        if not use_catalog and is_filtered:
+            raise typer.BadParameter("--exit-status, --instance, --sort and --desc require the catalog")
+        if use_catalog:
+            try:
+                trajectory_files, entries = _query_catalog(path_obj, catalog_path, **filters)
+            except ValueError as e:
+                raise typer.BadParameter(str(e)) from e
+            except sqlite3.Error as e:
+                if is_filtered:
+                    msg = f"Cannot use the trajectory catalog ({e}), which filtering and sorting require"
+                    raise typer.BadParameter(msg) from e
+                typer.echo(f"Cannot use the trajectory catalog ({e}), searching for trajectories instead", err=True)
+                trajectory_files = find_trajectories(path_obj)
+        else:
+            trajectory_files = find_trajectories(path_obj)
         if not trajectory_files:
             raise typer.BadParameter(f"No trajectory files found in '{path}'")
     else:
         raise typer.BadParameter(f"Error: Path '{path}' does not exist")
 
-    inspector = TrajectoryInspector(trajectory_files)
+    inspector = TrajectoryInspector(trajectory_files, entries)
     inspector.run()
 
 
@@ -5,19 +5,15 @@
 
 import os
 import traceback
+from importlib import import_module
 from pathlib import Path
 from typing import Any
 
 import typer
 import yaml
-from prompt_toolkit.formatted_text import HTML
-from prompt_toolkit.history import FileHistory
-from prompt_toolkit.shortcuts import PromptSession
 from rich.console import Console
 
 from minisweagent import global_config_dir
-from minisweagent.agents.interactive import InteractiveAgent
-from minisweagent.agents.interactive_textual import TextualAgent
 from minisweagent.config import builtin_config_dir, get_config_path
 from minisweagent.environments.local import LocalEnvironment
 from minisweagent.models import get_model
@@ -29,7 +25,6 @@ DEFAULT_CONFIG = Path(os.getenv("MSWEA_MINI_CONFIG_PATH", builtin_config_dir / "
 DEFAULT_OUTPUT = global_config_dir / "last_mini_run.traj.json"
 console = Console(highlight=False)
 app = typer.Typer(rich_markup_mode="rich")
-prompt_session = PromptSession(history=FileHistory(global_config_dir / "mini_task_history.txt"))
 _HELP_TEXT = """Run mini-SWE-agent in your local environment.
 
 [not dim]
@@ -42,6 +37,32 @@ More information about the usage: [bold green]https://mini-swe-agent.com/latest/
 [/not dim]
 """
 
+# prompt_toolkit and textual take a long time to import, but only one of the two UIs is used per run,
+# so these module attributes are only imported on first access (see `__getattr__`).
+_LAZY_AGENT_CLASSES = {
+    "InteractiveAgent": "minisweagent.agents.interactive",
+    "TextualAgent": "minisweagent.agents.interactive_textual",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_AGENT_CLASSES:
+        value = getattr(import_module(_LAZY_AGENT_CLASSES[name]), name)
+    elif name == "prompt_session":
+        from prompt_toolkit.history import FileHistory
+        from prompt_toolkit.shortcuts import PromptSession
+
+        value = PromptSession(history=FileHistory(global_config_dir / "mini_task_history.txt"))
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def _get_lazy(name: str) -> Any:
+    """Get a lazily imported module attribute (respecting values that have been set, e.g., by mocks)."""
+    return globals()[name] if name in globals() else __getattr__(name)
+
 
 # fmt: off
 @app.command(help=_HELP_TEXT)
@@ -65,8 +86,10 @@ def main(
     config = yaml.safe_load(config_path.read_text())
 
     if not task:
+        from prompt_toolkit.formatted_text import HTML
+
         console.print("[bold yellow]What do you want to do?")
-        task = prompt_session.prompt(
+        task = _get_lazy("prompt_session").prompt(
             "",
             multiline=True,
             bottom_toolbar=HTML(
@@ -105,9 +128,9 @@ def main(
     env = LocalEnvironment(**config.get("env", {}))
 
     # Both visual flag and the MSWEA_VISUAL_MODE_DEFAULT flip the mode, so it's essentially a XOR
-    agent_class = InteractiveAgent
+    agent_class = _get_lazy("InteractiveAgent")
     if visual == (os.getenv("MSWEA_VISUAL_MODE_DEFAULT", "false") == "false"):
-        agent_class = TextualAgent
+        agent_class = _get_lazy("TextualAgent")
 
     agent = agent_class(model, env, **config.get("agent", {}))
     exit_status, result, extra_info = None, None, None
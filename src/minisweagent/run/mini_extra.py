@@ -11,6 +11,11 @@ subcommands = [
     ("minisweagent.run.github_issue", ["github-issue", "gh"], "Run on a GitHub issue"),
     ("minisweagent.run.extra.swebench", ["swebench"], "Evaluate on SWE-bench (batch mode)"),
     ("minisweagent.run.extra.swebench_single", ["swebench-single"], "Evaluate on SWE-bench (single instance)"),
+    ("minisweagent.run.extra.convert_traj", ["convert-traj"], "Convert trajectories between formats"),
+    ("minisweagent.run.extra.stats", ["stats"], "Summarize and compare the trajectories of runs"),
+    ("minisweagent.run.extra.search", ["search"], "Search the actions and observations of all trajectories"),
+    ("minisweagent.run.extra.benchmark", ["benchmark"], "Measure the throughput of batch runs"),
+    ("minisweagent.run.extra.mock_server", ["mock-server"], "Run a local OpenAI-compatible stand-in LLM server"),
 ]
 
 
@@ -0,0 +1,441 @@
+"""SQLite index of the trajectories in a directory.
+
+Searching a large output directory and parsing every trajectory is slow (especially on shared filesystems).
+The catalog stores the metadata of every trajectory (exit status, cost, steps, ...) and is updated incrementally:
+Only trajectories whose modification time or size changed are parsed again.
+Optionally, it also keeps a full-text index (SQLite FTS5) of the actions and observations of all steps.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Any
+
+from minisweagent import global_config_dir
+from minisweagent.models.utils.tokens import get_message_text
+from minisweagent.run.utils.save import TRAJECTORY_PATTERNS, iter_traj_messages, iter_traj_records, load_traj
+
+logger = logging.getLogger("minisweagent.catalog")
+
+CATALOG_FILE_NAME = ".traj_catalog.sqlite"
+SCHEMA_VERSION = 4
+
+_COLUMNS = """
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    instance_id TEXT,
+    exit_status TEXT,
+    failure_category TEXT,
+    cost REAL,
+    api_calls INTEGER,
+    n_steps INTEGER,
+    model_name TEXT,
+    has_submission INTEGER,
+    duration REAL,
+    error TEXT
+"""
+
+ACTION_REGEX = r"```bash\s*\n(.*?)\n```"
+"""Same as `DefaultAgent.parse_action`"""
+SEARCH_KINDS = ["action", "observation"]
+SNIPPET_CONTEXT = 80
+"""Characters of the snippet before the first match (and three times as many from the match on)"""
+
+_MARKS = ("\x02", "\x03")
+
+
+@dataclass
+class TrajectoryEntry:
+    path: str
+    """Relative to the root of the catalog"""
+    mtime: float
+    size: int
+    instance_id: str | None = None
+    exit_status: str | None = None
+    failure_category: str | None = None
+    cost: float | None = None
+    api_calls: int | None = None
+    n_steps: int | None = None
+    """Number of assistant messages"""
+    model_name: str | None = None
+    has_submission: bool | None = None
+    duration: float | None = None
+    """Wall time of the run in seconds (if it was recorded)"""
+    error: str | None = None
+    """Error while reading the trajectory (None if it was read successfully)"""
+
+
+SORT_FIELDS = [f.name for f in fields(TrajectoryEntry)]
+
+
+@dataclass
+class SearchHit:
+    path: str
+    """Relative to the root of the catalog"""
+    instance_id: str | None
+    step: int
+    """Index of the step as shown by the inspector (starting at 0)"""
+    kind: str
+    """One of `SEARCH_KINDS`"""
+    snippet: str
+    """Text around the match"""
+
+
+def get_metadata(path: Path) -> dict[str, Any]:
+    """Metadata of a trajectory (the catalog columns except the file stats)."""
+    if path.suffix == ".jsonl":
+        # Streaming trajectories are read record by record, without keeping the messages
+        header, info, n_steps = {}, {}, 0
+        for record in iter_traj_records(path):
+            if record.get("type") == "message":
+                n_steps += record["message"].get("role") == "assistant"
+            elif record.get("type") == "header":
+                header = record
+            elif record.get("type") == "footer":
+                info = record["info"]
+        config = header.get("config", {})
+    else:
+        data = load_traj(path)
+        header, info = data, data.get("info", {})
+        n_steps = sum(message.get("role") == "assistant" for message in data.get("messages", []))
+        config = info.get("config", {})
+    model_stats = info.get("model_stats", {})
+    return {
+        "instance_id": header.get("instance_id") or path.name.split(".traj.")[0],
+        "exit_status": info.get("exit_status"),
+        "failure_category": info.get("failure_category"),
+        "cost": model_stats.get("instance_cost"),
+        "api_calls": model_stats.get("api_calls"),
+        "n_steps": n_steps,
+        "model_name": (config.get("model") or {}).get("model_name"),
+        "has_submission": bool(info.get("submission")),
+        "duration": info.get("duration"),
+    }
+
+
+def get_observation_text(message: dict) -> str:
+    """Text of an observation as the agent saw it: The command output of `action_observation` template blocks
+    (without the JSON of the template arguments), the text of other blocks.
+    """
+    content = message.get("content")
+    if content is None or isinstance(content, str):
+        return content or ""
+    parts = []
+    for block in content:
+        if not isinstance(block, dict):
+            parts.append(str(block))
+        elif block.get("type") == "template":
+            arguments = block.get("arguments", {})
+            output = arguments.get("output") if block.get("name") == "action_observation" else None
+            if isinstance(output, dict):
+                parts.append(str(output.get("output", "")))
+            else:
+                parts += [str(value) for value in arguments.values() if isinstance(value, str)]
+        else:
+            parts.append(str(block.get("text", "")))
+    return "\n".join(parts)
+
+
+def get_search_documents(path: Path) -> list[tuple[int, str, str]]:
+    """Step, kind and text of all actions and observations of a trajectory.
+
+    Steps are counted like in the inspector: Every user message ends a step, so the first step contains the task
+    and step `i` contains the `i`-th action and its observation.
+    """
+    documents = []
+    step = 0
+    for message in iter_traj_messages(path):
+        if message.get("role") == "assistant":
+            text = get_message_text(message)
+            documents += [(step, "action", action.strip()) for action in re.findall(ACTION_REGEX, text, re.DOTALL)]
+        elif message.get("role") == "user":
+            if step > 0:
+                documents.append((step, "observation", get_observation_text(message)))
+            step += 1
+    return documents
+
+
+def get_snippet(text: str, *, context: int = SNIPPET_CONTEXT, highlight: tuple[str, str] = ("", "")) -> str:
+    """Part of `text` around its first match (matches are enclosed in `_MARKS`, as returned by FTS5 `highlight`)."""
+    start_mark, end_mark = _MARKS
+    i_match = max(text.find(start_mark), 0)
+    start, end = max(i_match - context, 0), i_match + 3 * context
+    snippet = text[start:end]
+    if snippet.rfind(start_mark) > snippet.rfind(end_mark):  # close a match that is cut off
+        snippet += end_mark
+    snippet = ("…" if start > 0 else "") + snippet + ("…" if end < len(text) else "")
+    return snippet.replace(start_mark, highlight[0]).replace(end_mark, highlight[1])
+
+
+def _get_metadata_or_error(path: Path) -> tuple[dict[str, Any], str | None]:
+    try:
+        return get_metadata(path), None
+    except Exception as e:
+        return {"instance_id": path.name.split(".traj.")[0]}, f"{type(e).__name__}: {e}"
+
+
+def _get_search_documents_or_error(path: Path) -> tuple[list[tuple[int, str, str]], str | None]:
+    try:
+        return get_search_documents(path), None
+    except Exception as e:
+        return [], f"{type(e).__name__}: {e}"
+
+
+def _map(function: Callable[[Path], Any], paths: list[Path], workers: int) -> list:
+    """Parsing is CPU bound, so with `workers > 1`, the trajectories are read by a pool of processes."""
+    if workers <= 1 or len(paths) < 2:
+        return [function(path) for path in paths]
+    chunksize = max(1, min(64, len(paths) // (4 * workers)))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(function, paths, chunksize=chunksize))
+
+
+def get_all_metadata(paths: list[Path], *, workers: int = 1) -> list[tuple[dict[str, Any], str | None]]:
+    """Metadata (or the error while reading it) of many trajectories, read by `workers` processes."""
+    return _map(_get_metadata_or_error, paths, workers)
+
+
+def _iter_trajectory_files(root: Path):
+    """Paths (relative to root) and stats of all trajectory files. `os.scandir` avoids a `stat` call per directory
+    entry on most filesystems.
+    """
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError as e:
+            logger.warning(f"Cannot read directory {directory}: {e}")
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if not entry.name.startswith("."):
+                    stack.append(Path(entry.path))
+            elif any(fnmatch(entry.name, pattern) for pattern in TRAJECTORY_PATTERNS):
+                stat = entry.stat()
+                yield Path(entry.path).relative_to(root).as_posix(), stat.st_mtime, stat.st_size
+
+
+class TrajectoryCatalog:
+    def __init__(self, root: Path, *, db_path: Path | None = None):
+        """Index of all trajectories below `root`.
+
+        Args:
+            root: Directory with trajectories
+            db_path: SQLite database (default: `.traj_catalog.sqlite` in `root`, or in the global config directory
+                if `root` is not writable)
+        """
+        self.root = root.resolve()
+        self.db_path = db_path or self._get_default_db_path()
+        self._connection = sqlite3.connect(self.db_path)
+        self._connection.row_factory = sqlite3.Row
+        self._init_schema()
+
+    def _get_default_db_path(self) -> Path:
+        if os.access(self.root, os.W_OK):
+            return self.root / CATALOG_FILE_NAME
+        digest = hashlib.sha256(str(self.root).encode()).hexdigest()[:16]
+        path = global_config_dir / "catalogs" / f"{digest}.sqlite"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def _init_schema(self) -> None:
+        version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+        with self._connection:
+            if version != SCHEMA_VERSION:
+                # The catalog is only a cache, so it is simply rebuilt if the schema changed
+                for table in ["trajectories", "search", "search_state"]:
+                    self._connection.execute(f"DROP TABLE IF EXISTS {table}")
+            self._connection.execute(f"CREATE TABLE IF NOT EXISTS trajectories ({_COLUMNS})")
+            self._connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _init_search_schema(self) -> None:
+        """The full-text index is only created when it is first used (not every SQLite build has FTS5)."""
+        with self._connection:
+            # Trigram tokens, so that any substring (of at least three characters) can be searched, like with grep
+            self._connection.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS search "
+                "USING fts5(path UNINDEXED, step UNINDEXED, kind UNINDEXED, text, tokenize = 'trigram')"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS search_state (path TEXT PRIMARY KEY, mtime REAL NOT NULL, size INTEGER NOT NULL)"
+            )
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> "TrajectoryCatalog":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def update(self, *, workers: int = 1) -> dict[str, int]:
+        """Index new and changed trajectories and remove deleted ones. Returns the number of changes.
+
+        Args:
+            workers: Number of processes that read the changed trajectories
+        """
+        known = {
+            row["path"]: (row["mtime"], row["size"])
+            for row in self._connection.execute("SELECT path, mtime, size FROM trajectories")
+        }
+        changed = []
+        for path, mtime, size in _iter_trajectory_files(self.root):
+            if known.pop(path, None) != (mtime, size):
+                changed.append((path, mtime, size))
+        all_metadata = get_all_metadata([self.root / path for path, _, _ in changed], workers=workers)
+        entries = [
+            TrajectoryEntry(path=path, mtime=mtime, size=size, error=error, **metadata)
+            for (path, mtime, size), (metadata, error) in zip(changed, all_metadata)
+        ]
+        names = ", ".join(SORT_FIELDS)
+        placeholders = ", ".join("?" for _ in SORT_FIELDS)
+        with self._connection:
+            self._connection.executemany(
+                f"INSERT OR REPLACE INTO trajectories ({names}) VALUES ({placeholders})",
+                [tuple(getattr(entry, name) for name in SORT_FIELDS) for entry in entries],
+            )
+            self._connection.executemany("DELETE FROM trajectories WHERE path = ?", [(path,) for path in known])
+        return {"updated": len(entries), "removed": len(known)}
+
+    def update_search_index(self, *, workers: int = 1) -> dict[str, int]:
+        """Index the actions and observations of all trajectories that were added or changed since the last call
+        (call `update` first). Returns the number of changes.
+        """
+        self._init_search_schema()
+        stale = [
+            (row["path"], row["mtime"], row["size"])
+            for row in self._connection.execute(
+                "SELECT t.path, t.mtime, t.size FROM trajectories t LEFT JOIN search_state s ON t.path = s.path "
+                "WHERE s.path IS NULL OR s.mtime != t.mtime OR s.size != t.size"
+            )
+        ]
+        removed = [
+            row["path"]
+            for row in self._connection.execute(
+                "SELECT path FROM search_state WHERE path NOT IN (SELECT path FROM trajectories)"
+            )
+        ]
+        all_documents = _map(_get_search_documents_or_error, [self.root / path for path, _, _ in stale], workers)
+        with self._connection:
+            for path in removed + [path for path, _, _ in stale]:
+                self._connection.execute("DELETE FROM search WHERE path = ?", (path,))
+                self._connection.execute("DELETE FROM search_state WHERE path = ?", (path,))
+            for (path, mtime, size), (documents, error) in zip(stale, all_documents):
+                if error is not None:
+                    logger.warning(f"Cannot index {path}: {error}")
+                self._connection.executemany(
+                    "INSERT INTO search (path, step, kind, text) VALUES (?, ?, ?, ?)",
+                    [(path, step, kind, text) for step, kind, text in documents],
+                )
+                self._connection.execute("INSERT INTO search_state VALUES (?, ?, ?)", (path, mtime, size))
+        return {"updated": len(stale), "removed": len(removed)}
+
+    def search(
+        self,
+        query: str,
+        *,
+        kind: str | None = None,
+        instance_id: str | None = None,
+        limit: int | None = 100,
+        raw: bool = False,
+        highlight: tuple[str, str] = ("", ""),
+    ) -> list[SearchHit]:
+        """Steps whose actions or observations contain `query` (case-insensitive), ordered by path and step.
+
+        Args:
+            query: Text to search for (at least three characters)
+            kind: Only search in actions or observations (see `SEARCH_KINDS`)
+            instance_id: Glob pattern
+            limit: Maximum number of hits (None: all)
+            raw: Interpret `query` as an FTS5 query (e.g., `"pip install" NOT "requirements"`)
+            highlight: Strings that are inserted before and after the match in the snippet
+        """
+        if kind is not None and kind not in SEARCH_KINDS:
+            raise ValueError(f"Unknown kind {kind!r}, use one of {', '.join(SEARCH_KINDS)}")
+        if not raw and len(query) < 3:
+            raise ValueError("Search queries need at least three characters")
+        self._init_search_schema()
+        conditions = ["search MATCH ?"]
+        parameters: list[Any] = [query if raw else '"' + query.replace('"', '""') + '"']
+        if kind is not None:
+            conditions.append("search.kind = ?")
+            parameters.append(kind)
+        if instance_id is not None:
+            conditions.append("t.instance_id GLOB ?")
+            parameters.append(instance_id)
+        sql = (
+            "SELECT search.path, t.instance_id, search.step, search.kind, highlight(search, 3, ?, ?) AS text "
+            f"FROM search JOIN trajectories t ON t.path = search.path WHERE {' AND '.join(conditions)} "
+            "ORDER BY search.path, search.step"
+        )
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        try:
+            rows = self._connection.execute(sql, [*_MARKS, *parameters]).fetchall()
+        except sqlite3.OperationalError as e:
+            raise ValueError(f"Invalid search query {query!r}: {e}") from e
+        # FTS5 `snippet` is limited to 64 tokens (characters with trigrams), so the snippet is cut out here
+        return [
+            SearchHit(
+                path=row["path"],
+                instance_id=row["instance_id"],
+                step=row["step"],
+                kind=row["kind"],
+                snippet=get_snippet(row["text"], highlight=highlight),
+            )
+            for row in rows
+        ]
+
+    def query(
+        self,
+        *,
+        exit_status: str | None = None,
+        instance_id: str | None = None,
+        model_name: str | None = None,
+        sort_by: str = "path",
+        descending: bool = False,
+    ) -> list[TrajectoryEntry]:
+        """Trajectories that match all given filters.
+
+        Args:
+            exit_status: Exit status, or "!<status>" for all other exit statuses (e.g., "!Submitted" for failures)
+            instance_id: Glob pattern (e.g., "django__*")
+            model_name: Glob pattern
+            sort_by: Any field of `TrajectoryEntry`
+        """
+        if sort_by not in SORT_FIELDS:
+            raise ValueError(f"Cannot sort by {sort_by!r}, use one of {', '.join(SORT_FIELDS)}")
+        conditions, parameters = [], []
+        if exit_status is not None:
+            if exit_status.startswith("!"):
+                conditions.append("exit_status IS NOT ?")
+                parameters.append(exit_status[1:])
+            else:
+                conditions.append("exit_status = ?")
+                parameters.append(exit_status)
+        for column, pattern in [("instance_id", instance_id), ("model_name", model_name)]:
+            if pattern is not None:
+                conditions.append(f"{column} GLOB ?")
+                parameters.append(pattern)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        # NULLs last in both directions, ties broken by path
+        order = f"{sort_by} IS NULL, {sort_by} {'DESC' if descending else 'ASC'}, path"
+        rows = self._connection.execute(f"SELECT * FROM trajectories {where} ORDER BY {order}", parameters)
+        entries = [TrajectoryEntry(**dict(row)) for row in rows]
+        for entry in entries:
+            if entry.has_submission is not None:
+                entry.has_submission = bool(entry.has_submission)
+        return entries
+
+    def get_path(self, entry: TrajectoryEntry) -> Path:
+        return self.root / entry.path
@@ -0,0 +1,285 @@
+"""Compressed trajectories with content-addressed storage of repeated content.
+
+Trajectories of a batch run repeat content: the config and the prompt templates are the same for all instances,
+and observations or replies are often repeated within a trajectory or across instances. Compact trajectories
+(`*.traj.json.gz`, `*.traj.json.zst`) are compressed and store repeated content only once:
+
+* Values that are the same for all instances of a run are stored in a blob directory that is shared by all
+  trajectories of the run (e.g., `<output dir>/blobs`): the config, system messages and the large strings of the
+  first user message (e.g., the templates and config values in the arguments of the instance template).
+* Large strings that an earlier trajectory of the run (written by the same process) contained as well, e.g.,
+  identical observations of different instances, are stored in the shared blob directory, too.
+* Strings that occur more than once in a trajectory are stored in a blob table in the trajectory file itself.
+  Everything else stays in place (and is compressed with the file).
+
+Blobs are named by the SHA-256 hash of their content.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import Counter
+from collections.abc import Container, Iterable
+from pathlib import Path
+from typing import Any
+
+COMPACT_TRAJECTORY_FORMAT = "mini-swe-agent-compact-1"
+
+MIN_BLOB_SIZE = 512
+"""Strings of at least this many characters are stored as blobs (if they are repeated or shared by the run)"""
+
+MIN_PROMPT_BLOB_SIZE = 128
+"""Strings of the system and first user message (e.g., templates) of at least this size are shared by the run"""
+
+_REFERENCE_KEYS = ("$blob", "$json", "$escape")
+
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+def _get_zstd():
+    try:
+        import zstandard
+    except ImportError as e:
+        msg = "zstd compression requires the zstandard package. Install it with `pip install zstandard`."
+        raise ImportError(msg) from e
+    return zstandard
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    """Compress with "gzip" or "zstd"."""
+    if codec == "zstd":
+        return _get_zstd().ZstdCompressor(level=10).compress(data)
+    if codec == "gzip":
+        # mtime=0 so that identical content gives identical bytes
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    raise ValueError(f"Unknown compression codec: {codec}")
+
+
+def decompress(data: bytes) -> bytes:
+    """Decompress gzip or zstd data (detected from the magic bytes). Uncompressed data is returned unchanged."""
+    if data.startswith(_ZSTD_MAGIC):
+        return _get_zstd().ZstdDecompressor().decompressobj().decompress(data)
+    if data.startswith(_GZIP_MAGIC):
+        return gzip.decompress(data)
+    return data
+
+
+def get_codec(path: Path) -> str | None:
+    """Compression codec from the file name (None if uncompressed)."""
+    return {".gz": "gzip", ".zst": "zstd"}.get(path.suffix)
+
+
+def _hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlobStore:
+    def __init__(self, root: Path, *, codec: str = "gzip"):
+        """Content-addressed blobs in a directory, shared by any number of trajectories (and threads/processes).
+
+        Args:
+            root: Directory of the blobs (created on first write)
+            codec: Compression of new blobs. Existing blobs are read regardless of their compression.
+        """
+        self.root = root
+        self.codec = codec
+        self._known: set[str] = set()
+        """Blobs that are known to exist (to avoid checking the filesystem for every reference)"""
+        self._sources: dict[str, str] = {}
+        """Hash of every string passed to `is_repeated` -> first trajectory that contained it"""
+        self._lock = threading.Lock()
+
+    def _get_path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def put(self, data: bytes) -> str:
+        key = _hash(data)
+        if key in self._known:
+            return key
+        path = self._get_path(key)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first, so that concurrent writers and readers never see partial blobs
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{key}.")
+            with os.fdopen(fd, "wb") as f:
+                f.write(compress(data, self.codec))
+            os.replace(tmp_path, path)
+        self._known.add(key)
+        return key
+
+    def get(self, key: str) -> bytes:
+        return decompress(self._get_path(key).read_bytes())
+
+    def is_repeated(self, value: str, source: str) -> bool:
+        """Record that the trajectory `source` contains `value`. True if another trajectory contained it before."""
+        key = _hash(value.encode("utf-8"))
+        with self._lock:
+            return self._sources.setdefault(key, source) != source
+
+
+_blob_stores: dict[tuple[Path, str], BlobStore] = {}
+_blob_stores_lock = threading.Lock()
+
+
+def get_blob_store(root: Path, *, codec: str = "gzip") -> BlobStore:
+    """Blob store of a run, reused by all trajectories that are written to `root` by this process."""
+    with _blob_stores_lock:
+        key = (Path(root).resolve(), codec)
+        if key not in _blob_stores:
+            _blob_stores[key] = BlobStore(Path(root), codec=codec)
+        return _blob_stores[key]
+
+
+class _Blobs:
+    """Blob table that is saved in the trajectory file itself, backed by the shared blobs of the run (if any)."""
+
+    def __init__(
+        self,
+        blobs: dict[str, str] | None = None,
+        shared: BlobStore | None = None,
+        *,
+        shared_strings: Iterable[str] = (),
+    ):
+        """
+        Args:
+            shared_strings: Strings that are put into the shared blobs instead of the blob table
+        """
+        self.blobs = blobs if blobs is not None else {}
+        self.shared = shared
+        self._shared_keys = {_hash(value.encode("utf-8")) for value in shared_strings} if shared else set()
+
+    def put(self, data: bytes) -> str:
+        key = _hash(data)
+        if key in self._shared_keys:
+            return self.shared.put(data)  # type: ignore[union-attr]
+        self.blobs.setdefault(key, data.decode("utf-8"))
+        return key
+
+    def get(self, key: str) -> bytes:
+        if key in self.blobs or self.shared is None:
+            return self.blobs[key].encode("utf-8")
+        return self.shared.get(key)
+
+
+def _dumps(obj: Any) -> str:
+    return json.dumps(obj, separators=(",", ":"), default=str)
+
+
+def _get_strings(obj: Any, min_size: int) -> list[str]:
+    """All strings of at least `min_size` characters in `obj` (with repetitions)."""
+    if isinstance(obj, str):
+        return [obj] if len(obj) >= min_size else []
+    if isinstance(obj, dict):
+        return [value for item in obj.values() for value in _get_strings(item, min_size)]
+    if isinstance(obj, list | tuple):
+        return [value for item in obj for value in _get_strings(item, min_size)]
+    return []
+
+
+def get_repeated_strings(obj: Any, *, min_size: int = MIN_BLOB_SIZE) -> set[str]:
+    """Strings of at least `min_size` characters that occur more than once."""
+    counts = Counter(_get_strings(obj, min_size))
+    return {value for value, n in counts.items() if n > 1}
+
+
+def pack(obj: Any, store: BlobStore | _Blobs, *, strings: Container[str] = ()) -> Any:
+    """Replace the given strings by `{"$blob": key}`.
+    Dicts that would be mistaken for references (e.g., `{"$blob": ...}`) are escaped as `{"$escape": ...}`.
+    """
+    if isinstance(obj, str):
+        return {"$blob": store.put(obj.encode("utf-8"))} if obj in strings else obj
+    if isinstance(obj, dict):
+        packed = {key: pack(value, store, strings=strings) for key, value in obj.items()}
+        if len(packed) == 1 and next(iter(packed)) in _REFERENCE_KEYS:
+            return {"$escape": packed}
+        return packed
+    if isinstance(obj, list | tuple):
+        return [pack(value, store, strings=strings) for value in obj]
+    return obj
+
+
+def unpack(obj: Any, store: BlobStore | _Blobs) -> Any:
+    """Inverse of `pack` (and of the references to shared values in `write_compact_traj`)."""
+    if isinstance(obj, dict):
+        if len(obj) == 1 and "$blob" in obj:
+            return store.get(obj["$blob"]).decode("utf-8")
+        if len(obj) == 1 and "$json" in obj:
+            return unpack(json.loads(store.get(obj["$json"])), store)
+        if len(obj) == 1 and "$escape" in obj:
+            return {key: unpack(value, store) for key, value in obj["$escape"].items()}
+        return {key: unpack(value, store) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [unpack(value, store) for value in obj]
+    return obj
+
+
+def _get_run_strings(data: dict, store: BlobStore, source: str, *, min_size: int) -> set[str]:
+    """Strings of the messages that are stored in the shared blobs of the run: all large strings of the system
+    messages and the first user message (prompts and template arguments, mostly the same for all instances) and
+    large strings that other trajectories of the run contained as well.
+    """
+    messages = [m for m in data.get("messages") or [] if isinstance(m, dict)]
+    first_user_message = next((m for m in messages if m.get("role") == "user"), None)
+    strings = set()
+    for message in messages:
+        if message is first_user_message or message.get("role") == "system":
+            strings.update(_get_strings(message.get("content"), min(min_size, MIN_PROMPT_BLOB_SIZE)))
+        else:
+            values = _get_strings(message.get("content"), min_size)
+            strings.update(value for value in values if store.is_repeated(value, source))
+    return strings
+
+
+def write_compact_traj(data: dict, path: Path, *, blob_dir: Path | None = None, min_size: int = MIN_BLOB_SIZE):
+    """Save a `mini-swe-agent-1` trajectory in the compact format (compressed according to the file name).
+
+    Args:
+        data: Trajectory
+        path: `*.traj.json.gz` or `*.traj.json.zst`
+        blob_dir: Blob directory for the values that are shared with other trajectories of the run
+            (None: keep them in the file)
+    """
+    codec = get_codec(path)
+    if codec is None:
+        raise ValueError(f"Compact trajectories must end in .gz or .zst, got {path.name}")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    original_format = data.get("trajectory_format")
+    data = {k: v for k, v in data.items() if k != "trajectory_format"}
+    compact: dict[str, Any] = {
+        "trajectory_format": COMPACT_TRAJECTORY_FORMAT,
+        "original_format": original_format,
+    }
+    if blob_dir is None:
+        blobs = _Blobs()
+        packed = pack(data, blobs, strings=get_repeated_strings(data, min_size=min_size))
+    else:
+        shared = get_blob_store(blob_dir, codec=codec)
+        info = data.get("info")
+        has_config = isinstance(info, dict) and "config" in info
+        # The config is stored as a whole, so it is packed separately and doesn't count as repeated
+        without_config = data | {"info": {k: v for k, v in info.items() if k != "config"}} if has_config else data
+        shared_strings = _get_run_strings(data, shared, str(path.resolve()), min_size=min_size)
+        strings = get_repeated_strings(without_config, min_size=min_size) | shared_strings
+        blobs = _Blobs(shared=shared, shared_strings=shared_strings)
+        packed = pack(without_config, blobs, strings=strings)
+        if has_config:
+            config = _dumps(pack(info["config"], shared))  # escapes only
+            config_ref = {"$json": shared.put(config.encode("utf-8"))}
+            packed["info"] = {k: config_ref if k == "config" else packed["info"][k] for k in info}
+        compact["blob_dir"] = os.path.relpath(blob_dir, path.parent)
+    compact |= {"data": packed, "blobs": blobs.blobs}
+    path.write_bytes(compress(_dumps(compact).encode("utf-8"), codec))
+
+
+def read_compact_traj(path: Path) -> dict:
+    """Load a compact (or only compressed) trajectory as a `mini-swe-agent-1` trajectory."""
+    data = json.loads(decompress(path.read_bytes()))
+    if not isinstance(data, dict) or data.get("trajectory_format") != COMPACT_TRAJECTORY_FORMAT:
+        return data
+    shared = get_blob_store(path.parent / data["blob_dir"]) if "blob_dir" in data else None
+    store = _Blobs(data.get("blobs", {}), shared)
+    return unpack(data["data"], store) | {"trajectory_format": data.get("original_format")}
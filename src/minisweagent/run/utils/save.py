@@ -1,14 +1,16 @@
 import dataclasses
 import json
-from collections.abc import Callable
+from collections.abc import Callable, Iterator
 from pathlib import Path
 from typing import Any
 
 from minisweagent import Agent, __version__
+from minisweagent.run.utils.compact import get_codec, read_compact_traj, write_compact_traj
 
 
 class PathEncoder(json.JSONEncoder):
     """JSON encoder that converts Path objects to strings."""
+
     def default(self, obj):
         if isinstance(obj, Path):
             return str(obj)
@@ -27,6 +29,112 @@ def _asdict(obj: Any) -> dict:
     return obj  # let's try our luck
 
 
+TRAJECTORY_FORMAT = "mini-swe-agent-1"
+STREAM_TRAJECTORY_FORMAT = "mini-swe-agent-stream-1"
+"""JSON lines: A header record (config), one record per message (written as the message is added) and a footer
+record (exit status, submission and model stats). Saved as `*.traj.jsonl`.
+"""
+TRAJECTORY_PATTERNS = ["*.traj.json", "*.traj.jsonl", "*.traj.json.gz", "*.traj.json.zst"]
+
+
+def _get_config(agent: Agent) -> dict:
+    # Filter out sensitive environment variables from the environment config
+    env_config = _asdict(agent.env.config)
+    env_config.pop("env", None)
+    env_config.pop("forward_env", None)
+    return {
+        "agent": _asdict(agent.config),
+        "model": _asdict(agent.model.config),
+        "environment": env_config,
+        "agent_type": _get_class_name_with_module(agent),
+        "model_type": _get_class_name_with_module(agent.model),
+        "environment_type": _get_class_name_with_module(agent.env),
+    }
+
+
+def _get_info(
+    agent: Agent | None,
+    *,
+    exit_status: str | None,
+    result: str | None,
+    extra_info: dict | None = None,
+    include_config: bool = True,
+) -> dict:
+    info = {
+        "exit_status": exit_status,
+        "submission": result,
+        "model_stats": {
+            "instance_cost": 0.0,
+            "api_calls": 0,
+        },
+        "mini_version": __version__,
+    }
+    if agent is not None:
+        info["model_stats"]["instance_cost"] = agent.model.cost
+        info["model_stats"]["api_calls"] = agent.model.n_calls
+        if hasattr(agent.model, "get_model_stats"):
+            # Meta-models that combine several models report the share of every model
+            info["model_stats"]["models"] = agent.model.get_model_stats()
+        if hasattr(agent.model, "episode_id"):
+            info["episode_id"] = str(agent.model.episode_id)
+        if hasattr(agent.model, "get_episode_info"):
+            info["episode"] = agent.model.get_episode_info()
+        if include_config:
+            info["config"] = _get_config(agent)
+    if extra_info:
+        info.update(extra_info)
+    return info
+
+
+class TrajectoryWriter:
+    def __init__(self, path: Path):
+        """Writes a trajectory in the streaming format (`STREAM_TRAJECTORY_FORMAT`), one record at a time.
+
+        Every record is flushed when it is written, so that a crash only loses the record that was being written.
+        """
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = path.open("w")
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    def _write(self, record: dict) -> None:
+        self._file.write(json.dumps(record, cls=PathEncoder) + "\n")
+        self._file.flush()
+
+    def write_header(self, config: dict | None = None, **kwargs) -> None:
+        self._write({"type": "header", "trajectory_format": STREAM_TRAJECTORY_FORMAT, "config": config or {}} | kwargs)
+
+    def add_message(self, message: dict) -> None:
+        self._write({"type": "message", "message": message})
+
+    def write_footer(self, info: dict) -> None:
+        """Write the footer record and close the file."""
+        self._write({"type": "footer", "info": info})
+        self.close()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def start_traj_stream(agent: Agent, path: Path, **kwargs) -> TrajectoryWriter:
+    """Write the header of a streaming trajectory and have the agent append every message as it is added.
+
+    Finish the trajectory with `save_traj(agent, path, ...)`.
+
+    Args:
+        agent: Agent with a `trajectory_writer` attribute (e.g., `DefaultAgent`)
+        path: Path of the trajectory (`*.traj.jsonl`)
+        **kwargs: Additional information to save (will be merged into the top level)
+    """
+    writer = TrajectoryWriter(path)
+    writer.write_header(_get_config(agent), **kwargs)
+    agent.trajectory_writer = writer  # type: ignore[attr-defined]
+    return writer
+
+
 def save_traj(
     agent: Agent | None,
     path: Path,
@@ -36,10 +144,15 @@ def save_traj(
     result: str | None = None,
     extra_info: dict | None = None,
     print_fct: Callable = print,
+    blob_dir: Path | None = None,
     **kwargs,
 ):
     """Save the trajectory of the agent to a file.
 
+    Paths ending in `.jsonl` are saved in the streaming format. If the trajectory was started with
+    `start_traj_stream`, only the footer is appended.
+    Paths ending in `.gz` or `.zst` are saved in the compact format (see `minisweagent.run.utils.compact`).
+
     Args:
         agent: The agent to save the trajectory of.
         path: The path to save the trajectory to.
@@ -47,44 +160,109 @@ def save_traj(
         exit_status: The exit status of the agent.
         result: The result/submission of the agent.
         extra_info: Extra information to save (will be merged into the info dict).
+        blob_dir: Compact format only: Blob directory that is shared with other trajectories
+            (default: store the blobs in the trajectory file).
         **kwargs: Additional information to save (will be merged into top level)
 
     """
-    data = {
-        "info": {
-            "exit_status": exit_status,
-            "submission": result,
-            "model_stats": {
-                "instance_cost": 0.0,
-                "api_calls": 0,
-            },
-            "mini_version": __version__,
-        },
-        "messages": [],
-        "trajectory_format": "mini-swe-agent-1",
-    } | kwargs
-    if agent is not None:
-        data["info"]["model_stats"]["instance_cost"] = agent.model.cost
-        data["info"]["model_stats"]["api_calls"] = agent.model.n_calls
-        if hasattr(agent.model, 'episode_id'):
-            data["info"]["episode_id"] = str(agent.model.episode_id)
-        data["messages"] = agent.messages
-        # Filter out sensitive environment variables from the environment config
-        env_config = _asdict(agent.env.config)
-        env_config.pop("env", None)
-        env_config.pop("forward_env", None)
-        data["info"]["config"] = {
-            "agent": _asdict(agent.config),
-            "model": _asdict(agent.model.config),
-            "environment": env_config,
-            "agent_type": _get_class_name_with_module(agent),
-            "model_type": _get_class_name_with_module(agent.model),
-            "environment_type": _get_class_name_with_module(agent.env),
-        }
-    if extra_info:
-        data["info"].update(extra_info)
-
-    path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(data, indent=2, cls=PathEncoder))
+    streaming = path.suffix == ".jsonl"
+    # The config of streaming trajectories is saved in the header
+    info = _get_info(agent, exit_status=exit_status, result=result, extra_info=extra_info, include_config=not streaming)
+    if streaming:
+        writer = getattr(agent, "trajectory_writer", None)
+        if writer is None or writer.closed or writer.path != path:
+            writer = TrajectoryWriter(path)
+            writer.write_header(_get_config(agent) if agent is not None else {}, **kwargs)
+            for message in agent.messages if agent is not None else []:
+                writer.add_message(message)
+        writer.write_footer(info)
+    else:
+        data = {
+            "info": info,
+            "messages": [],
+            "trajectory_format": TRAJECTORY_FORMAT,
+        } | kwargs
+        if agent is not None:
+            data["messages"] = agent.messages
+        if get_codec(path) is not None:
+            write_compact_traj(data, path, blob_dir=blob_dir)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(data, indent=2, cls=PathEncoder))
     if print_path:
         print_fct(f"Saved trajectory to '{path}'")
+
+
+def iter_traj_records(path: Path) -> Iterator[dict]:
+    """Read the records of a streaming trajectory one at a time.
+
+    A truncated last line (e.g., because the run crashed while writing it) is skipped.
+    """
+    with path.open() as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                if line.endswith("\n"):
+                    raise
+                return
+
+
+def iter_traj_messages(path: Path) -> Iterator[dict]:
+    """The messages of a trajectory in any format (read lazily for the streaming format)."""
+    if path.suffix == ".jsonl":
+        for record in iter_traj_records(path):
+            if record.get("type") == "message":
+                yield record["message"]
+        return
+    yield from load_traj(path)["messages"]
+
+
+def load_traj(path: Path) -> dict:
+    """Load a trajectory in any format as a `mini-swe-agent-1` trajectory.
+
+    Streaming trajectories without a footer (i.e., of runs that are still in progress or crashed)
+    have `None` as exit status.
+    """
+    if path.suffix != ".jsonl":
+        data = read_compact_traj(path) if get_codec(path) is not None else json.loads(path.read_text())
+        if isinstance(data, list):
+            return {"info": {}, "messages": data, "trajectory_format": TRAJECTORY_FORMAT}
+        return data
+    header: dict = {}
+    info: dict = {"exit_status": None, "submission": None}
+    messages = []
+    for record in iter_traj_records(path):
+        if record.get("type") == "message":
+            messages.append(record["message"])
+        elif record.get("type") == "header":
+            header = record
+        elif record.get("type") == "footer":
+            info = record["info"]
+    extra = {k: v for k, v in header.items() if k not in ("type", "trajectory_format", "config")}
+    return {
+        "info": {"config": header.get("config", {})} | info,
+        "messages": messages,
+        "trajectory_format": TRAJECTORY_FORMAT,
+    } | extra
+
+
+def convert_traj(source: Path, target: Path, *, blob_dir: Path | None = None) -> None:
+    """Convert a trajectory between formats (e.g., `*.traj.jsonl` or `*.traj.json.gz` to `*.traj.json`).
+
+    The format of the target is determined by its file name as in `save_traj`, but streaming targets are not
+    supported.
+    """
+    data = load_traj(source)
+    if get_codec(target) is not None:
+        write_compact_traj(data, target, blob_dir=blob_dir)
+    else:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(json.dumps(data, indent=2, cls=PathEncoder))
+
+
+def find_trajectories(directory: Path) -> list[Path]:
+    """All trajectory files in a directory (recursively, in any format)."""
+    return sorted(path for pattern in TRAJECTORY_PATTERNS for path in directory.rglob(pattern))
@@ -1,8 +1,172 @@
+"""Logging of mini-swe-agent.
+
+All records of the `minisweagent` logger are passed to a set of sinks (the terminal and any log files).
+By default, the sinks are called by the thread that logs. With `start_log_queue` (used by batch runs),
+records are put on a queue instead and a background thread formats and writes them, so logging never blocks
+the agent threads on terminal rendering or file I/O.
+
+Records carry the fields of the current `log_context` (e.g., `instance_id` and `step`), which are included in
+JSON-lines log files and used to route records to per-instance log files.
+"""
+
+import atexit
+import contextvars
+import copy
+import json
 import logging
+import queue
+import threading
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueListener
 from pathlib import Path
+from typing import Any
 
 from rich.logging import RichHandler
 
+CONTEXT_FIELDS = ("instance_id", "step")
+
+_context: contextvars.ContextVar[dict[str, Any]] = contextvars.ContextVar("minisweagent_log_context", default={})
+
+
+@contextmanager
+def log_context(**fields: Any) -> Iterator[None]:
+    """Add fields (see `CONTEXT_FIELDS`) to all records that are logged in the block (in the current thread)."""
+    token = _context.set(_context.get() | fields)
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def update_log_context(**fields: Any) -> None:
+    """Update fields of the current `log_context` (e.g., the step of the agent)."""
+    _context.set(_context.get() | fields)
+
+
+class _ContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _context.get()
+        # Explicit fields (`extra=...`) take precedence over the context
+        for field in CONTEXT_FIELDS:
+            if not hasattr(record, field):
+                setattr(record, field, context.get(field))
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record with the time, level, logger, message and context fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        } | {field: getattr(record, field, None) for field in CONTEXT_FIELDS}
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exception"] = record.exc_text
+        return json.dumps(data, default=str)
+
+
+def _get_formatter(json_lines: bool) -> logging.Formatter:
+    if json_lines:
+        return JsonFormatter()
+    return logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+
+class InstanceFileHandler(logging.Handler):
+    def __init__(self, directory: Path | str, *, json_lines: bool = False, max_open_files: int = 128):
+        """Write the records of every instance (see `log_context`) to `<directory>/<instance_id>/<instance_id>.log`
+        (`.log.jsonl` with `json_lines`). Records without an instance are ignored.
+
+        Args:
+            max_open_files: The least recently used files are closed (and reopened if needed) beyond this number
+        """
+        super().__init__()
+        self.directory = Path(directory)
+        self.suffix = ".log.jsonl" if json_lines else ".log"
+        self.max_open_files = max_open_files
+        self._files: OrderedDict[str, Any] = OrderedDict()
+        self.setFormatter(_get_formatter(json_lines))
+
+    def _get_file(self, instance_id: str):
+        if (file := self._files.get(instance_id)) is not None:
+            self._files.move_to_end(instance_id)
+            return file
+        while len(self._files) >= self.max_open_files:
+            self._files.popitem(last=False)[1].close()
+        path = self.directory / instance_id / f"{instance_id}{self.suffix}"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        file = self._files[instance_id] = path.open("a", encoding="utf-8")
+        return file
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if not (instance_id := getattr(record, "instance_id", None)):
+            return
+        try:
+            file = self._get_file(str(instance_id))
+            file.write(self.format(record) + "\n")
+            file.flush()
+        except Exception:
+            self.handleError(record)
+
+    def close(self) -> None:
+        with self.lock:  # type: ignore[union-attr]
+            for file in self._files.values():
+                file.close()
+            self._files.clear()
+        super().close()
+
+
+def _prepare(record: logging.LogRecord) -> logging.LogRecord:
+    """Copy of the record that can be formatted in another thread (message and traceback are formatted now)."""
+    record = copy.copy(record)
+    record.msg, record.args = record.getMessage(), None
+    if record.exc_info:
+        record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+    return record
+
+
+class _Sinks(logging.Handler):
+    """Passes records to all sinks whose level they reach, either directly or via the log queue."""
+
+    def __init__(self):
+        super().__init__()
+        self.handlers: list[logging.Handler] = []
+        self.queue: queue.SimpleQueue | None = None
+        self.addFilter(_ContextFilter())
+
+    def handle(self, record: logging.LogRecord) -> bool:  # type: ignore[override]
+        # No lock: The sinks lock themselves and the queue is thread-safe
+        if not self.filter(record):
+            return False
+        if (record_queue := self.queue) is not None:
+            record_queue.put(_prepare(record))
+        else:
+            self.emit(record)
+        return True
+
+    def emit(self, record: logging.LogRecord) -> None:
+        for handler in list(self.handlers):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+class _Listener(QueueListener):
+    def handle(self, record: logging.LogRecord) -> None:
+        _sinks.emit(record)
+
+
+_sinks = _Sinks()
+_listener: _Listener | None = None
+_queue_lock = threading.Lock()
+
 
 def _setup_root_logger() -> None:
     logger = logging.getLogger("minisweagent")
@@ -15,20 +179,96 @@ def _setup_root_logger() -> None:
     )
     _formatter = logging.Formatter("%(name)s: %(levelname)s: %(message)s")
     _handler.setFormatter(_formatter)
-    logger.addHandler(_handler)
+    _sinks.handlers.append(_handler)
+    logger.addHandler(_sinks)
 
 
-def add_file_handler(path: Path | str, level: int = logging.DEBUG, *, print_path: bool = True) -> None:
-    logger = logging.getLogger("minisweagent")
+def add_handler(handler: logging.Handler) -> logging.Handler:
+    """Add a sink for all records of the `minisweagent` logger."""
+    _sinks.handlers.append(handler)
+    return handler
+
+
+def remove_handler(handler: logging.Handler) -> None:
+    """Remove and close a sink (records that are still queued are written first)."""
+    flush_log_queue()
+    if handler in _sinks.handlers:
+        _sinks.handlers.remove(handler)
+    handler.close()
+
+
+def add_file_handler(
+    path: Path | str, level: int = logging.DEBUG, *, print_path: bool = True, json_lines: bool = False
+) -> logging.Handler:
+    """Write all records to a file (one JSON object per line with `json_lines`)."""
     handler = logging.FileHandler(path)
     handler.setLevel(level)
-    formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
+    handler.setFormatter(_get_formatter(json_lines))
+    add_handler(handler)
     if print_path:
         print(f"Logging to '{path}'")
+    return handler
+
+
+def add_instance_file_handler(
+    directory: Path | str, level: int = logging.DEBUG, *, json_lines: bool = False
+) -> logging.Handler:
+    """Write the records of every instance to its own file (see `InstanceFileHandler`)."""
+    handler = InstanceFileHandler(directory, json_lines=json_lines)
+    handler.setLevel(level)
+    return add_handler(handler)
+
+
+def start_log_queue() -> None:
+    """Pass records to the sinks from a background thread. Logging only puts the records on a queue."""
+    global _listener
+    with _queue_lock:
+        if _listener is not None:
+            return
+        record_queue: queue.SimpleQueue = queue.SimpleQueue()
+        _listener = _Listener(record_queue)
+        _listener.start()
+        _sinks.queue = record_queue
+
+
+def stop_log_queue() -> None:
+    """Write all queued records and pass records to the sinks directly again."""
+    global _listener
+    with _queue_lock:
+        if _listener is None:
+            return
+        record_queue, _sinks.queue = _sinks.queue, None
+        _listener.stop()  # writes all records that were queued before the sentinel
+        _listener = None
+    while True:  # records of threads that still saw the queue
+        try:
+            _sinks.emit(record_queue.get_nowait())  # type: ignore[union-attr]
+        except queue.Empty:
+            break
+
+
+def flush_log_queue() -> None:
+    """Wait until all records that were logged so far are written."""
+    with _queue_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        _listener.start()
+
+
+@contextmanager
+def log_queue() -> Iterator[None]:
+    """Use the log queue in the block (see `start_log_queue`)."""
+    started = _listener is None
+    start_log_queue()
+    try:
+        yield
+    finally:
+        if started:
+            stop_log_queue()
 
 
+atexit.register(stop_log_queue)
 _setup_root_logger()
 logger = logging.getLogger("minisweagent")
 
@@ -1,8 +1,12 @@
+from unittest.mock import patch
+
 import pytest
 
 from minisweagent.agents.default import DefaultAgent, NonTerminatingException
 from minisweagent.environments.local import LocalEnvironment
+from minisweagent.models import GLOBAL_MODEL_STATS
 from minisweagent.models.test_models import DeterministicModel
+from minisweagent.models.utils.stats import GlobalLimitExceeded
 
 
 def test_successful_completion():
@@ -248,3 +252,61 @@ def test_render_template_model_stats():
     result = agent.render_template(template)
 
     assert result == "Calls: 2, Cost: 2.0"
+
+
+def test_context_limit_reached_without_api_call():
+    model = DeterministicModel(outputs=["```bash\necho 'x'\n```"] * 3)
+    agent = DefaultAgent(model=model, env=LocalEnvironment(), context_limit=10)
+    exit_status, result = agent.run("A task whose prompt does not fit into the context window " * 5)
+    assert exit_status == "ContextLimitReached"
+    assert "context window (10 tokens)" in result
+    assert model.n_calls == 0
+
+
+def test_context_limit_from_model():
+    model = DeterministicModel(outputs=["```bash\necho 'x'\n```"])
+    model.get_context_limit = lambda: 10  # type: ignore[attr-defined]
+    agent = DefaultAgent(model=model, env=LocalEnvironment(), context_limit=0)
+    assert agent.run("Task " * 50)[0] == "ContextLimitReached"
+    # Off by default
+    assert DefaultAgent(model=model, env=LocalEnvironment()).get_context_limit() is None
+
+
+def test_token_count_includes_rendered_templates():
+    agent = DefaultAgent(
+        model=DeterministicModel(outputs=[]),
+        env=LocalEnvironment(),
+        action_observation_template="{{'padding ' * 100}}<output>{{output.output}}</output>",
+    )
+    block = {"type": "template", "name": "action_observation", "arguments": {"output": {"output": "hi"}}}
+    assert agent.render_template_block(block) == "padding " * 100 + "<output>hi</output>"
+    agent.messages = [{"role": "user", "content": [block]}]
+    assert agent.count_tokens() > 200 / 3.5
+    with pytest.raises(ValueError, match="No template"):
+        agent.render_template_block({"type": "template", "name": "unknown", "arguments": {}})
+
+
+def test_context_compaction():
+    outputs = [f"```bash\npython -c \"print('{i}' * 8000)\"\n```" for i in range(4)]
+    outputs.append("```bash\necho 'COMPLETE_TASK_AND_SUBMIT_FINAL_OUTPUT'\n```")
+    agent = DefaultAgent(
+        model=DeterministicModel(outputs=outputs),
+        env=LocalEnvironment(),
+        context_limit=5000,
+        context_compaction=True,
+        cost_limit=0,
+    )
+    assert agent.run("Print a lot")[0] == "Submitted"
+    assert agent.model.n_calls == 5
+    observations = [m["content"][0]["arguments"]["output"]["output"] for m in agent.messages[2::2][:-1]]
+    assert observations[0] == agent.config.elided_output_template
+    assert observations[-1].strip() == "3" * 8000
+
+
+def test_global_limits_are_checked_before_query():
+    model = DeterministicModel(outputs=["```bash\necho 'x'\n```"])
+    agent = DefaultAgent(model=model, env=LocalEnvironment())
+    with patch.object(GLOBAL_MODEL_STATS, "time_limit", 1), patch.object(GLOBAL_MODEL_STATS, "_start_time", 0):
+        with pytest.raises(GlobalLimitExceeded, match="time"):
+            agent.run("task")
+    assert model.n_calls == 0
@@ -1,11 +1,18 @@
 import asyncio
 import logging
 import threading
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 
 import pytest
 
-from minisweagent.agents.interactive_textual import AddLogEmitCallback, SmartInputContainer, TextualAgent
+from minisweagent.agents.interactive_textual import (
+    AddLogEmitCallback,
+    MessageContent,
+    MessageRenderCache,
+    SmartInputContainer,
+    TextualAgent,
+    _WrappedLines,
+)
 from minisweagent.environments.local import LocalEnvironment
 from minisweagent.models.test_models import DeterministicModel
 
@@ -233,6 +240,25 @@ def test_messages_to_steps_edge_cases():
     assert _messages_to_steps(messages) == expected
 
 
+def test_step_index_matches_messages_to_steps():
+    from minisweagent.agents.interactive_textual import _messages_to_steps, _StepIndex
+
+    roles = ["system", "user", "assistant", "user", "assistant", "assistant", "user", "assistant"]
+    messages = []
+    index = _StepIndex()
+    for i, role in enumerate(roles):
+        messages.append({"role": role, "content": str(i)})
+        steps = index.update(messages)
+        assert steps == _messages_to_steps(messages)
+    last_step = steps[-1]
+    assert index.update(messages)[-1] is last_step
+
+    # A new history is grouped from scratch
+    messages = [{"role": "system", "content": "new"}, {"role": "user", "content": "task"}]
+    assert index.update(messages) == _messages_to_steps(messages)
+    assert index.update([]) == []
+
+
 async def test_empty_agent_content():
     """Test app behavior with no messages."""
     app = TextualAgent(
@@ -870,3 +896,88 @@ async def test_system_commands_are_callable():
             assert callable(command.callback), (
                 f"Command '{command.title}' has non-callable callback: {command.callback}"
             )
+
+
+def test_wrapped_lines():
+    wrapped = _WrappedLines("abcdefghij\n\n```bash\nls\n```\nwide: 日本語日本語", 4)
+    rows = [(row.plain, is_code) for row, is_code in (wrapped.get_row(y) for y in range(wrapped.n_rows))]
+    assert [row for row, _ in rows[:4]] == ["abcd", "efgh", "ij", ""]
+    assert rows[4:8] == [("```b", True), ("ash", True), ("ls", True), ("```", True)]
+    # Wide characters take two cells
+    assert [row for row, _ in rows[8:]] == ["wide", ": ", "日本", "語日", "本語"]
+
+
+def test_wrapped_lines_break_at_whitespace():
+    wrapped = _WrappedLines("the quick brown fox\nunbreakable_word here\n日本 語日本 語", 10)
+    rows = [wrapped.get_row(y)[0].plain for y in range(wrapped.n_rows)]
+    assert rows == ["the quick ", "brown fox", "unbreakabl", "e_word ", "here", "日本 ", "語日本 語"]
+
+
+def test_wrapped_lines_highlight_code():
+    wrapped = _WrappedLines("echo 'text'\n```bash\necho 'code' | grep x\n```\n```\nplain code\n```", 80)
+    assert not wrapped.get_row(0)[0].spans
+    row, is_code = wrapped.get_row(2)
+    assert is_code and row.plain == "echo 'code' | grep x" and row.spans
+    # Without a language, code is only shown in the accent color
+    row, is_code = wrapped.get_row(5)
+    assert is_code and row.plain == "plain code" and not row.spans
+
+
+def test_message_render_cache_reuses_texts_and_wrapping():
+    cache = MessageRenderCache()
+    message = {"role": "user", "content": [{"type": "text", "text": "a"}, {"type": "thought", "text": "b"}]}
+    text = cache.get_text(message)
+    assert text == "a\n[Thought] b"
+    assert cache.get_text(message) is text
+    assert cache.get_wrapped(text, 10) is cache.get_wrapped(text, 10)
+    assert cache.get_wrapped(text, 10) is not cache.get_wrapped(text, 5)
+
+
+async def test_huge_output_only_renders_visible_rows():
+    output = "\n".join(f"line {i}" for i in range(100_000))
+    app = TextualAgent(
+        model=DeterministicModel(outputs=[]),
+        env=LocalEnvironment(),
+        mode="yolo",
+    )
+    rendered_rows = []
+    original_render_line = MessageContent.render_line
+
+    def render_line(self, y):
+        rendered_rows.append(y)
+        return original_render_line(self, y)
+
+    with patch.object(MessageContent, "render_line", render_line):
+        async with app.run_test(size=(80, 30)) as pilot:
+            app.agent.messages = [{"role": "user", "content": "task"}, {"role": "user", "content": output}]
+            app.on_message_added()
+            app.action_last_step()
+            await pilot.pause(0.1)
+            content = app.query_one(MessageContent)
+            assert content.virtual_size.height >= 100_000 or content.size.height >= 100_000
+    assert 0 < len(rendered_rows) < 100
+
+
+async def test_new_message_of_current_step_is_appended():
+    app = TextualAgent(model=DeterministicModel(outputs=[]), env=LocalEnvironment(), mode="yolo")
+    async with app.run_test() as pilot:
+        app.agent.messages = [{"role": "system", "content": "System"}]
+        app.on_message_added()
+        await pilot.pause(0.1)
+        first_widget = app.query_one(MessageContent)
+
+        app.agent.messages.append({"role": "assistant", "content": "Reply"})
+        app.on_message_added()
+        await pilot.pause(0.1)
+        widgets = list(app.query(MessageContent))
+        assert len(widgets) == 2
+        assert widgets[0] is first_widget
+        assert "Reply" in get_screen_text(app)
+
+        # A user message ends the step, the next message starts a new one
+        app.agent.messages += [{"role": "user", "content": "Output"}, {"role": "assistant", "content": "Next"}]
+        app.on_message_added()
+        await pilot.pause(0.1)
+        assert app.n_steps == 2
+        assert app.i_step == 1
+        assert len(app.query(MessageContent)) == 1
@@ -262,3 +262,16 @@ def test_bubblewrap_environment_get_template_vars():
         assert "machine" in template_vars
     finally:
         env.cleanup()
+
+
+def test_bubblewrap_environment_upload_download(tmp_path):
+    """Test that files are copied into and out of the working directory of the sandbox."""
+    env = BubblewrapEnvironment()
+    try:
+        (tmp_path / "file.txt").write_text("content")
+        env.upload({tmp_path / "file.txt": "dir/file.txt"})
+        assert (env.working_dir / "dir" / "file.txt").read_text() == "content"
+        env.download({"dir": tmp_path / "out"})
+        assert (tmp_path / "out" / "file.txt").read_text() == "content"
+    finally:
+        env.cleanup()
@@ -1,6 +1,7 @@
 import os
 import subprocess
 import tempfile
+import time
 from pathlib import Path
 from unittest.mock import patch
 
@@ -199,3 +200,43 @@ def test_local_environment_shell_features():
     result = env.execute("echo $(echo 'nested')")
     assert result["returncode"] == 0
     assert "nested" in result["output"]
+
+
+def test_local_environment_timeout_kills_process_tree(tmp_path):
+    """Test that children of a timed out command are killed as well."""
+    env = LocalEnvironment(timeout=1)
+    pid_file = tmp_path / "child.pid"
+
+    with pytest.raises(subprocess.TimeoutExpired):
+        env.execute(f"sleep 100 & echo $! > {pid_file}; wait")
+
+    stat_file = Path(f"/proc/{pid_file.read_text().strip()}/stat")
+    for _ in range(50):
+        # killed processes might stay around as zombies
+        if not stat_file.exists() or stat_file.read_text().split()[2] == "Z":
+            break
+        time.sleep(0.1)
+    else:
+        pytest.fail("Child process is still running")
+
+
+def test_local_environment_reports_cpu_time():
+    """Test that the CPU time of the command is reported."""
+    env = LocalEnvironment()
+    result = env.execute("echo hello")
+    assert result["output"] == "hello\n"
+    assert isinstance(result["cpu_time"], float)
+
+
+def test_local_environment_upload_download(tmp_path):
+    """Test that files and directories are copied relative to the working directory."""
+    (tmp_path / "src" / "sub").mkdir(parents=True)
+    (tmp_path / "src" / "sub" / "data.bin").write_bytes(b"\x00\xff")
+    (tmp_path / "work").mkdir()
+    env = LocalEnvironment(cwd=str(tmp_path / "work"))
+
+    env.upload({tmp_path / "src": "repo"})
+    assert (tmp_path / "work" / "repo" / "sub" / "data.bin").read_bytes() == b"\x00\xff"
+
+    env.download({"repo/sub/data.bin": tmp_path / "out" / "data.bin"})
+    assert (tmp_path / "out" / "data.bin").read_bytes() == b"\x00\xff"
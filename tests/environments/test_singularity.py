@@ -159,3 +159,48 @@ def test_singularity_environment_timeout():
     # This should timeout and raise TimeoutExpired
     with pytest.raises(subprocess.TimeoutExpired):
         env.execute("sleep 5")
+
+
+def test_singularity_environment_upload_download(tmp_path):
+    """Test that files are copied directly into and out of the sandbox directory."""
+    sandbox_dir = tmp_path / "sandbox"
+    (sandbox_dir / "testbed").mkdir(parents=True)
+    with patch.object(SingularityEnvironment, "_build_sandbox", return_value=sandbox_dir):
+        env = SingularityEnvironment(image="python:3.11", cwd="/testbed")
+    (tmp_path / "file.txt").write_text("content")
+
+    env.upload({tmp_path / "file.txt": "file.txt", str(tmp_path / "file.txt"): "/tmp/other.txt"})
+    assert (sandbox_dir / "testbed" / "file.txt").read_text() == "content"
+    assert (sandbox_dir / "tmp" / "other.txt").read_text() == "content"
+
+    env.download({"/testbed": tmp_path / "out"})
+    assert (tmp_path / "out" / "file.txt").read_text() == "content"
+    env.cleanup()
+    assert not sandbox_dir.exists()
+
+
+def test_singularity_environment_symlinks_stay_in_sandbox(tmp_path):
+    """Absolute symlinks in the sandbox point into the sandbox (like in the container), not to the host."""
+    sandbox_dir = tmp_path / "sandbox"
+    host_dir = tmp_path / "host"
+    for path in [sandbox_dir / "testbed", sandbox_dir / "etc", host_dir]:
+        path.mkdir(parents=True)
+    (sandbox_dir / "etc" / "passwd").write_text("sandbox")
+    (host_dir / "passwd").write_text("host")
+    (sandbox_dir / "testbed" / "etc").symlink_to("/etc")
+    (sandbox_dir / "testbed" / "host").symlink_to(host_dir)
+    (sandbox_dir / "testbed" / "up").symlink_to("../../..")
+    with patch.object(SingularityEnvironment, "_build_sandbox", return_value=sandbox_dir):
+        env = SingularityEnvironment(image="python:3.11", cwd="/testbed")
+
+    env.download({"etc/passwd": tmp_path / "passwd"})
+    assert (tmp_path / "passwd").read_text() == "sandbox"
+    assert env._get_sandbox_path("up/etc/passwd") == (sandbox_dir / "etc" / "passwd").resolve()
+    assert env._get_sandbox_path("/../../etc") == (sandbox_dir / "etc").resolve()
+
+    (tmp_path / "upload" / "host").mkdir(parents=True)
+    (tmp_path / "upload" / "host" / "passwd").write_text("uploaded")
+    env.upload({tmp_path / "upload": "/testbed"})
+    assert (host_dir / "passwd").read_text() == "host"
+    assert (sandbox_dir / str(host_dir).lstrip("/") / "passwd").read_text() == "uploaded"
+    env.cleanup()
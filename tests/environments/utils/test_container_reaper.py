@@ -0,0 +1,92 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from minisweagent.environments.docker import DockerEnvironment
+from minisweagent.environments.utils import container_reaper
+from minisweagent.environments.utils.container_reaper import ContainerReaper, get_owner_label
+
+
+@pytest.fixture
+def fake_docker(tmp_path):
+    """Fake docker executable that logs all calls and lists the containers from `ps.txt`."""
+    executable = tmp_path / "docker"
+    executable.write_text(
+        "#!/bin/sh\n"
+        f'echo "$@" >> {tmp_path / "calls.log"}\n'
+        f'if [ "$1" = "ps" ]; then cat {tmp_path / "ps.txt"}; fi\n'
+        'if [ "$1" = "run" ]; then echo container123; fi\n'
+    )
+    executable.chmod(0o755)
+    (tmp_path / "ps.txt").write_text("")
+    return executable
+
+
+def _calls(fake_docker, command: str) -> list[list[str]]:
+    log = fake_docker.parent / "calls.log"
+    if not log.exists():
+        return []
+    return [line.split() for line in log.read_text().splitlines() if line.startswith(command)]
+
+
+def _dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_removes_containers_in_batches(fake_docker):
+    reaper = ContainerReaper(str(fake_docker), batch_size=2, batch_delay=0.2, sweep_orphans=False)
+    for i in range(5):
+        reaper.schedule(f"c{i}")
+    assert reaper.n_pending == 5
+    assert reaper.flush(timeout=10)
+    assert reaper.n_pending == 0
+    removed = _calls(fake_docker, "rm")
+    assert [call[2:] for call in removed] == [["c0", "c1"], ["c2", "c3"], ["c4"]]
+
+
+def test_find_orphans(fake_docker):
+    hostname = socket.gethostname()
+    (fake_docker.parent / "ps.txt").write_text(
+        f"alive {hostname}:{os.getpid()}\ndead {hostname}:{_dead_pid()}\nother other-host:1\nbroken nonsense\n"
+    )
+    reaper = ContainerReaper(str(fake_docker), sweep_orphans=False)
+    assert reaper.find_orphans() == ["dead"]
+    assert "label=minisweagent.owner" in _calls(fake_docker, "ps")[0]
+
+
+def test_sweeps_orphans_at_startup(fake_docker):
+    (fake_docker.parent / "ps.txt").write_text(f"dead {socket.gethostname()}:{_dead_pid()}\n")
+    reaper = ContainerReaper(str(fake_docker), batch_delay=0)
+    # the sweep runs in the background thread, so we need to wait for it before flushing
+    for _ in range(100):
+        if _calls(fake_docker, "rm"):
+            break
+        time.sleep(0.05)
+    assert reaper.flush(timeout=10)
+    assert _calls(fake_docker, "rm") == [["rm", "-f", "dead"]]
+
+
+def test_get_container_reaper_is_shared(fake_docker, monkeypatch):
+    monkeypatch.setattr(container_reaper, "_REAPERS", {})
+    assert container_reaper.get_container_reaper(str(fake_docker)) is container_reaper.get_container_reaper(
+        str(fake_docker)
+    )
+
+
+def test_docker_environment_uses_reaper(fake_docker, monkeypatch):
+    monkeypatch.setattr(container_reaper, "_REAPERS", {})
+    env = DockerEnvironment(image="python:3.11", executable=str(fake_docker))
+    assert env.container_id == "container123"
+    run_call = _calls(fake_docker, "run")[0]
+    assert f"minisweagent.owner={get_owner_label()}" in run_call
+    env.cleanup()
+    env.cleanup()  # second cleanup is a no-op
+    reaper = container_reaper.get_container_reaper(str(fake_docker))
+    assert reaper.flush(timeout=10)
+    assert _calls(fake_docker, "rm") == [["rm", "-f", "container123"]]
@@ -0,0 +1,95 @@
+import io
+import subprocess
+import tarfile
+from pathlib import Path, PurePosixPath
+
+import pytest
+
+from minisweagent.environments.docker import DockerEnvironment
+from minisweagent.environments.utils.file_transfer import (
+    copy_path,
+    extract_tar,
+    resolve_env_path,
+    write_tar,
+)
+
+
+@pytest.fixture
+def fake_docker(tmp_path):
+    """Fake docker executable whose only container has its file system at `tmp_path / "container"`.
+    Implements `docker cp` with the tar CLI.
+    """
+    root = tmp_path / "container"
+    root.mkdir()
+    executable = tmp_path / "docker"
+    executable.write_text(
+        "#!/bin/sh\n"
+        'if [ "$1" = "run" ]; then echo container123; exit 0; fi\n'
+        'if [ "$1" = "cp" ] && [ "$2" = "-" ]; then exec tar -x -C ' + str(root) + "; fi\n"
+        'if [ "$1" = "cp" ]; then\n'
+        '  path="' + str(root) + '${2#container123:}"\n'
+        '  [ -e "$path" ] || { echo "No such container:path: $2" >&2; exit 1; }\n'
+        '  exec tar -c -C "$(dirname "$path")" "$(basename "$path")"\n'
+        "fi\n"
+    )
+    executable.chmod(0o755)
+    return executable
+
+
+@pytest.fixture
+def local_files(tmp_path) -> Path:
+    source = tmp_path / "local"
+    (source / "repo" / "sub").mkdir(parents=True)
+    (source / "repo" / "a.txt").write_text("a")
+    (source / "repo" / "sub" / "b.bin").write_bytes(bytes(range(256)))
+    (source / "single.txt").write_text("single")
+    return source
+
+
+def test_resolve_env_path():
+    assert resolve_env_path("a/b", "/testbed") == PurePosixPath("/testbed/a/b")
+    assert resolve_env_path("/tmp/x", "/testbed") == PurePosixPath("/tmp/x")
+    assert resolve_env_path("x", "") == PurePosixPath("/x")
+
+
+def test_copy_path_merges_directories(tmp_path, local_files):
+    target = tmp_path / "target"
+    (target / "existing.txt").parent.mkdir()
+    (target / "existing.txt").write_text("keep")
+    copy_path(local_files / "repo", target)
+    copy_path(local_files / "single.txt", tmp_path / "new" / "dir" / "single.txt")
+    assert (target / "existing.txt").read_text() == "keep"
+    assert (target / "sub" / "b.bin").read_bytes() == bytes(range(256))
+    assert (tmp_path / "new" / "dir" / "single.txt").read_text() == "single"
+
+
+def test_tar_roundtrip(tmp_path, local_files):
+    buffer = io.BytesIO()
+    write_tar({local_files / "repo": PurePosixPath("/testbed/repo")}, buffer)
+    buffer.seek(0)
+    with tarfile.open(fileobj=buffer) as tar:
+        assert "testbed/repo/sub/b.bin" in tar.getnames()
+    buffer = io.BytesIO()
+    write_tar({local_files / "repo": PurePosixPath("repo")}, buffer)
+    buffer.seek(0)
+    extract_tar(buffer, "repo", tmp_path / "out" / "renamed")
+    assert (tmp_path / "out" / "renamed" / "a.txt").read_text() == "a"
+    assert (tmp_path / "out" / "renamed" / "sub" / "b.bin").read_bytes() == bytes(range(256))
+
+
+def test_docker_environment_upload_download(tmp_path, fake_docker, local_files):
+    env = DockerEnvironment(image="python:3.11", cwd="/testbed", executable=str(fake_docker))
+    env.upload({local_files / "repo": ".", str(local_files / "single.txt"): "/tmp/single.txt"})
+    root = fake_docker.parent / "container"
+    assert (root / "testbed" / "sub" / "b.bin").read_bytes() == bytes(range(256))
+    assert (root / "tmp" / "single.txt").read_text() == "single"
+
+    out = tmp_path / "out"
+    env.download({"sub": out / "sub_copy", "/tmp/single.txt": out / "single_copy.txt"})
+    assert (out / "sub_copy" / "b.bin").read_bytes() == bytes(range(256))
+    assert (out / "single_copy.txt").read_text() == "single"
+
+    with pytest.raises(subprocess.CalledProcessError) as e:
+        env.download({"/does/not/exist": out / "missing"})
+    assert b"No such container:path" in e.value.stderr
+    env.container_id = None
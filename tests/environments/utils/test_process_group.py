@@ -0,0 +1,102 @@
+import os
+import subprocess
+import time
+from pathlib import Path
+
+import pytest
+
+from minisweagent.environments.utils.process_group import (
+    CPU_TIME_MARKER,
+    get_container_command,
+    get_container_kill_command,
+    get_local_command,
+    parse_cpu_time,
+)
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # zombies count as dead
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split()[2] != "Z"
+    except FileNotFoundError:
+        return True
+
+
+def _wait_for(condition, message: str, timeout: float = 30) -> None:
+    # Generous deadline: the wrapper starts a login shell, which can take seconds on a loaded machine
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            pytest.fail(f"Timed out after {timeout}s: {message}")
+        time.sleep(0.05)
+
+
+@pytest.mark.parametrize(
+    ("output", "expected"),
+    [
+        (f"hello\n\n{CPU_TIME_MARKER}\n0m0.010s 0m0.005s\n0m1.500s 1m0.250s\n", ("hello\n", 61.765)),
+        (f"no newline\n{CPU_TIME_MARKER}\n0m0.000000s 0m0.000000s\n0m0.000000s 0m0.000000s\n", ("no newline", 0.0)),
+        ("exited early\n", ("exited early\n", None)),
+        (f"garbled\n{CPU_TIME_MARKER}\nnope\n", (f"garbled\n{CPU_TIME_MARKER}\nnope\n", None)),
+    ],
+)
+def test_parse_cpu_time(output, expected):
+    assert parse_cpu_time(output) == expected
+
+
+@pytest.mark.parametrize(
+    ("command", "expected_output", "expected_returncode"),
+    [
+        ("echo hello", "hello\n", 0),
+        ("printf 'no newline'", "no newline", 0),
+        ("echo 'quoted \"stuff\"' && false", 'quoted "stuff"\n', 1),
+        ("cat <<'EOF'\nheredoc $HOME\nEOF", "heredoc $HOME\n", 0),
+    ],
+)
+def test_local_command(command, expected_output, expected_returncode):
+    result = subprocess.run(get_local_command(command), shell=True, capture_output=True, text=True)
+    output, cpu_time = parse_cpu_time(result.stdout)
+    assert output == expected_output
+    assert result.returncode == expected_returncode
+    assert cpu_time is not None
+
+
+def test_local_command_reports_cpu_time():
+    command = "python3 -c 'import time; t = time.process_time(); [0 for _ in iter(lambda: time.process_time() - t < 0.3, False)]'"
+    result = subprocess.run(get_local_command(command), shell=True, capture_output=True, text=True)
+    _, cpu_time = parse_cpu_time(result.stdout)
+    assert cpu_time is not None and cpu_time >= 0.3
+
+
+def test_container_command_and_kill(tmp_path):
+    """Simulates `docker exec` by running the wrapper directly."""
+    pgid_file = str(tmp_path / "cmd.pgid")
+    pid_file = tmp_path / "child.pid"
+    process = subprocess.Popen(
+        get_container_command(f"sleep 100 & echo $! > {pid_file}; wait", pgid_file),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    _wait_for(lambda: pid_file.exists() and pid_file.read_text().strip(), f"wrapped command did not write {pid_file}")
+    child_pid = int(pid_file.read_text())
+    assert _is_alive(child_pid)
+    subprocess.run(get_container_kill_command(pgid_file), check=True)
+    process.wait(timeout=10)
+    _wait_for(lambda: not _is_alive(child_pid), f"child process {child_pid} was not killed")
+    assert not Path(pgid_file).exists()
+
+
+def test_container_command_output_and_returncode(tmp_path):
+    result = subprocess.run(
+        get_container_command("echo hello; exit 3", str(tmp_path / "cmd.pgid")), capture_output=True, text=True
+    )
+    output, cpu_time = parse_cpu_time(result.stdout)
+    assert output == "hello\n"
+    assert result.returncode == 3
+    assert cpu_time is not None
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+from minisweagent.agents.default import DefaultAgent
+from minisweagent.environments.local import LocalEnvironment
+from minisweagent.models.extra.cascade import CascadeModel
+from minisweagent.run.utils.save import save_traj
+
+
+def _model_config(name: str, outputs: list[str], cost: float) -> dict:
+    return {"model_class": "deterministic", "model_name": name, "outputs": outputs, "cost_per_call": cost}
+
+
+def _get_cascade(cheap_outputs: list[str], strong_outputs: list[str], **kwargs) -> CascadeModel:
+    return CascadeModel(
+        model_kwargs=[_model_config("cheap", cheap_outputs, 0.1), _model_config("strong", strong_outputs, 1.0)],
+        **kwargs,
+    )
+
+
+def _action(command: str) -> str:
+    return f"```bash\n{command}\n```"
+
+
+def _observation(returncode: int) -> dict:
+    block = {"type": "template", "name": "action_observation", "arguments": {"output": {"returncode": returncode}}}
+    return {"role": "user", "content": [block]}
+
+
+def test_requires_two_models():
+    with pytest.raises(ValueError, match="exactly two models"):
+        CascadeModel(model_kwargs=[_model_config("cheap", [], 0.1)])
+
+
+@pytest.mark.parametrize(
+    ("messages", "trigger"),
+    [
+        ([], None),
+        ([{"role": "assistant", "content": _action("ls")}, _observation(0)], None),
+        ([{"role": "assistant", "content": "no action"}, {"role": "user", "content": "format error"}], "format_error"),
+        (
+            [{"role": "assistant", "content": [{"type": "text", "text": _action("ls") + _action("pwd")}]}],
+            "format_error",
+        ),
+        (
+            [{"role": "assistant", "content": _action("ls")}, _observation(0)] * 2,
+            "repeated_actions",
+        ),
+        (
+            [{"role": "assistant", "content": _action(f"cmd{i}")} if i % 2 else _observation(1) for i in range(6)],
+            "nonzero_exit_streak",
+        ),
+    ],
+)
+def test_get_trigger(messages, trigger):
+    assert _get_cascade([], []).get_trigger(messages) == trigger
+
+
+def test_escalation_pattern_discards_cheap_response(reset_global_stats):
+    model = _get_cascade([_action("echo COMPLETE_TASK_AND_SUBMIT_FINAL_OUTPUT")], [_action("echo strong")])
+    response = model.query([])
+    assert response["model_name"] == "strong"
+    assert response["escalation"] == "escalation_pattern"
+    assert model.cost == pytest.approx(1.1)
+    assert model.escalations == {"escalation_pattern": 1}
+
+
+def test_escalation_steps(reset_global_stats):
+    model = _get_cascade([_action("echo cheap")], [_action("echo strong")] * 2, escalation_steps=2)
+    messages = [{"role": "assistant", "content": "no action"}, {"role": "user", "content": "format error"}]
+    assert model.query(messages)["escalation"] == "format_error"
+    assert model.query([])["escalation"] == "continued"
+    assert model.query([])["model_name"] == "cheap"
+
+
+def test_cascade_in_agent_run(tmp_path, reset_global_stats):
+    model = _get_cascade(
+        ["no action here", _action("echo step"), _action("echo COMPLETE_TASK_AND_SUBMIT_FINAL_OUTPUT")],
+        [_action("echo fixed"), _action("echo COMPLETE_TASK_AND_SUBMIT_FINAL_OUTPUT\necho done")],
+    )
+    agent = DefaultAgent(model, LocalEnvironment())
+    exit_status, result = agent.run("task")
+    assert exit_status == "Submitted"
+    assert result == "done\n"
+    stats = model.get_template_vars()["model_stats"]
+    assert stats["cheap"] == {"model_name": "cheap", "cost": pytest.approx(0.3), "n_calls": 3}
+    assert stats["strong"] == {"model_name": "strong", "cost": 2.0, "n_calls": 2}
+    assert model.escalations == {"format_error": 1, "escalation_pattern": 1}
+
+    save_traj(agent, tmp_path / "traj.json", print_path=False)
+    model_stats = json.loads((tmp_path / "traj.json").read_text())["info"]["model_stats"]
+    assert model_stats["api_calls"] == 5
+    assert model_stats["models"]["strong"]["n_calls"] == 2
@@ -0,0 +1,92 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from minisweagent.models.extra.router import LatencyRouterModel, _BackendStats
+
+
+class FakeModel:
+    def __init__(self, name: str, latency: float = 0.0, fail: bool = False):
+        self.config = SimpleNamespace(model_name=name)
+        self.latency = latency
+        self.fail = fail
+        self.cost = 0.0
+        self.n_calls = 0
+
+    def query(self, messages, **kwargs) -> dict:
+        time.sleep(self.latency)
+        if self.fail:
+            raise RuntimeError(f"{self.config.model_name} failed")
+        self.n_calls += 1
+        self.cost += 1.0
+        return {"content": self.config.model_name}
+
+
+def _get_router(backends: list[FakeModel], **kwargs) -> LatencyRouterModel:
+    model_kwargs = [{"model_name": "deterministic", "model_class": "deterministic", "outputs": []} for _ in backends]
+    router = LatencyRouterModel(model_kwargs=model_kwargs, **kwargs)
+    router.models = backends  # type: ignore[assignment]
+    return router
+
+
+def test_backend_stats():
+    stats = _BackendStats(window=4)
+    assert stats.expected_latency == float("inf")
+    for latency in [1.0, 2.0, 3.0, 4.0, 5.0]:
+        stats.record(latency, error=False)
+    assert stats.percentile(0.5) == 3.0
+    assert stats.percentile(0.95) == 5.0
+    stats.record(0.1, error=True)
+    stats.record(0.1, error=True)
+    assert stats.error_rate == 0.5
+    assert stats.expected_latency == pytest.approx(stats.percentile(0.5) * 2)
+    assert stats.n_calls == 7
+
+
+def test_routes_to_fastest_backend():
+    router = _get_router([FakeModel("slow", latency=0.05), FakeModel("fast")], min_samples=2)
+    names = [router.query([])["model_name"] for _ in range(10)]
+    # every backend is measured first
+    assert names[:4] == ["slow", "slow", "fast", "fast"]
+    assert set(names[4:]) == {"fast"}
+    assert router.n_calls == 10
+    assert router.cost == 10.0
+    backend_stats = router.get_template_vars()["backend_stats"]
+    assert backend_stats["0:slow"]["n_calls"] == 2
+    assert backend_stats["1:fast"]["n_calls"] == 8
+
+
+def test_fails_over_and_avoids_failing_backend():
+    failing = FakeModel("failing", fail=True)
+    router = _get_router([failing, FakeModel("ok", latency=0.01)], min_samples=1)
+    assert [router.query([])["model_name"] for _ in range(5)] == ["ok"] * 5
+    assert router.get_template_vars()["backend_stats"]["0:failing"] == {
+        "n_calls": 1,
+        "p50": None,
+        "p95": None,
+        "error_rate": 1.0,
+    }
+
+
+def test_raises_if_all_backends_fail():
+    router = _get_router([FakeModel("a", fail=True), FakeModel("b", fail=True)])
+    with pytest.raises(RuntimeError, match="failed"):
+        router.query([])
+
+
+def test_hedged_query():
+    primary, secondary = FakeModel("primary", latency=0.01), FakeModel("secondary", latency=0.05)
+    router = _get_router([primary, secondary], min_samples=1, hedge=True, hedge_min_samples=3)
+    responses = [router.query([]) for _ in range(4)]
+    assert [r["model_name"] for r in responses] == ["primary", "secondary", "primary", "primary"]
+    assert not any(r["hedged"] for r in responses)
+
+    primary.latency = 0.5
+    response = router.query([])
+    assert response["model_name"] == "secondary"
+    assert response["hedged"]
+    # the cost of the losing query counts as well (reading the cost waits for it)
+    assert router.cost == 6.0
+    assert router.n_calls == 6
+    assert primary.n_calls == 4
@@ -76,3 +76,13 @@ def test_model_registry_not_provided():
 
         # Verify register_model was not called
         mock_register.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    ("info", "expected"),
+    [({"max_input_tokens": 128000, "max_tokens": 4096}, 128000), ({"max_tokens": 4096}, None), ({}, None)],
+)
+def test_get_context_limit_only_uses_input_limit(info, expected):
+    model = LitellmModel(model_name="some-model")
+    with patch("litellm.get_model_info", return_value=info):
+        assert model.get_context_limit() == expected
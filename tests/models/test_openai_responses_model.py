@@ -0,0 +1,122 @@
+import os
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from minisweagent.models import GLOBAL_MODEL_STATS
+from minisweagent.models.openai_responses_model import (
+    OpenAIResponsesAPIError,
+    OpenAIResponsesModel,
+    _is_previous_response_missing,
+)
+from minisweagent.run.extra.mock_server import MockLLMServer
+
+
+def _run_conversation(model: OpenAIResponsesModel, n_steps: int) -> list[dict]:
+    messages = [{"role": "system", "content": "system"}, {"role": "user", "content": "task"}]
+    for i in range(n_steps):
+        response = model.query(messages)
+        messages.append({"role": "assistant", "content": response["content"]})
+        messages.append({"role": "user", "content": [{"type": "text", "text": f"observation {i}"}]})
+    return messages
+
+
+@pytest.fixture
+def server():
+    with MockLLMServer(outputs=["first", "second", "third"], seed=0) as server:
+        yield server
+
+
+def _get_model(server: MockLLMServer, **kwargs) -> OpenAIResponsesModel:
+    with patch.dict(os.environ, {"OPENAI_BASE_URL": server.url, "OPENAI_API_KEY": "test-key"}):
+        return OpenAIResponsesModel(model_name="mock", **kwargs)
+
+
+def test_sends_only_new_messages(server):
+    model = _get_model(server)
+    initial_calls = GLOBAL_MODEL_STATS.n_calls
+    with patch("minisweagent.models.openai_responses_model.requests.post", wraps=requests.post) as post:
+        _run_conversation(model, 3)
+    payloads = [call.kwargs["data"] for call in post.call_args_list]
+    assert "previous_response_id" not in payloads[0]
+    assert all("previous_response_id" in payload for payload in payloads[1:])
+    # Delta requests don't grow with the history
+    assert '"system"' not in payloads[2] and "observation 0" not in payloads[2]
+    assert (model.n_delta_requests, model.n_full_requests) == (2, 1)
+    assert model.n_calls == 3 and model.cost > 0
+    assert GLOBAL_MODEL_STATS.n_calls == initial_calls + 3
+
+
+def test_replies_match_full_history(server):
+    # The server continues the stored conversation, so the outputs are the same as without delta requests
+    messages = _run_conversation(_get_model(server), 3)
+    assert [m["content"] for m in messages if m["role"] == "assistant"] == ["first", "second", "third"]
+    with MockLLMServer(outputs=["first", "second", "third"]) as other_server:
+        messages = _run_conversation(_get_model(other_server, delta_requests=False), 3)
+    assert [m["content"] for m in messages if m["role"] == "assistant"] == ["first", "second", "third"]
+
+
+def test_falls_back_to_full_history_if_state_is_lost():
+    with MockLLMServer(outputs=["first", "second", "third"], state_loss_rate=1.0) as server:
+        model = _get_model(server)
+        messages = _run_conversation(model, 3)
+    assert [m["content"] for m in messages if m["role"] == "assistant"] == ["first", "second", "third"]
+    assert (model.n_delta_requests, model.n_full_requests) == (0, 3)
+
+
+def test_changed_history_is_sent_in_full(server):
+    model = _get_model(server)
+    messages = _run_conversation(model, 2)
+    messages[2] = {"role": "user", "content": "compacted"}
+    model.query(messages)
+    assert (model.n_delta_requests, model.n_full_requests) == (1, 2)
+
+
+def test_cost_from_prices(server):
+    model = _get_model(server, prices={"input": 1.0, "output": 0.0})
+    usage = {"input_tokens": 10, "output_tokens": 5}
+    assert model._get_cost(usage) == 10.0
+    model = _get_model(server)
+    with patch("minisweagent.models.openai_responses_model.get_model_prices", side_effect=ValueError):
+        with pytest.raises(OpenAIResponsesAPIError):
+            model._get_cost(usage)
+
+
+def test_renders_agent_templates():
+    from minisweagent.agents.default import DefaultAgent
+    from minisweagent.environments.local import LocalEnvironment
+
+    outputs = [
+        "Step\n```bash\necho observed-output\n```",
+        "Done\n```bash\necho COMPLETE_TASK_AND_SUBMIT_FINAL_OUTPUT\n```",
+    ]
+    with MockLLMServer(outputs=outputs) as server:
+        model = _get_model(server)
+        agent = DefaultAgent(model, LocalEnvironment(), instance_template="Solve: {{task}}")
+        with patch("minisweagent.models.openai_responses_model.requests.post", wraps=requests.post) as post:
+            assert agent.run("the-task")[0] == "Submitted"
+    payloads = [call.kwargs["data"] for call in post.call_args_list]
+    assert "Solve: the-task" in payloads[0] and "instance_template" not in payloads[0]
+    assert "observed-output" in payloads[1] and '"returncode"' not in payloads[1]
+
+
+def test_template_blocks_need_renderer(server):
+    model = _get_model(server)
+    message = {"role": "user", "content": [{"type": "template", "name": "instance", "arguments": {"task": "x"}}]}
+    with pytest.raises(OpenAIResponsesAPIError, match="render_template"):
+        model.query([message])
+
+
+def _get_error_response(status_code: int, body: str) -> requests.Response:
+    response = requests.Response()
+    response.status_code, response._content = status_code, body.encode()
+    return response
+
+
+def test_only_missing_previous_response_is_lost_state():
+    missing = '{"error": {"message": "Previous response with id \'resp_1\' not found.", "code": "previous_response_not_found"}}'
+    assert _is_previous_response_missing(_get_error_response(404, missing))
+    assert _is_previous_response_missing(_get_error_response(400, "Previous response resp_1 not found"))
+    assert not _is_previous_response_missing(_get_error_response(400, '{"error": {"message": "Invalid temperature"}}'))
+    assert not _is_previous_response_missing(_get_error_response(404, '{"error": {"message": "Model not found"}}'))
@@ -1,6 +1,7 @@
 import os
 from unittest.mock import MagicMock, patch
 
+import litellm
 import pytest
 
 from minisweagent.models.portkey_model import PortkeyModel, PortkeyModelConfig
@@ -57,6 +58,7 @@ def test_portkey_model_query():
     mock_message.content = "Hello! How can I help you?"
     mock_choice.message = mock_message
     mock_response.choices = [mock_choice]
+    mock_response.usage = litellm.Usage(prompt_tokens=100, completion_tokens=50, total_tokens=150)
     mock_response.model_dump.return_value = {"test": "response"}
 
     mock_client.chat.completions.create.return_value = mock_response
@@ -64,9 +66,7 @@ def test_portkey_model_query():
 
     with patch("minisweagent.models.portkey_model.Portkey", mock_portkey_class):
         with patch.dict(os.environ, {"PORTKEY_API_KEY": "test-key"}):
-            with patch("minisweagent.models.portkey_model.litellm.cost_calculator.completion_cost") as mock_cost:
-                mock_cost.return_value = 0.01
-
+            with patch("litellm.cost_calculator.completion_cost") as mock_cost:
                 model = PortkeyModel(model_name="gpt-4o")
 
                 messages = [{"role": "user", "content": "Hello!"}]
@@ -74,14 +74,36 @@ def test_portkey_model_query():
 
                 assert result["content"] == "Hello! How can I help you?"
                 assert result["extra"]["response"] == {"test": "response"}
-                assert result["extra"]["cost"] == 0.01
+                info = litellm.get_model_info("gpt-4o")
+                expected_cost = 100 * info["input_cost_per_token"] + 50 * info["output_cost_per_token"]
+                assert result["extra"]["cost"] == pytest.approx(expected_cost)
                 assert model.n_calls == 1
-                assert model.cost == 0.01
+                assert model.cost == pytest.approx(expected_cost)
 
                 # Verify the API was called correctly
                 mock_client.chat.completions.create.assert_called_once_with(model="gpt-4o", messages=messages)
-                # Verify cost calculation was called
-                mock_cost.assert_called_once_with(mock_response.model_copy(), model=None)
+                # The cost is calculated from the price table, not by litellm
+                mock_cost.assert_not_called()
+
+
+def test_portkey_model_query_unknown_model_uses_litellm():
+    """Test that the cost of models without known prices is calculated by litellm."""
+    mock_client = MagicMock()
+    mock_response = mock_client.chat.completions.create.return_value
+    mock_response.choices[0].message.content = "Hi"
+    mock_response.usage = litellm.Usage(prompt_tokens=80, completion_tokens=10, total_tokens=100)
+
+    with patch("minisweagent.models.portkey_model.Portkey", return_value=mock_client):
+        with patch.dict(os.environ, {"PORTKEY_API_KEY": "test-key"}):
+            with patch("litellm.cost_calculator.completion_cost", return_value=0.01) as mock_cost:
+                model = PortkeyModel(model_name="@my-provider/unknown-model")
+                result = model.query([{"role": "user", "content": "Hello!"}])
+
+    assert result["extra"]["cost"] == 0.01
+    # prompt tokens are corrected because total tokens don't add up
+    mock_cost.assert_called_once()
+    assert mock_cost.call_args.args[0].usage.prompt_tokens == 90
+    assert mock_cost.call_args.kwargs == {"model": None}
 
 
 def test_portkey_model_get_template_vars():
@@ -0,0 +1,115 @@
+import logging
+from unittest.mock import patch
+
+import litellm
+import pytest
+
+from minisweagent.models.litellm_model import LitellmModel
+from minisweagent.models.utils.pricing import CostCalculator, ModelPrices, get_model_prices
+
+
+def _response(model: str, **usage) -> litellm.ModelResponse:
+    return litellm.ModelResponse(model=model, usage=litellm.Usage(**usage))
+
+
+def _get_expected_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    info = litellm.get_model_info(model)
+    return prompt_tokens * info["input_cost_per_token"] + completion_tokens * info["output_cost_per_token"]
+
+
+@pytest.mark.parametrize(
+    ("model", "usage"),
+    [
+        ("gpt-4o", {"prompt_tokens": 1000, "completion_tokens": 200}),
+        ("gpt-4o", {"prompt_tokens": 1000, "completion_tokens": 200, "prompt_tokens_details": {"cached_tokens": 400}}),
+        (
+            "o3-mini",
+            {"prompt_tokens": 1000, "completion_tokens": 500, "completion_tokens_details": {"reasoning_tokens": 300}},
+        ),
+        (
+            "anthropic/claude-sonnet-4-5-20250929",
+            {
+                "prompt_tokens": 1500,
+                "completion_tokens": 100,
+                "cache_creation_input_tokens": 300,
+                "cache_read_input_tokens": 700,
+            },
+        ),
+        (
+            "anthropic/claude-sonnet-4-5-20250929",
+            {
+                "prompt_tokens": 250_000,
+                "completion_tokens": 100,
+                "cache_creation_input_tokens": 300,
+                "cache_read_input_tokens": 700,
+            },
+        ),
+    ],
+)
+def test_price_table_matches_litellm(model, usage):
+    response = _response(model, **usage)
+    assert get_model_prices(model).get_cost(response.usage) == pytest.approx(
+        litellm.cost_calculator.completion_cost(response, model=model)
+    )
+
+
+def test_model_prices_from_model_info():
+    info = {
+        "input_cost_per_token": 1.0,
+        "output_cost_per_token": 2.0,
+        "cache_read_input_token_cost": 0.1,
+        "input_cost_per_token_above_200k_tokens": 10.0,
+    }
+    prices = ModelPrices.from_model_info(info)
+    assert prices.cache_write is None
+    assert prices.long_context == ModelPrices(input=10.0, output=2.0, cache_read=0.1)
+    with pytest.raises(ValueError):
+        ModelPrices.from_model_info({"input_cost_per_token": 1.0})
+
+
+def test_model_prices_override_prompt_tokens():
+    prices = ModelPrices(input=1.0, output=10.0)
+    usage = litellm.Usage(prompt_tokens=5, completion_tokens=1)
+    assert prices.get_cost(usage) == 15.0
+    assert prices.get_cost(usage, prompt_tokens=7) == 17.0
+
+
+def test_cost_calculator_does_not_call_litellm():
+    calculator = CostCalculator("gpt-4o")
+    with patch("litellm.cost_calculator.completion_cost") as mock_cost:
+        cost = calculator.get_cost(_response("gpt-4o", prompt_tokens=100, completion_tokens=10))
+    mock_cost.assert_not_called()
+    assert cost == pytest.approx(_get_expected_cost("gpt-4o", 100, 10))
+
+
+def test_cost_calculator_unknown_model_falls_back_to_litellm():
+    calculator = CostCalculator("my-unknown-model")
+    assert calculator.prices is None
+    with patch("litellm.cost_calculator.completion_cost", return_value=0.5) as mock_cost:
+        assert calculator.get_cost(_response("my-unknown-model", prompt_tokens=1, completion_tokens=1)) == 0.5
+    mock_cost.assert_called_once()
+
+
+def test_cost_calculator_validation(caplog):
+    calculator = CostCalculator("gpt-4o", validate=True)
+    response = _response("gpt-4o", prompt_tokens=100, completion_tokens=10)
+    with caplog.at_level(logging.WARNING, logger="minisweagent.pricing"):
+        assert calculator.get_cost(response) == pytest.approx(_get_expected_cost("gpt-4o", 100, 10))
+        assert "mismatch" not in caplog.text
+        with patch("litellm.cost_calculator.completion_cost", return_value=1.0):
+            assert calculator.get_cost(response) == 1.0
+    assert "Cost mismatch for gpt-4o" in caplog.text
+
+
+def test_litellm_model_uses_price_table(reset_global_stats):
+    model = LitellmModel(model_name="gpt-4o")
+    response = _response("gpt-4o", prompt_tokens=100, completion_tokens=10)
+    response.choices[0].message.content = "Hello"
+    with (
+        patch("litellm.completion", return_value=response),
+        patch("litellm.cost_calculator.completion_cost") as mock_cost,
+    ):
+        result = model.query([{"role": "user", "content": "Hi"}])
+    mock_cost.assert_not_called()
+    assert result["content"] == "Hello"
+    assert model.cost == pytest.approx(_get_expected_cost("gpt-4o", 100, 10))
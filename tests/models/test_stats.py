@@ -0,0 +1,129 @@
+import logging
+import os
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from minisweagent.models.utils.stats import GlobalLimitExceeded, GlobalModelStats, ModelUsage
+
+
+@pytest.fixture
+def stats():
+    with patch.dict(os.environ, {"MSWEA_SILENT_STARTUP": "1"}, clear=True):
+        return GlobalModelStats()
+
+
+def test_breakdown_by_model_and_provider(stats):
+    stats.add(1.0, model_name="a", provider="x", input_tokens=10, output_tokens=1)
+    stats.add(2.0, model_name="b", provider="x", input_tokens=20, output_tokens=2)
+    stats.add(0.5, model_name="a", provider="x")
+    snapshot = stats.snapshot()
+    assert snapshot.total == ModelUsage(cost=3.5, n_calls=3, input_tokens=30, output_tokens=3)
+    assert snapshot.by_model["a"] == ModelUsage(cost=1.5, n_calls=2, input_tokens=10, output_tokens=1)
+    assert snapshot.by_provider == {"x": snapshot.total}
+    assert snapshot.to_dict()["by_model"]["b"]["input_tokens"] == 20
+    assert (stats.cost, stats.n_calls) == (3.5, 3)
+
+
+def test_threads_are_merged(stats):
+    def work():
+        for _ in range(100):
+            stats.add(0.5, model_name="m", input_tokens=1)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    snapshot = stats.snapshot()
+    assert snapshot.n_calls == 800
+    assert snapshot.cost == 400
+    assert snapshot.total.input_tokens == 800
+    assert len(stats._shards) == 8
+
+
+def test_call_limit_is_atomic(stats):
+    stats.call_limit = 50
+    n_exceeded = []
+    barrier = threading.Barrier(10)
+
+    def work():
+        barrier.wait()
+        for _ in range(10):
+            try:
+                stats.add(0.0)
+            except GlobalLimitExceeded:
+                n_exceeded.append(1)
+
+    threads = [threading.Thread(target=work) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Exactly the calls from the 50th on exceed the limit
+    assert len(n_exceeded) == 51
+
+
+def test_cost_token_and_time_limits(stats):
+    stats.cost_limit = 1.0
+    stats.add(1.0)
+    with pytest.raises(GlobalLimitExceeded, match="cost/call"):
+        stats.add(0.1)
+    stats.reset()
+    stats.cost_limit = 0
+    stats.token_limit = 100
+    stats.add(0.0, input_tokens=60, output_tokens=40)
+    with pytest.raises(GlobalLimitExceeded, match="token"):
+        stats.add(0.0, input_tokens=1)
+    stats.reset()
+    stats.token_limit = 0
+    stats.time_limit = 10
+    stats.check_limits()
+    with patch("minisweagent.models.utils.stats.time.monotonic", return_value=stats._start_time + 11):
+        with pytest.raises(GlobalLimitExceeded, match="time"):
+            stats.check_limits()
+
+
+def test_limits_set_later_include_previous_calls(stats):
+    stats.add(2.0)
+    stats.cost_limit = 2.5
+    with pytest.raises(GlobalLimitExceeded):
+        stats.add(1.0)
+
+
+def test_reset(stats):
+    stats.add(1.0, model_name="a")
+    stats.reset()
+    assert stats.snapshot().total == ModelUsage()
+    stats.add(1.0, model_name="b")
+    assert list(stats.snapshot().by_model) == ["b"]
+
+
+def test_before_sleep_hook_counts_errors(stats):
+    from tenacity import Retrying, stop_after_attempt, wait_none
+
+    class RateLimitError(Exception):
+        pass
+
+    logger = logging.getLogger("test_stats")
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise RateLimitError("429")
+        return "ok"
+
+    retrying = Retrying(stop=stop_after_attempt(5), wait=wait_none(), before_sleep=stats.get_before_sleep_hook(logger))
+    assert retrying(flaky) == "ok"
+    assert stats.errors == {"RateLimitError": 2}
+    stats.reset()
+    assert stats.errors == {}
+
+
+def test_prints_token_and_time_limit(capsys):
+    with patch.dict(os.environ, {"MSWEA_GLOBAL_TOKEN_LIMIT": "1000", "MSWEA_GLOBAL_TIME_LIMIT": "60"}, clear=True):
+        stats = GlobalModelStats()
+    assert stats.token_limit == 1000
+    assert "Global token/time limit: 1000 / 60s" in capsys.readouterr().out
@@ -0,0 +1,121 @@
+import asyncio
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+from tensorzero.types import Usage
+
+from minisweagent.models.tensorzero import TensorZeroModel
+
+
+def _response(text: str = "Hello", variant_name: str = "gpt-5", **usage) -> SimpleNamespace:
+    return SimpleNamespace(
+        inference_id=uuid.uuid4(),
+        variant_name=variant_name,
+        content=[SimpleNamespace(type="thought", text="hmm", signature=None), SimpleNamespace(type="text", text=text)],
+        usage=Usage(**({"input_tokens": 1000, "output_tokens": 100} | usage)),
+    )
+
+
+class FakeAsyncClient:
+    def __init__(self, response):
+        self.response = response
+        self.calls = []
+
+    async def inference(self, **kwargs):
+        self.calls.append(kwargs)
+        return self.response
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    monkeypatch.delenv("TENSORZERO_GATEWAY_URL", raising=False)
+    monkeypatch.delenv("TENSORZERO_CONFIG_PATH", raising=False)
+    with patch("minisweagent.models.tensorzero.TensorZeroGateway") as mock_gateway:
+        yield mock_gateway
+
+
+def test_query_without_prices(gateway, tmp_path, monkeypatch, capsys, reset_global_stats):
+    monkeypatch.chdir(tmp_path)
+    client = gateway.build_embedded.return_value
+    client.inference.return_value = _response("ls")
+    model = TensorZeroModel(model_name="tensorzero", tags={"run": "test"})
+    result = model.query([{"role": "user", "content": "Hi"}])
+
+    assert result["content"] == "ls"
+    assert result["content_blocks"] == [{"type": "thought", "text": "hmm"}, {"type": "text", "text": "ls"}]
+    assert model.cost == 0.0
+    assert model.n_calls == 1
+    kwargs = client.inference.call_args.kwargs
+    assert kwargs["function_name"] == "swe_agent"
+    assert kwargs["episode_id"] == str(model.episode_id)
+    assert kwargs["tags"] == {"run": "test"}
+    # Nothing is written to the working directory or printed
+    assert not (Path(tmp_path) / ".episode_id").exists()
+    assert capsys.readouterr().out == ""
+
+
+def test_query_with_price_table(gateway, reset_global_stats):
+    client = gateway.build_embedded.return_value
+    prices = {"gpt-5": {"input": 1e-6, "output": 1e-5, "cache_read": 1e-7}, "default": {"input": 1.0, "output": 1.0}}
+    model = TensorZeroModel(prices=prices)
+
+    client.inference.return_value = _response(provider_cache_read_input_tokens=400)
+    result = model.query([])
+    expected = 600 * 1e-6 + 400 * 1e-7 + 100 * 1e-5
+    assert model.cost == pytest.approx(expected)
+    assert result["extra"]["cost"] == pytest.approx(expected)
+
+    client.inference.return_value = _response(variant_name="other", input_tokens=1, output_tokens=1)
+    model.query([])
+    assert model.cost == pytest.approx(expected + 2.0)
+
+    # Costs that are reported by the gateway take precedence
+    client.inference.return_value = _response(cost=0.5)
+    model.query([])
+    assert model.cost == pytest.approx(expected + 2.5)
+
+    info = model.get_episode_info()
+    assert info["episode_id"] == str(model.episode_id)
+    assert [i["variant_name"] for i in info["inferences"]] == ["gpt-5", "other", "gpt-5"]
+    assert info["inferences"][0]["input_tokens"] == 1000
+
+
+def test_price_table_with_litellm_model_name(gateway):
+    model = TensorZeroModel(prices={"gpt-5": "gpt-4o"})
+    assert model._prices["gpt-5"].input == 2.5e-6
+
+
+def test_aquery(gateway, reset_global_stats):
+    async_client = FakeAsyncClient(_response("async", cost=0.25))
+    mock_async_gateway = MagicMock()
+
+    async def build_embedded(**kwargs):
+        return async_client
+
+    mock_async_gateway.build_embedded.side_effect = build_embedded
+    with patch("minisweagent.models.tensorzero.AsyncTensorZeroGateway", mock_async_gateway):
+        model = TensorZeroModel()
+
+        async def run():
+            return [await model.aquery([{"role": "user", "content": "Hi"}]) for _ in range(2)]
+
+        results = asyncio.run(run())
+
+    assert [r["content"] for r in results] == ["async", "async"]
+    assert model.cost == pytest.approx(0.5)
+    assert model.n_calls == 2
+    # The async client is only built once per event loop
+    mock_async_gateway.build_embedded.assert_called_once()
+    assert mock_async_gateway.build_embedded.call_args.kwargs["async_setup"] is True
+    assert async_client.calls[0]["episode_id"] == str(model.episode_id)
+    gateway.build_embedded.return_value.inference.assert_not_called()
+
+
+def test_http_gateway(gateway, monkeypatch):
+    monkeypatch.setenv("TENSORZERO_GATEWAY_URL", "http://localhost:3000")
+    model = TensorZeroModel()
+    gateway.build_http.assert_called_once_with(gateway_url="http://localhost:3000")
+    assert model.config.config_file is None
@@ -0,0 +1,89 @@
+from unittest.mock import patch
+
+from minisweagent.models.utils.tokens import (
+    TOKENS_PER_MESSAGE,
+    TokenEstimator,
+    _get_tiktoken_encode,
+    get_message_text,
+)
+
+
+def _message(text: str, role: str = "user") -> dict:
+    return {"role": role, "content": text}
+
+
+def test_get_message_text():
+    assert get_message_text(_message("hello")) == "hello"
+    template = {"type": "template", "name": "action_observation", "arguments": {"output": {"output": "out"}}}
+    text = get_message_text({"role": "user", "content": [template, {"type": "text", "text": "more"}]})
+    assert '"output": "out"' in text
+    assert text.endswith("more")
+
+
+def test_get_message_text_renders_templates():
+    template = {"type": "template", "name": "action_observation", "arguments": {"output": {"output": "out"}}}
+    message = {"role": "user", "content": [template]}
+    render = lambda block: f"<output>{block['arguments']['output']['output']}</output>"  # noqa: E731
+    assert get_message_text(message, render) == "<output>out</output>"
+
+    def fail(block):
+        raise ValueError("no template")
+
+    assert get_message_text(message, fail) == get_message_text(message)
+    estimator = TokenEstimator(encoding=None, bytes_per_token=1, render_template=lambda block: "x" * 100)
+    assert estimator.count([message]) == 101 + TOKENS_PER_MESSAGE
+
+
+def test_byte_heuristic():
+    estimator = TokenEstimator(encoding=None, bytes_per_token=4)
+    assert not estimator.uses_tokenizer
+    assert estimator.count([_message("x" * 400)]) == 101 + TOKENS_PER_MESSAGE
+    assert estimator.count_text("ä" * 20) == 11  # counts bytes, not characters
+
+
+def test_only_new_messages_are_counted():
+    estimator = TokenEstimator(encoding=None)
+    messages = [_message("a" * 100), _message("b" * 100, role="assistant")]
+    with patch.object(estimator, "_count_units", wraps=estimator._count_units) as count_units:
+        first = estimator.count(messages)
+        messages.append(_message("c" * 100))
+        second = estimator.count(messages)
+        assert count_units.call_count == 3
+        assert estimator.count(messages) == second > first
+        assert count_units.call_count == 3
+
+
+def test_modified_history_is_recounted():
+    estimator = TokenEstimator(encoding=None)
+    messages = [_message("a" * 1000), _message("b" * 1000)]
+    full = estimator.count(messages)
+    messages[-1] = _message("b")
+    assert estimator.count(messages) < full
+    assert estimator.count(messages[:1]) < full
+    assert estimator.count([]) == 1
+
+
+def test_calibrate():
+    estimator = TokenEstimator(encoding=None, bytes_per_token=4)
+    messages = [_message("x" * 1000)]
+    estimator.calibrate(messages, 500 + TOKENS_PER_MESSAGE)  # 2 bytes per token
+    assert estimator.bytes_per_token == 3
+    assert estimator.count(messages) == 334 + TOKENS_PER_MESSAGE
+
+
+def test_tokenizer_is_used_if_available():
+    with patch("minisweagent.models.utils.tokens._get_tiktoken_encode", return_value=lambda text: len(text.split())):
+        estimator = TokenEstimator()
+    assert estimator.uses_tokenizer
+    assert estimator.count([_message("one two three")]) == 3 + TOKENS_PER_MESSAGE
+    estimator.calibrate([_message("one")], 100)
+    assert estimator.count([_message("one two three")]) == 3 + TOKENS_PER_MESSAGE
+
+
+def test_falls_back_to_heuristic_if_tokenizer_unavailable():
+    _get_tiktoken_encode.cache_clear()
+    try:
+        with patch("tiktoken.get_encoding", side_effect=OSError("offline")):
+            assert not TokenEstimator().uses_tokenizer
+    finally:
+        _get_tiktoken_encode.cache_clear()
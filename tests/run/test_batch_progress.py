@@ -1,3 +1,10 @@
+import json
+import logging
+import os
+import stat
+import threading
+from unittest.mock import patch
+
 import pytest
 import yaml
 
@@ -43,6 +50,7 @@ def test_manager_with_yaml_path(manager_with_yaml):
 
 def test_instance_lifecycle(manager):
     manager.on_instance_start("task_1")
+    manager.flush()
     assert "task_1" in manager._spinner_tasks
     assert manager.n_completed == 0
 
@@ -91,6 +99,7 @@ def test_yaml_report_generation(manager_with_yaml):
     manager.on_instance_end("task_1", "success")
     manager.on_instance_start("task_2")
     manager.on_instance_end("task_2", "failed")
+    manager.flush()
 
     assert yaml_path.exists()
     data = yaml.safe_load(yaml_path.read_text())
@@ -134,3 +143,70 @@ def test_concurrent_operations(manager):
 
     assert manager.n_completed == 10
     assert sum(len(instances) for instances in manager._instances_by_exit_status.values()) == 10
+
+
+def test_status_updates_are_coalesced(manager):
+    manager.on_instance_start("task_1")
+    for i in range(100):
+        manager.update_instance_status("task_1", f"step {i}")
+    manager.flush()
+    task = manager._task_progress_bar.tasks[0]
+    assert task.fields["status"].strip() == "step 99"
+    manager.on_instance_end("task_1", "success")
+    manager.update_instance_status("task_1", "late update")  # ignored, instance has finished
+    manager.flush()
+    assert manager._task_progress_bar.tasks == []
+
+
+def test_report_is_rate_limited(tmp_path):
+    report_path = tmp_path / "report.json"
+    manager = RunBatchProgressManager(2, report_path, headless=True, report_interval=3600)
+    manager.on_instance_end("task_1", "success")
+    manager._update()
+    assert json.loads(report_path.read_text()) == {"instances_by_exit_status": {"success": ["task_1"]}}
+    manager.on_instance_end("task_2", "failed")
+    manager._update()
+    assert "failed" not in json.loads(report_path.read_text())["instances_by_exit_status"]
+    manager.stop()
+    assert json.loads(report_path.read_text())["instances_by_exit_status"]["failed"] == ["task_2"]
+
+
+def test_headless_renderer_with_many_workers(tmp_path, caplog):
+    report_path = tmp_path / "report.yaml"
+    manager = RunBatchProgressManager(
+        200, report_path, headless=True, refresh_per_second=100, log_interval=0.01, report_interval=0.01
+    )
+
+    def work(i_worker: int):
+        for i in range(20):
+            instance_id = f"task_{i_worker}_{i}"
+            manager.on_instance_start(instance_id)
+            for step in range(10):
+                manager.update_instance_status(instance_id, f"step {step}")
+            manager.on_instance_end(instance_id, "success" if i % 2 else "failed")
+
+    with caplog.at_level(logging.INFO, logger="minisweagent.progress"), manager:
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert manager.n_completed == 200
+    assert manager._spinner_tasks == {}
+    data = yaml.safe_load(report_path.read_text())
+    assert len(data["instances_by_exit_status"]["success"]) == 100
+    assert "200/200 instances completed (failed: 100, success: 100), 0 running" in caplog.text
+
+
+def test_report_permissions_and_failed_write(tmp_path):
+    report_path = tmp_path / "report.yaml"
+    manager = RunBatchProgressManager(1, report_path, headless=True)
+    manager.on_instance_end("task_1", "success")
+    manager._update()
+    umask = os.umask(0)
+    os.umask(umask)
+    assert stat.S_IMODE(report_path.stat().st_mode) == 0o666 & ~umask
+    with patch("minisweagent.run.extra.utils.batch_progress.os.replace", side_effect=OSError("disk full")):
+        with pytest.raises(OSError):
+            manager._save_overview_data(report_path)
+    assert [p.name for p in tmp_path.iterdir()] == ["report.yaml"]
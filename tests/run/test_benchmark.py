@@ -0,0 +1,47 @@
+import json
+import time
+
+from typer.testing import CliRunner
+
+from minisweagent.agents.default import DefaultAgent
+from minisweagent.run.extra.benchmark import OVERHEAD_PHASES, BenchmarkConfig, PhaseTimer, app, run_benchmark
+
+
+def test_run_benchmark():
+    original_step = DefaultAgent.__dict__["step"]
+    result = run_benchmark(BenchmarkConfig(workers=2, n_steps=3, latency=0.01, output_bytes=100))
+    assert result["config"]["n_instances"] == 4
+    assert result["n_steps"] == 12
+    assert result["steps_per_sec"] > 0
+    assert set(result["overhead_per_step"]) == set(OVERHEAD_PHASES) | {"total"}
+    assert all(value >= 0 for value in result["overhead_per_step"].values())
+    assert result["model_latency_per_step"] >= 0.01
+    assert result["peak_rss_mb"] > 0
+    # Instrumentation is removed again
+    assert DefaultAgent.__dict__["step"] is original_step
+
+
+def test_cli_saves_and_compares_results(tmp_path):
+    output = tmp_path / "benchmark.json"
+    args = ["-w", "1,2", "--steps", "2", "--latency", "0", "--no-isolate", "-o", str(output)]
+    result = CliRunner().invoke(app, args)
+    assert result.exit_code == 0, result.output
+    data = json.loads(output.read_text())
+    assert [r["config"]["workers"] for r in data["results"]] == [1, 2]
+    assert data["metadata"]["python"]
+
+    result = CliRunner().invoke(app, [*args[:-1], str(tmp_path / "new.json"), "--compare", str(output)])
+    assert result.exit_code == 0, result.output
+    assert "baseline" in result.output
+
+
+def test_nested_phases_are_not_counted_twice():
+    timer = PhaseTimer()
+    with timer.measure("step"):
+        with timer.measure("templating"):
+            time.sleep(0.01)
+    with timer.measure("templating"):
+        pass
+    assert timer.counts == {"step": 1, "templating": 2}
+    assert timer.nested_seconds["step"] >= 0.01
+    assert timer.seconds["step"] - timer.nested_seconds["step"] < 0.01
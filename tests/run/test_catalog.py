@@ -0,0 +1,199 @@
+import json
+import os
+import sqlite3
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+import typer
+
+from minisweagent.run.inspector import TrajectoryInspector
+from minisweagent.run.inspector import main as inspector_main
+from minisweagent.run.utils.catalog import TrajectoryCatalog
+from minisweagent.run.utils.compact import write_compact_traj
+
+
+def _write_traj(path: Path, *, exit_status: str, cost: float, n_steps: int) -> dict:
+    messages = [{"role": "user", "content": "task"}]
+    for i in range(n_steps):
+        messages += [{"role": "assistant", "content": f"step {i}"}, {"role": "user", "content": "output"}]
+    data = {
+        "info": {
+            "exit_status": exit_status,
+            "submission": "patch" if exit_status == "Submitted" else "",
+            "model_stats": {"instance_cost": cost, "api_calls": n_steps},
+            "config": {"model": {"model_name": "test-model"}},
+        },
+        "messages": messages,
+        "trajectory_format": "mini-swe-agent-1",
+        "instance_id": path.name.split(".")[0],
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == ".gz":
+        write_compact_traj(data, path)
+    else:
+        path.write_text(json.dumps(data))
+    return data
+
+
+@pytest.fixture
+def run_dir(tmp_path):
+    _write_traj(tmp_path / "a" / "a.traj.json", exit_status="Submitted", cost=0.5, n_steps=3)
+    _write_traj(tmp_path / "b" / "b.traj.json", exit_status="LimitsExceeded", cost=2.0, n_steps=10)
+    _write_traj(tmp_path / "c" / "c.traj.json.gz", exit_status="Submitted", cost=1.0, n_steps=5)
+    return tmp_path
+
+
+def test_catalog_metadata(run_dir):
+    with TrajectoryCatalog(run_dir) as catalog:
+        assert catalog.update() == {"updated": 3, "removed": 0}
+        entries = {entry.instance_id: entry for entry in catalog.query()}
+    assert entries["b"].exit_status == "LimitsExceeded"
+    assert entries["b"].cost == 2.0
+    assert entries["b"].n_steps == 10
+    assert entries["b"].has_submission is False
+    assert entries["c"].model_name == "test-model"
+    assert entries["c"].error is None
+
+
+def test_catalog_updates_incrementally(run_dir):
+    with TrajectoryCatalog(run_dir) as catalog:
+        catalog.update()
+        assert catalog.update() == {"updated": 0, "removed": 0}
+        _write_traj(run_dir / "a" / "a.traj.json", exit_status="Submitted", cost=0.7, n_steps=30)
+        os.utime(run_dir / "a" / "a.traj.json", (1, 1))
+        (run_dir / "b" / "b.traj.json").unlink()
+        (run_dir / "d").mkdir()
+        (run_dir / "d" / "d.traj.json").write_text("not json")
+        assert catalog.update() == {"updated": 2, "removed": 1}
+        entries = {entry.instance_id: entry for entry in catalog.query()}
+    assert entries["a"].n_steps == 30
+    assert entries["d"].error.startswith("JSONDecodeError")
+    # Reopening uses the saved catalog
+    with TrajectoryCatalog(run_dir) as catalog:
+        assert catalog.update() == {"updated": 0, "removed": 0}
+
+
+def test_catalog_query(run_dir):
+    with TrajectoryCatalog(run_dir) as catalog:
+        catalog.update()
+        assert [e.instance_id for e in catalog.query(sort_by="cost", descending=True)] == ["b", "c", "a"]
+        assert [e.instance_id for e in catalog.query(exit_status="!Submitted")] == ["b"]
+        assert [e.instance_id for e in catalog.query(exit_status="Submitted", sort_by="n_steps")] == ["a", "c"]
+        assert [e.instance_id for e in catalog.query(instance_id="[ab]")] == ["a", "b"]
+        with pytest.raises(ValueError, match="Cannot sort"):
+            catalog.query(sort_by="cost; DROP TABLE trajectories")
+
+
+@pytest.mark.slow
+async def test_inspector_jumps_to_failures(run_dir):
+    with TrajectoryCatalog(run_dir) as catalog:
+        catalog.update()
+        entries = catalog.query()
+        app = TrajectoryInspector([catalog.get_path(entry) for entry in entries], entries)
+    async with app.run_test() as pilot:
+        await pilot.pause(0.1)
+        assert "Submitted - $0.50 - 3 steps" in app.sub_title
+        await pilot.press("f")
+        assert app.i_trajectory == 1
+        assert "LimitsExceeded" in app.sub_title
+        await pilot.press("f")
+        assert app.i_trajectory == 1
+
+
+def test_inspector_filters_require_catalog(run_dir):
+    with patch("minisweagent.run.inspector.TrajectoryInspector.run") as mock_run:
+        with pytest.raises(typer.BadParameter, match="require the catalog"):
+            inspector_main(str(run_dir), exit_status="!Submitted", use_catalog=False)
+        with patch("minisweagent.run.inspector._query_catalog", side_effect=sqlite3.OperationalError("locked")):
+            with pytest.raises(typer.BadParameter, match="filtering and sorting require"):
+                inspector_main(str(run_dir), sort_by="cost")
+            # Without filters, the trajectories are searched instead
+            inspector_main(str(run_dir))
+        inspector_main(str(run_dir), use_catalog=False)
+    assert mock_run.call_count == 2
+
+
+def _observation(output: str, returncode: int = 0) -> dict:
+    arguments = {"output": {"output": output, "returncode": returncode}}
+    return {"type": "template", "name": "action_observation", "arguments": arguments}
+
+
+def _write_actions_traj(path: Path, steps: list[tuple[str, str]]) -> None:
+    messages = [{"role": "system", "content": "system"}, {"role": "user", "content": "task: pip install"}]
+    for action, output in steps:
+        messages += [
+            {"role": "assistant", "content": f"THOUGHT\n```bash\n{action}\n```"},
+            {"role": "user", "content": [_observation(output)]},
+        ]
+    data = {"info": {"exit_status": "Submitted"}, "messages": messages, "instance_id": path.name.split(".")[0]}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data))
+
+
+@pytest.fixture
+def search_dir(tmp_path):
+    _write_actions_traj(
+        tmp_path / "a" / "a.traj.json",
+        [("ls", "setup.py"), ("pip install -e .", "Successfully installed"), ("python t.py", "ModuleNotFoundError: x")],
+    )
+    _write_actions_traj(tmp_path / "b" / "b.traj.json", [("sed -i 's/a/b/' f.py", ""), ("PIP INSTALL numpy", "ok")])
+    return tmp_path
+
+
+def test_search(search_dir):
+    with TrajectoryCatalog(search_dir) as catalog:
+        catalog.update()
+        assert catalog.update_search_index() == {"updated": 2, "removed": 0}
+        hits = catalog.search("pip install", highlight=("[", "]"))
+        assert [(h.instance_id, h.step, h.kind) for h in hits] == [("a", 2, "action"), ("b", 2, "action")]
+        assert hits[0].snippet == "[pip install] -e ."
+        assert [(h.instance_id, h.step) for h in catalog.search("modulenotfound", kind="observation")] == [("a", 3)]
+        assert [h.instance_id for h in catalog.search("sed -i")] == ["b"]
+        assert [h.instance_id for h in catalog.search("pip install", instance_id="b*")] == ["b"]
+        assert len(catalog.search('"pip" NOT "numpy"', raw=True)) == 1
+        with pytest.raises(ValueError, match="three characters"):
+            catalog.search("ls")
+        with pytest.raises(ValueError, match="Invalid search query"):
+            catalog.search('"unterminated', raw=True)
+
+
+def test_search_observations_as_plain_text(tmp_path):
+    long_output = "line\n" * 100 + 'print("hi")\n' + "more output " * 100
+    _write_actions_traj(tmp_path / "a" / "a.traj.json", [("cat t.py", long_output)])
+    with TrajectoryCatalog(tmp_path) as catalog:
+        catalog.update()
+        catalog.update_search_index()
+        [hit] = catalog.search('print("hi")', highlight=("[", "]"))
+        assert hit.step == 1
+        assert '[print("hi")]\nmore output' in hit.snippet
+        assert hit.snippet.startswith("…") and hit.snippet.endswith("…")
+        assert len(hit.snippet) > 200
+        assert len(catalog.search("line\nline")) == 1
+        # Only the output is indexed, not the template arguments
+        assert catalog.search("returncode") == []
+
+
+def test_search_index_updates_incrementally(search_dir):
+    with TrajectoryCatalog(search_dir) as catalog:
+        catalog.update()
+        catalog.update_search_index()
+        assert catalog.update_search_index() == {"updated": 0, "removed": 0}
+        _write_actions_traj(search_dir / "a" / "a.traj.json", [("git diff", "")])
+        os.utime(search_dir / "a" / "a.traj.json", (1, 1))
+        (search_dir / "b" / "b.traj.json").unlink()
+        catalog.update()
+        assert catalog.update_search_index(workers=2) == {"updated": 1, "removed": 1}
+        assert catalog.search("pip install") == []
+        assert [h.step for h in catalog.search("git diff")] == [1]
+
+
+@pytest.mark.slow
+async def test_inspector_opens_at_start_steps(search_dir):
+    files = [search_dir / "a" / "a.traj.json", search_dir / "b" / "b.traj.json"]
+    app = TrajectoryInspector(files, start_steps=[3, 2])
+    async with app.run_test() as pilot:
+        await pilot.pause(0.1)
+        assert app.i_step == 3
+        await pilot.press("L")
+        assert app.i_step == 2
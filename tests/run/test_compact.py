@@ -0,0 +1,128 @@
+import json
+
+import pytest
+import yaml
+
+from minisweagent.agents.default import DefaultAgent
+from minisweagent.config import builtin_config_dir
+from minisweagent.environments.local import LocalEnvironment
+from minisweagent.models.test_models import DeterministicModel
+from minisweagent.run.utils.compact import (
+    BlobStore,
+    get_repeated_strings,
+    pack,
+    read_compact_traj,
+    unpack,
+    write_compact_traj,
+)
+from minisweagent.run.utils.save import convert_traj, find_trajectories, load_traj, save_traj
+
+
+def _get_traj(instance_id: str) -> dict:
+    system_prompt = "You are a helpful assistant. " * 100
+    observation = {"type": "template", "name": "action_observation", "arguments": {"output": {"output": "x" * 5000}}}
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"Solve {instance_id}"},
+        {"role": "assistant", "content": "ls"},
+        {"role": "user", "content": [observation]},
+        {"role": "assistant", "content": "ls"},
+        {"role": "user", "content": [observation]},
+    ]
+    config = {"agent": {"system_template": system_prompt, "step_limit": 0}, "model": {"model_name": "test"}}
+    return {
+        "info": {"exit_status": "Submitted", "config": config},
+        "messages": messages,
+        "trajectory_format": "mini-swe-agent-1",
+        "instance_id": instance_id,
+    }
+
+
+def test_pack_roundtrip(tmp_path):
+    store = BlobStore(tmp_path)
+    data = _get_traj("a")
+    packed = pack(data, store, strings=get_repeated_strings(data))
+    # The observation and system prompt (also in the config) are repeated, so they are stored once
+    assert "x" * 5000 not in json.dumps(packed)
+    assert len([p for p in tmp_path.rglob("*") if p.is_file()]) == 2
+    assert unpack(packed, store) == data
+
+
+def test_pack_escapes_reference_like_dicts(tmp_path):
+    store = BlobStore(tmp_path)
+    data = {"a": {"$blob": "not a key"}, "b": [{"$json": {"$escape": 1}}], "c": {"$blob": 1, "other": 2}}
+    packed = pack(data, store)
+    assert unpack(packed, store) == data
+    assert unpack(json.loads(json.dumps(packed)), store) == data
+
+
+@pytest.mark.parametrize("suffix", [".gz", ".zst"])
+def test_inline_blobs_roundtrip(tmp_path, suffix):
+    if suffix == ".zst":
+        pytest.importorskip("zstandard")
+    data = _get_traj("a")
+    path = tmp_path / f"a.traj.json{suffix}"
+    write_compact_traj(data, path)
+    assert read_compact_traj(path) == data
+    assert path.stat().st_size < len(json.dumps(data, indent=2)) / 10
+
+
+def test_shared_blobs_are_deduplicated_across_trajectories(tmp_path):
+    blob_dir = tmp_path / "blobs"
+    for i in range(5):
+        write_compact_traj(_get_traj(f"instance_{i}"), tmp_path / f"instance_{i}.traj.json.gz", blob_dir=blob_dir)
+    # The system prompt, config and the observation that all instances share are stored once for the run
+    assert len([p for p in blob_dir.rglob("*") if p.is_file()]) == 3
+    assert read_compact_traj(tmp_path / "instance_3.traj.json.gz") == _get_traj("instance_3")
+
+
+def test_unique_content_stays_in_the_file(tmp_path):
+    blob_dir = tmp_path / "blobs"
+    total_size = plain_size = 0
+    for i in range(20):
+        data = _get_traj(f"instance_{i}")
+        data["messages"] += [{"role": "user", "content": f"observation {i} {j} " * 100} for j in range(10)]
+        path = tmp_path / f"instance_{i}.traj.json.gz"
+        write_compact_traj(data, path, blob_dir=blob_dir)
+        assert read_compact_traj(path) == data
+        total_size += path.stat().st_size
+        plain_size += len(json.dumps(data, indent=2))
+    blobs = [p for p in blob_dir.rglob("*") if p.is_file()]
+    assert len(blobs) == 3
+    assert total_size + sum(p.stat().st_size for p in blobs) < plain_size / 10
+
+
+def test_run_of_default_agent(tmp_path):
+    """Trajectories of the same config share the templates (in the instance template arguments) and observations."""
+    config = yaml.safe_load((builtin_config_dir / "extra" / "swebench.yaml").read_text())["agent"]
+    outputs = [
+        "THOUGHT: List the numbers\n\n```bash\nseq 1000\n```",
+        "THOUGHT: Done\n\n```bash\necho COMPLETE_TASK_AND_SUBMIT_FINAL_OUTPUT\n```",
+    ]
+    blob_dir = tmp_path / "blobs"
+    compact_size = plain_size = 0
+    for i in range(10):
+        agent = DefaultAgent(DeterministicModel(outputs=outputs), LocalEnvironment(), **config)
+        assert agent.run(f"Fix issue {i}")[0] == "Submitted"
+        json_path, compact_path = tmp_path / f"{i}.traj.json", tmp_path / f"{i}.traj.json.gz"
+        save_traj(agent, json_path, exit_status="Submitted", print_path=False)
+        save_traj(agent, compact_path, exit_status="Submitted", print_path=False, blob_dir=blob_dir)
+        assert load_traj(compact_path) == json.loads(json_path.read_text())
+        plain_size += json_path.stat().st_size
+        compact_size += compact_path.stat().st_size
+    compact_size += sum(p.stat().st_size for p in blob_dir.rglob("*") if p.is_file())
+    assert compact_size < plain_size / 10
+
+
+def test_save_traj_compact(tmp_path):
+    agent = DefaultAgent(DeterministicModel(outputs=["echo 'test'"]), LocalEnvironment())
+    agent.add_message("system", "test system message " * 100)
+    json_path, compact_path = tmp_path / "a.traj.json", tmp_path / "a" / "a.traj.json.gz"
+    for path in [json_path, compact_path]:
+        save_traj(agent, path, exit_status="Submitted", print_path=False, blob_dir=tmp_path / "blobs")
+    assert load_traj(compact_path) == json.loads(json_path.read_text())
+    assert set(find_trajectories(tmp_path)) == {json_path, compact_path}
+
+    converted_path = tmp_path / "converted.traj.json"
+    convert_traj(compact_path, converted_path)
+    assert json.loads(converted_path.read_text()) == json.loads(json_path.read_text())
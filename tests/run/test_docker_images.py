@@ -0,0 +1,172 @@
+import concurrent.futures
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from minisweagent.run.extra.swebench import get_image_manager
+from minisweagent.run.extra.utils.docker_images import DockerImageManager
+
+FAKE_DOCKER = textwrap.dedent(
+    """\
+    import os
+    import sys
+    import time
+    from pathlib import Path
+    from urllib.parse import quote, unquote
+
+    state = Path(os.environ["FAKE_DOCKER_STATE"])
+    images = state / "images"
+    images.mkdir(exist_ok=True)
+    args = sys.argv[1:]
+    with (state / "calls.log").open("a") as f:
+        f.write(" ".join(args) + "\\n")
+
+    if args[0] == "pull":
+        time.sleep(float(os.environ.get("FAKE_DOCKER_PULL_TIME", "0")))
+        if "missing" in args[1]:
+            sys.exit("pull access denied")
+        (images / quote(args[1], safe="")).write_text(os.environ.get("FAKE_DOCKER_IMAGE_SIZE", "1000000000"))
+    elif args[:2] == ["image", "inspect"]:
+        path = images / quote(args[-1], safe="")
+        if not path.exists():
+            sys.exit("No such image")
+        print(path.read_text())
+    elif args[0] == "images":
+        for path in images.iterdir():
+            print(unquote(path.name))
+    elif args[0] == "rmi":
+        path = images / quote(args[1], safe="")
+        if not path.exists() or (state / "locked").exists():
+            sys.exit("cannot remove image")
+        path.unlink()
+    """
+)
+
+
+@pytest.fixture
+def fake_docker(tmp_path, monkeypatch):
+    """Fake docker executable that keeps track of images in a directory and logs all calls."""
+    script = tmp_path / "fake_docker.py"
+    script.write_text(FAKE_DOCKER)
+    executable = tmp_path / "docker"
+    executable.write_text(f'#!/bin/sh\nexec {sys.executable} {script} "$@"\n')
+    executable.chmod(0o755)
+    monkeypatch.setenv("FAKE_DOCKER_STATE", str(tmp_path))
+    return executable
+
+
+def _calls(fake_docker, command: str) -> list[str]:
+    log = fake_docker.parent / "calls.log"
+    if not log.exists():
+        return []
+    return [line for line in log.read_text().splitlines() if line.startswith(command)]
+
+
+def _local_images(fake_docker) -> set[str]:
+    output = subprocess.run([fake_docker, "images"], capture_output=True, text=True, check=True).stdout
+    return set(output.split())
+
+
+def _image(i: int) -> str:
+    return f"swebench/sweb.eval.x86_64.repo_{i}:latest"
+
+
+def test_concurrent_acquires_pull_once(fake_docker, monkeypatch):
+    monkeypatch.setenv("FAKE_DOCKER_PULL_TIME", "0.5")
+    manager = DockerImageManager(executable=str(fake_docker), prefetch=0)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: manager.acquire(_image(0)), range(8)))
+    assert len(_calls(fake_docker, "pull")) == 1
+    assert _image(0) in _local_images(fake_docker)
+    assert manager._images[_image(0)].in_use == 8
+    manager.shutdown()
+
+
+def test_existing_image_is_not_pulled(fake_docker):
+    manager = DockerImageManager(executable=str(fake_docker), prefetch=0)
+    subprocess.run([fake_docker, "pull", _image(0)], check=True)
+    manager.acquire(_image(0))
+    assert len(_calls(fake_docker, "pull")) == 1
+    assert manager.disk_usage == 1_000_000_000
+    manager.shutdown()
+
+
+def test_failed_pull_raises_and_can_be_retried(fake_docker):
+    manager = DockerImageManager(executable=str(fake_docker), prefetch=0)
+    with pytest.raises(subprocess.CalledProcessError):
+        manager.acquire("swebench/sweb.eval.missing:latest")
+    assert manager._images["swebench/sweb.eval.missing:latest"].in_use == 0
+    with pytest.raises(subprocess.CalledProcessError):
+        manager.acquire("swebench/sweb.eval.missing:latest")
+    assert len(_calls(fake_docker, "pull")) == 2
+    manager.shutdown()
+
+
+def test_prefetch_upcoming_images(fake_docker):
+    manager = DockerImageManager(executable=str(fake_docker), prefetch=2, max_parallel_pulls=2)
+    manager.schedule([_image(i) for i in range(5)])
+    manager.acquire(_image(0))
+    concurrent.futures.wait([manager.pull(_image(i)) for i in range(3)])
+    assert _local_images(fake_docker) == {_image(0), _image(1), _image(2)}
+    manager.acquire(_image(1))
+    concurrent.futures.wait([manager.pull(_image(3))])
+    assert _image(3) in _local_images(fake_docker)
+    assert _image(4) not in _local_images(fake_docker)
+    manager.shutdown()
+
+
+def test_evicts_least_recently_used_images(fake_docker):
+    manager = DockerImageManager(executable=str(fake_docker), prefetch=0, disk_budget_gb=2.5)
+    for i in range(3):
+        manager.acquire(_image(i))
+    # all images are in use, so nothing can be evicted
+    assert len(_local_images(fake_docker)) == 3
+    manager.release(_image(1))
+    manager.release(_image(0))
+    assert _local_images(fake_docker) == {_image(0), _image(2)}
+    assert manager.disk_usage == 2_000_000_000
+    manager.shutdown()
+
+
+def test_eviction_respects_pattern_and_failures(fake_docker):
+    manager = DockerImageManager(executable=str(fake_docker), prefetch=0, disk_budget_gb=0.5)
+    manager.acquire("python:3.11")
+    manager.release("python:3.11")
+    assert "python:3.11" in _local_images(fake_docker)
+    (fake_docker.parent / "locked").touch()
+    manager.acquire(_image(0))
+    manager.release(_image(0))
+    assert _image(0) in manager._images
+    (fake_docker.parent / "locked").unlink()
+    manager.evict()
+    assert _local_images(fake_docker) == {"python:3.11"}
+    manager.shutdown()
+
+
+def test_scan_tracks_existing_images(fake_docker):
+    for i in range(3):
+        subprocess.run([fake_docker, "pull", _image(i)], check=True)
+    subprocess.run([fake_docker, "pull", "python:3.11"], check=True)
+    manager = DockerImageManager(executable=str(fake_docker), disk_budget_gb=1.5)
+    manager.scan()
+    assert len(_local_images(fake_docker)) == 2
+    assert "python:3.11" in _local_images(fake_docker)
+    manager.shutdown()
+
+
+def test_get_image_manager(fake_docker):
+    instances = [{"instance_id": "a__b-1"}]
+    assert get_image_manager({}, instances) is None
+    config = {
+        "run": {"image_manager": {"enabled": True, "prefetch": 0}},
+        "environment": {"executable": str(fake_docker)},
+    }
+    manager = get_image_manager(config, instances)
+    assert manager is not None
+    assert manager.config.executable == str(fake_docker)
+    assert manager._queue == ["docker.io/swebench/sweb.eval.x86_64.a_1776_b-1:latest"]
+    manager.shutdown()
+    config["environment"]["environment_class"] = "singularity"
+    assert get_image_manager(config, instances) is None
@@ -377,3 +377,17 @@ def test_main_with_current_directory_default(mock_run, temp_trajectory_files):
         mock_run.assert_called_once()
     finally:
         os.chdir(original_cwd)
+
+
+def test_trajectory_inspector_streaming_format(tmp_path):
+    path = tmp_path / "instance.traj.jsonl"
+    records = [
+        {"type": "header", "trajectory_format": "mini-swe-agent-stream-1", "config": {}},
+        {"type": "message", "message": {"role": "user", "content": "task"}},
+        {"type": "message", "message": {"role": "assistant", "content": "step 1"}},
+        {"type": "message", "message": {"role": "user", "content": "output"}},
+    ]
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+    app = TrajectoryInspector([path])
+    assert len(app.messages) == 3
+    assert app.n_steps == 2
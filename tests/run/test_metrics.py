@@ -0,0 +1,73 @@
+import os
+import urllib.error
+import urllib.request
+from unittest.mock import patch
+
+import pytest
+
+from minisweagent.models.utils.stats import GlobalModelStats
+from minisweagent.run.extra.utils.metrics import BatchMetrics, Counter, Histogram, MetricsServer
+
+
+@pytest.fixture
+def model_stats():
+    with patch.dict(os.environ, {"MSWEA_SILENT_STARTUP": "1"}, clear=True):
+        stats = GlobalModelStats()
+    with patch("minisweagent.run.extra.utils.metrics.GLOBAL_MODEL_STATS", stats):
+        yield stats
+
+
+def test_counter_render():
+    counter = Counter("requests_total", "Requests", ("status",))
+    counter.inc(status="ok")
+    counter.inc(2, status='say "hi"\n')
+    assert counter.get(status="ok") == 1
+    assert counter.render() == (
+        "# HELP requests_total Requests\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{status="ok"} 1\n'
+        'requests_total{status="say \\"hi\\"\\n"} 2\n'
+    )
+    with pytest.raises(ValueError):
+        counter.inc(other="x")
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency", buckets=(1, 5))
+    for value in [0.5, 1, 3, 10]:
+        histogram.observe(value)
+    lines = histogram.render().splitlines()[2:]
+    assert lines == [
+        'latency_seconds_bucket{le="1"} 2',
+        'latency_seconds_bucket{le="5"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        "latency_seconds_sum 14.5",
+        "latency_seconds_count 4",
+    ]
+    with pytest.raises(RuntimeError), histogram.time():
+        raise RuntimeError
+    assert histogram.get_count() == 5
+
+
+def test_render_includes_model_stats(model_stats):
+    model_stats.add(0.5, model_name="gpt", input_tokens=10, output_tokens=2)
+    model_stats.add_error("RateLimitError")
+    model_stats.add_error("APIConnectionError")
+    text = BatchMetrics().render()
+    assert "# TYPE mswea_instances_running gauge" in text
+    assert 'mswea_model_cost_dollars_total{model="gpt"} 0.5' in text
+    assert 'mswea_model_tokens_total{model="gpt",direction="input"} 10' in text
+    assert 'mswea_model_errors_total{error_type="RateLimitError"} 1' in text
+    assert "# TYPE mswea_model_rate_limit_errors_total counter" in text
+    assert "mswea_model_rate_limit_errors_total 1" in text
+
+
+def test_server(model_stats):
+    metrics = BatchMetrics()
+    metrics.instances_completed.inc(exit_status="Submitted")
+    with MetricsServer(metrics=metrics) as server:
+        with urllib.request.urlopen(server.url, timeout=10) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert 'mswea_instances_completed_total{exit_status="Submitted"} 1' in response.read().decode()
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(server.url.replace("/metrics", "/other"), timeout=10)
@@ -0,0 +1,105 @@
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from minisweagent.run.extra.mock_server import MockLLMServer
+
+
+@pytest.fixture
+def server():
+    with MockLLMServer(outputs=["first", "second"], seed=0) as server:
+        yield server
+
+
+def _post(server: MockLLMServer, messages: list[dict], **kwargs) -> requests.Response:
+    payload = {"model": "mock", "messages": messages, **kwargs}
+    return requests.post(f"{server.url}/chat/completions", json=payload, timeout=10)
+
+
+def test_replays_outputs_by_conversation_length(server):
+    messages = [{"role": "user", "content": "task"}]
+    response = _post(server, messages).json()
+    assert response["choices"][0]["message"]["content"] == "first"
+    usage = response["usage"]
+    assert usage["total_tokens"] == usage["prompt_tokens"] + usage["completion_tokens"]
+    assert usage["cost"] > 0
+    messages += [{"role": "assistant", "content": "first"}, {"role": "user", "content": "obs"}]
+    assert _post(server, messages).json()["choices"][0]["message"]["content"] == "second"
+    messages += [{"role": "assistant", "content": "second"}, {"role": "user", "content": "obs"}]
+    assert _post(server, messages).json()["choices"][0]["message"]["content"] == "second"
+    assert requests.get(f"{server.url}/stats", timeout=10).json()["n_completions"] == 3
+
+
+def test_replays_trajectories(tmp_path):
+    path = tmp_path / "run.traj.json"
+    messages = [
+        {"role": "user", "content": "task"},
+        {"role": "assistant", "content": [{"type": "text", "text": "replayed"}]},
+    ]
+    path.write_text(json.dumps({"messages": messages}))
+    with MockLLMServer(trajectories=[path]) as server:
+        assert _post(server, messages[:1]).json()["choices"][0]["message"]["content"] == "replayed"
+
+
+def test_streaming(server):
+    response = _post(server, [{"role": "user", "content": "x"}], stream=True, stream_options={"include_usage": True})
+    events = [line.removeprefix("data: ") for line in response.text.splitlines() if line.startswith("data: ")]
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(event) for event in events[:-1]]
+    assert "".join(c["choices"][0]["delta"].get("content", "") for c in chunks if c["choices"]) == "first"
+    assert chunks[-1]["usage"]["completion_tokens"] > 0
+
+
+@pytest.mark.parametrize(("kwargs", "status"), [({"error_rate_429": 1.0}, 429), ({"error_rate_5xx": 1.0}, 503)])
+def test_error_injection(kwargs, status):
+    with MockLLMServer(error_status_codes=[503], retry_after=2.5, **kwargs) as server:
+        response = _post(server, [{"role": "user", "content": "x"}])
+        assert response.status_code == status
+        assert response.headers["Retry-After"] == "2.5"
+        assert server.stats["n_errors"] == 1
+
+
+@pytest.mark.parametrize("latency", ["constant", "uniform", "exponential", "lognormal"])
+def test_latency_distributions(latency):
+    server = MockLLMServer(latency=latency, latency_mean=2.0, latency_spread=0.5, seed=1)
+    samples = [server.sample_latency() for _ in range(2000)]
+    assert all(sample >= 0 for sample in samples)
+    assert sum(samples) / len(samples) == pytest.approx(2.0, rel=0.1)
+
+
+def test_openrouter_model_against_server(server, reset_global_stats):
+    from minisweagent.models.openrouter_model import OpenRouterModel
+
+    with patch.dict(os.environ, {"OPENROUTER_API_URL": f"{server.url}/chat/completions"}):
+        model = OpenRouterModel(model_name="mock")
+    assert model.query([{"role": "user", "content": "task"}])["content"] == "first"
+    assert model.cost > 0
+
+
+def test_litellm_model_against_server(server, reset_global_stats):
+    from minisweagent.models.litellm_model import LitellmModel
+
+    model = LitellmModel(model_name="openai/mock", model_kwargs={"api_base": server.url, "api_key": "mock"})
+    with patch.object(model._cost_calculator, "get_cost", return_value=0.0):
+        assert model.query([{"role": "user", "content": "task"}])["content"] == "first"
+
+
+def test_responses_api_keeps_conversation_state(server):
+    url = f"{server.url}/responses"
+    first = requests.post(url, json={"model": "mock", "input": [{"role": "user", "content": "task"}]}, timeout=10)
+    assert first.json()["output"][0]["content"][0]["text"] == "first"
+    payload = {
+        "model": "mock",
+        "input": [{"role": "user", "content": "obs"}],
+        "previous_response_id": first.json()["id"],
+    }
+    second = requests.post(url, json=payload, timeout=10).json()
+    assert second["output"][0]["content"][0]["text"] == "second"
+    assert second["usage"]["input_tokens"] > first.json()["usage"]["input_tokens"]
+    payload["previous_response_id"] = "resp_unknown"
+    response = requests.post(url, json=payload, timeout=10)
+    assert response.status_code == 404
+    assert response.json()["error"]["code"] == "previous_response_not_found"
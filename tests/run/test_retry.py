@@ -0,0 +1,178 @@
+import json
+import subprocess
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from minisweagent.environments.local import LocalEnvironment
+from minisweagent.models.test_models import DeterministicModel
+from minisweagent.run.extra.swebench import process_instance
+from minisweagent.run.extra.utils.retry import (
+    EnvironmentStartupError,
+    RetryBudget,
+    RetryConfig,
+    classify_failure,
+    get_backoff,
+    get_environment_config,
+)
+
+
+class APIConnectionError(Exception):
+    """Stand-in for litellm's exception of the same name."""
+
+
+@pytest.mark.parametrize(
+    ("exception", "phase", "expected"),
+    [
+        (RuntimeError("boom"), "environment", "infrastructure"),
+        (subprocess.TimeoutExpired("docker run", 120), "agent", "infrastructure"),
+        (EnvironmentStartupError("startup failed"), "agent", "infrastructure"),
+        (APIConnectionError("no connection"), "agent", "infrastructure"),
+        (RuntimeError("boom"), "agent", "agent"),
+        (ValueError("bad value"), "agent", "agent"),
+    ],
+)
+def test_classify_failure(exception, phase, expected):
+    assert classify_failure(exception, phase=phase, config=RetryConfig()) == expected
+
+
+def test_classify_failure_custom_exceptions():
+    config = RetryConfig(infrastructure_exceptions=["ValueError"])
+    assert classify_failure(ValueError(), phase="agent", config=config) == "infrastructure"
+    assert classify_failure(subprocess.TimeoutExpired("x", 1), phase="agent", config=config) == "agent"
+
+
+def test_get_backoff():
+    config = RetryConfig(backoff_base=2, backoff_max=10, backoff_jitter=0)
+    assert [get_backoff(attempt, config) for attempt in range(2, 7)] == [2, 4, 8, 10, 10]
+
+
+def test_get_backoff_jitter():
+    config = RetryConfig(backoff_base=10, backoff_jitter=0.5)
+    for _ in range(20):
+        assert 10 <= get_backoff(2, config) <= 15
+
+
+def test_get_environment_config():
+    config = RetryConfig(environment_overrides=[{"executable": "docker-b"}, {"executable": "docker-c"}])
+    env_config = {"executable": "docker", "cwd": "/testbed"}
+    assert get_environment_config(env_config, 1, config) == env_config
+    assert get_environment_config(env_config, 2, config) == {"executable": "docker-b", "cwd": "/testbed"}
+    assert get_environment_config(env_config, 3, config)["executable"] == "docker-c"
+    assert get_environment_config(env_config, 4, config)["executable"] == "docker-b"
+    assert env_config["executable"] == "docker"
+
+
+def test_retry_budget():
+    budget = RetryBudget(2)
+    assert budget.remaining == 2
+    assert budget.acquire()
+    assert budget.acquire()
+    assert not budget.acquire()
+    assert budget.used == 2
+    assert budget.remaining == 0
+
+
+def test_retry_budget_unlimited():
+    budget = RetryBudget(0)
+    assert all(budget.acquire() for _ in range(100))
+    assert budget.remaining is None
+
+
+def _get_config(**retry_kwargs) -> dict:
+    return {
+        "model": {"model_class": "deterministic"},
+        "run": {"retry": {"backoff_base": 0.0, "backoff_jitter": 0, **retry_kwargs}},
+    }
+
+
+def _run(tmp_path, config, get_env, retry_budget=None):
+    instance = {"instance_id": "test__repo-1", "problem_statement": "Solve it"}
+    progress_manager = MagicMock()
+
+    def get_model(*args, **kwargs):
+        return DeterministicModel(outputs=["```bash\necho COMPLETE_TASK_AND_SUBMIT_FINAL_OUTPUT && echo done\n```"])
+
+    with (
+        patch("minisweagent.run.extra.swebench.get_sb_environment", side_effect=get_env),
+        patch("minisweagent.run.extra.swebench.get_model", side_effect=get_model),
+    ):
+        process_instance(instance, tmp_path, config, progress_manager, retry_budget)
+    traj = json.loads((tmp_path / "test__repo-1" / "test__repo-1.traj.json").read_text())
+    return traj, progress_manager
+
+
+def test_process_instance_retries_environment_errors(tmp_path, reset_global_stats):
+    attempts = []
+
+    def get_env(config, instance):
+        attempts.append(config["environment"])
+        if len(attempts) < 3:
+            raise subprocess.TimeoutExpired("docker run", 120)
+        return LocalEnvironment()
+
+    traj, progress_manager = _run(tmp_path, _get_config(), get_env)
+    assert len(attempts) == 3
+    assert traj["info"]["exit_status"] == "Submitted"
+    assert traj["info"]["submission"] == "done\n"
+    assert [r["attempt"] for r in traj["info"]["retries"]] == [1, 2]
+    assert all(r["phase"] == "environment" for r in traj["info"]["retries"])
+    assert all(r["exit_status"] == "TimeoutExpired" for r in traj["info"]["retries"])
+    progress_manager.on_instance_start.assert_called_once()
+    progress_manager.on_instance_end.assert_called_once_with("test__repo-1", "Submitted")
+
+
+def test_process_instance_gives_up_after_max_attempts(tmp_path):
+    def get_env(config, instance):
+        raise EnvironmentStartupError("startup failed")
+
+    traj, _ = _run(tmp_path, _get_config(max_attempts=2), get_env)
+    assert traj["info"]["exit_status"] == "EnvironmentStartupError"
+    assert traj["info"]["failure_category"] == "infrastructure"
+    assert len(traj["info"]["retries"]) == 1
+    assert json.loads((tmp_path / "preds.json").read_text())["test__repo-1"]["model_patch"] == "startup failed"
+
+
+def test_process_instance_respects_budget(tmp_path):
+    def get_env(config, instance):
+        raise EnvironmentStartupError("startup failed")
+
+    budget = RetryBudget(1)
+    traj, _ = _run(tmp_path, _get_config(max_attempts=5), get_env, retry_budget=budget)
+    assert len(traj["info"]["retries"]) == 1
+    assert budget.remaining == 0
+
+
+def test_process_instance_does_not_retry_agent_errors(tmp_path):
+    calls = []
+
+    def get_env(config, instance):
+        calls.append(1)
+        env = MagicMock()
+        env.execute.side_effect = ValueError("agent broke something")
+        env.get_template_vars.return_value = {}
+        env.config = {}
+        return env
+
+    traj, _ = _run(tmp_path, _get_config(), get_env)
+    assert len(calls) == 1
+    assert traj["info"]["exit_status"] == "ValueError"
+    assert traj["info"]["failure_category"] == "agent"
+    assert "retries" not in traj["info"]
+
+
+def test_process_instance_uses_environment_overrides(tmp_path):
+    executables = []
+
+    def get_env(config, instance):
+        executables.append(config["environment"].get("executable"))
+        if len(executables) == 1:
+            raise subprocess.CalledProcessError(1, "docker run")
+        return LocalEnvironment()
+
+    config = _get_config(environment_overrides=[{"executable": "other-docker"}])
+    config["environment"] = {"executable": "docker"}
+    traj, _ = _run(tmp_path, config, get_env)
+    assert executables == ["docker", "other-docker"]
+    assert config["environment"] == {"executable": "docker"}
+    assert traj["info"]["exit_status"] == "Submitted"
@@ -5,7 +5,14 @@ from pathlib import Path
 from minisweagent.agents.default import DefaultAgent
 from minisweagent.environments.local import LocalEnvironment
 from minisweagent.models.test_models import DeterministicModel
-from minisweagent.run.utils.save import save_traj
+from minisweagent.run.utils.save import (
+    TrajectoryWriter,
+    convert_traj,
+    iter_traj_messages,
+    load_traj,
+    save_traj,
+    start_traj_stream,
+)
 
 
 def test_save_traj_includes_class_names():
@@ -73,3 +80,56 @@ def test_save_traj_with_none_agent():
 
         # Verify config is not present when agent is None
         assert "config" not in saved_data["info"]
+
+
+def _get_agent() -> DefaultAgent:
+    return DefaultAgent(DeterministicModel(outputs=["echo 'test'"]), LocalEnvironment())
+
+
+def test_streaming_traj_appends_messages_as_they_are_added(tmp_path):
+    agent = _get_agent()
+    path = tmp_path / "instance" / "instance.traj.jsonl"
+    start_traj_stream(agent, path, instance_id="instance")
+    agent.add_message("system", "test system message")
+    agent.add_message("user", "test user message")
+
+    # Readable before the run has finished (e.g., after a crash)
+    assert [m["content"] for m in iter_traj_messages(path)] == ["test system message", "test user message"]
+    data = load_traj(path)
+    assert data["info"]["exit_status"] is None
+    assert data["info"]["config"]["agent_type"] == "minisweagent.agents.default.DefaultAgent"
+
+    save_traj(agent, path, exit_status="Submitted", result="test result", print_path=False)
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [r["type"] for r in records] == ["header", "message", "message", "footer"]
+    assert records[0]["trajectory_format"] == "mini-swe-agent-stream-1"
+    assert records[-1]["info"]["exit_status"] == "Submitted"
+    assert "config" not in records[-1]["info"]
+    assert agent.trajectory_writer.closed
+
+
+def test_streaming_traj_converts_to_json_format(tmp_path):
+    agent = _get_agent()
+    agent.add_message("user", "test user message")
+    json_path, jsonl_path = tmp_path / "a.traj.json", tmp_path / "b.traj.jsonl"
+    # Without `start_traj_stream`, the whole trajectory is written at the end
+    for path in [json_path, jsonl_path]:
+        save_traj(agent, path, exit_status="Submitted", result="patch", print_path=False, instance_id="x")
+    converted_path = tmp_path / "converted.traj.json"
+    convert_traj(jsonl_path, converted_path)
+    converted = json.loads(converted_path.read_text())
+    expected = json.loads(json_path.read_text())
+    assert converted["info"].pop("config") == expected["info"].pop("config")
+    assert converted == expected
+    assert load_traj(json_path) == load_traj(converted_path)
+
+
+def test_streaming_traj_skips_truncated_last_record(tmp_path):
+    path = tmp_path / "crashed.traj.jsonl"
+    writer = TrajectoryWriter(path)
+    writer.write_header()
+    writer.add_message({"role": "user", "content": "task"})
+    writer.close()
+    with path.open("a") as f:
+        f.write('{"type": "message", "mess')
+    assert list(iter_traj_messages(path)) == [{"role": "user", "content": "task"}]
@@ -0,0 +1,53 @@
+import pytest
+import typer
+from rich.console import Console
+
+from minisweagent.run.extra import search
+from minisweagent.run.extra.search import index, query
+from tests.run.test_catalog import _write_actions_traj
+
+
+def test_search_cli(tmp_path, capsys, monkeypatch):
+    monkeypatch.setattr(search, "console", Console(width=200, highlight=False))
+    _write_actions_traj(tmp_path / "a" / "a.traj.json", [("pip install numpy", "ok"), ("pytest", "1 failed")])
+    index(tmp_path, workers=1, catalog_path=None)
+    assert "Indexed 1 trajectories (1 updated, 0 removed)" in capsys.readouterr().out
+
+    query(
+        "[numpy]",
+        tmp_path,
+        kind=None,
+        instance_id=None,
+        limit=10,
+        raw=False,
+        open_inspector=False,
+        workers=1,
+        catalog_path=None,
+    )
+    assert "0 hits" in capsys.readouterr().out
+    query(
+        "failed",
+        tmp_path,
+        kind=None,
+        instance_id=None,
+        limit=10,
+        raw=False,
+        open_inspector=False,
+        workers=1,
+        catalog_path=None,
+    )
+    out = capsys.readouterr().out
+    assert "1 failed" in out
+    assert "1 hits in 1 trajectories" in out
+    with pytest.raises(typer.BadParameter, match="Unknown kind"):
+        query(
+            "pip",
+            tmp_path,
+            kind="thought",
+            instance_id=None,
+            limit=10,
+            raw=False,
+            open_inspector=False,
+            workers=1,
+            catalog_path=None,
+        )
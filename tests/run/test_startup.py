@@ -0,0 +1,70 @@
+"""Startup time: Entry points must not import heavy dependencies that they don't use.
+
+The import time itself is only checked with `MSWEA_RUN_BENCHMARKS=1`, because it depends on the machine load.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ["litellm", "textual", "prompt_toolkit", "datasets", "tensorzero", "openai"]
+
+IMPORT_TIME_BUDGET_S = 1.5
+"""Cumulative import time of `minisweagent.run.mini` (about 0.2s at the time of writing)."""
+
+
+def _run_python(code: str, *args: str) -> subprocess.CompletedProcess:
+    env = os.environ | {"MSWEA_SILENT_STARTUP": "1", "MSWEA_CONFIGURED": "true"}
+    return subprocess.run(
+        [sys.executable, *args, "-c", code], capture_output=True, text=True, env=env, check=True, timeout=60
+    )
+
+
+def _get_loaded_heavy_modules(code: str) -> set[str]:
+    code += f"\nimport json, sys\nprint(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    return set(json.loads(_run_python(code).stdout.strip().splitlines()[-1]))
+
+
+@pytest.mark.parametrize(
+    ("code", "allowed"),
+    [
+        ("import minisweagent", set()),
+        ("import minisweagent.run.mini", set()),
+        ("import minisweagent.run.mini_extra", set()),
+        ("import minisweagent.run.extra.config", set()),
+        ("import minisweagent.run.extra.swebench", set()),
+        ("import minisweagent.run.inspector", {"textual"}),
+        ("import minisweagent.models.litellm_model", set()),
+        (
+            "from minisweagent.run.mini import app\n"
+            "from typer.testing import CliRunner\n"
+            "assert CliRunner().invoke(app, ['--help']).exit_code == 0",
+            set(),
+        ),
+        (
+            "from minisweagent.agents.default import DefaultAgent\n"
+            "from minisweagent.environments.local import LocalEnvironment\n"
+            "from minisweagent.models import get_model\n"
+            "model = get_model('test', {'model_class': 'deterministic', 'outputs': ['```bash\\necho hi\\n```']})\n"
+            "DefaultAgent(model, LocalEnvironment(), step_limit=1).run('task')",
+            set(),
+        ),
+    ],
+)
+def test_no_heavy_imports(code, allowed):
+    assert _get_loaded_heavy_modules(code) <= allowed
+
+
+@pytest.mark.skipif(
+    not os.getenv("MSWEA_RUN_BENCHMARKS"), reason="Wall-clock benchmark, set MSWEA_RUN_BENCHMARKS=1 to run it"
+)
+def test_import_time_budget():
+    import_times = []
+    for _ in range(3):
+        stderr = _run_python("import minisweagent.run.mini", "-X", "importtime").stderr
+        line = next(line for line in stderr.splitlines() if line.endswith("| minisweagent.run.mini"))
+        import_times.append(int(line.split("|")[1]) / 1e6)
+    assert min(import_times) < IMPORT_TIME_BUDGET_S
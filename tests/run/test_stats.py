@@ -0,0 +1,104 @@
+import csv
+import io
+import json
+
+import pytest
+from rich.console import Console
+
+from minisweagent.run.extra import stats
+from minisweagent.run.extra.stats import (
+    get_repo,
+    get_steps_bucket,
+    get_summary,
+    get_transitions,
+    load_entries,
+    main,
+    to_csv,
+)
+from tests.run.test_catalog import _write_traj
+
+
+@pytest.fixture
+def run_dir(tmp_path):
+    run = tmp_path / "run"
+    _write_traj(run / "django__django-1" / "django__django-1.traj.json", exit_status="Submitted", cost=0.5, n_steps=3)
+    _write_traj(run / "django__django-2" / "django__django-2.traj.json", exit_status="Submitted", cost=1.5, n_steps=7)
+    _write_traj(
+        run / "astropy__astropy-3" / "astropy__astropy-3.traj.json.gz",
+        exit_status="LimitsExceeded",
+        cost=2.0,
+        n_steps=60,
+    )
+    return run
+
+
+@pytest.fixture
+def other_run_dir(tmp_path):
+    run = tmp_path / "other"
+    _write_traj(
+        run / "django__django-1" / "django__django-1.traj.json", exit_status="LimitsExceeded", cost=3.0, n_steps=80
+    )
+    _write_traj(
+        run / "astropy__astropy-3" / "astropy__astropy-3.traj.json", exit_status="LimitsExceeded", cost=3.0, n_steps=80
+    )
+    return run
+
+
+def test_groups():
+    assert get_repo("django__django-12345") == "django/django"
+    assert get_repo("scikit-learn__scikit-learn-1") == "scikit-learn/scikit-learn"
+    assert get_repo("hello") == "-"
+    assert [get_steps_bucket(n) for n in [0, 4, 5, 99, 100, None]] == ["0-4", "0-4", "5-9", "50-99", "100+", "-"]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.parametrize("use_catalog", [True, False])
+def test_summary(run_dir, workers, use_catalog):
+    entries = load_entries(run_dir, workers=workers, use_catalog=use_catalog)
+    summary = get_summary(entries, ["exit_status", "repo", "steps", "model"])
+    assert summary["total"]["n"] == 3
+    assert summary["total"]["cost_total"] == pytest.approx(4.0)
+    assert list(summary["exit_status"]) == ["Submitted", "LimitsExceeded"]
+    assert summary["exit_status"]["Submitted"]["cost_mean"] == pytest.approx(1.0)
+    assert summary["exit_status"]["Submitted"]["share"] == pytest.approx(2 / 3)
+    assert summary["repo"]["django/django"]["steps_median"] == 5
+    assert summary["steps"]["50-99"]["n"] == 1
+    assert summary["model"]["test-model"]["submitted"] == pytest.approx(2 / 3)
+
+
+def test_compare(run_dir, other_run_dir):
+    entries = load_entries(run_dir, workers=1)
+    other_entries = load_entries(other_run_dir, workers=1)
+    transitions = get_transitions(entries, other_entries)
+    assert transitions == {("Submitted", "LimitsExceeded"): 1, ("LimitsExceeded", "LimitsExceeded"): 1}
+    rows = list(
+        csv.DictReader(
+            io.StringIO(to_csv(get_summary(entries, ["exit_status"]), get_summary(other_entries, ["exit_status"])))
+        )
+    )
+    assert [(row["group_by"], row["group"], row["n"], row["n_compare"]) for row in rows] == [
+        ("total", "all", "3", "2"),
+        ("exit_status", "Submitted", "2", ""),
+        ("exit_status", "LimitsExceeded", "1", "2"),
+    ]
+
+
+def test_main_outputs(run_dir, other_run_dir, tmp_path, capsys, monkeypatch):
+    monkeypatch.setattr(stats, "console", Console(width=200, highlight=False))
+    main(run_dir, compare=None, group_by="exit_status", output_format="table", output=None, workers=1, use_catalog=True)
+    assert "LimitsExceeded" in capsys.readouterr().out
+
+    output = tmp_path / "stats.json"
+    main(
+        run_dir,
+        compare=other_run_dir,
+        group_by="repo",
+        output_format="json",
+        output=output,
+        workers=1,
+        use_catalog=True,
+    )
+    data = json.loads(output.read_text())
+    assert data["summary"]["repo"]["django/django"]["n"] == 2
+    assert data["compare"]["summary"]["repo"]["django/django"]["n"] == 1
+    assert {"exit_status": "Submitted", "compare_exit_status": "LimitsExceeded", "n": 1} in data["transitions"]
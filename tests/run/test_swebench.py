@@ -493,3 +493,55 @@ def test_exception_handling_with_progress_manager(tmp_path):
 
             # on_uncaught_exception should not be called since exceptions are handled properly
             mock_progress_manager.on_uncaught_exception.assert_not_called()
+
+
+def test_process_instance_streams_trajectory(tmp_path):
+    from minisweagent.run.extra.swebench import process_instance
+    from minisweagent.run.extra.utils.batch_progress import RunBatchProgressManager
+    from minisweagent.run.utils.save import load_traj
+
+    config = {
+        "run": {"trajectory_format": "jsonl"},
+        "agent": {"step_limit": 0, "cost_limit": 0},
+        "environment": {"environment_class": "local", "cwd": str(tmp_path)},
+        "model": {
+            "model_class": "deterministic",
+            "model_name": "deterministic",
+            "outputs": ["Done\n```bash\necho COMPLETE_TASK_AND_SUBMIT_FINAL_OUTPUT\n```"],
+        },
+    }
+    instance = {"instance_id": "test__1", "problem_statement": "task", "image_name": "python:3.11-slim"}
+    process_instance(instance, tmp_path / "output", config, RunBatchProgressManager(1))
+    path = tmp_path / "output" / "test__1" / "test__1.traj.jsonl"
+    data = load_traj(path)
+    assert data["instance_id"] == "test__1"
+    assert data["info"]["exit_status"] == "Submitted"
+    assert data["messages"][-1]["role"] == "user"
+    assert not (tmp_path / "output" / "test__1" / "test__1.traj.json").exists()
+
+
+def test_process_instance_writes_instance_log(tmp_path):
+    from minisweagent.run.extra.swebench import process_instance
+    from minisweagent.run.extra.utils.batch_progress import RunBatchProgressManager
+    from minisweagent.utils.log import add_instance_file_handler, log_queue, remove_handler
+
+    config = {
+        "agent": {"step_limit": 0, "cost_limit": 0},
+        "environment": {"environment_class": "local", "cwd": str(tmp_path)},
+        "model": {
+            "model_class": "deterministic",
+            "model_name": "deterministic",
+            "outputs": ["Done\n```bash\necho COMPLETE_TASK_AND_SUBMIT_FINAL_OUTPUT\n```"],
+        },
+    }
+    instance = {"instance_id": "test__1", "problem_statement": "task", "image_name": "python:3.11-slim"}
+    handler = add_instance_file_handler(tmp_path / "output", json_lines=True)
+    try:
+        with log_queue():
+            process_instance(instance, tmp_path / "output", config, RunBatchProgressManager(1))
+    finally:
+        remove_handler(handler)
+    records = [json.loads(line) for line in (tmp_path / "output" / "test__1" / "test__1.log.jsonl").open()]
+    saved = [r for r in records if "Saved trajectory" in r["message"]]
+    assert saved and saved[0]["instance_id"] == "test__1"
+    assert saved[0]["step"] == 1
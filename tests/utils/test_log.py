@@ -0,0 +1,113 @@
+import json
+import logging
+import threading
+
+import pytest
+
+from minisweagent.utils.log import (
+    add_file_handler,
+    add_handler,
+    add_instance_file_handler,
+    flush_log_queue,
+    log_context,
+    log_queue,
+    remove_handler,
+    update_log_context,
+)
+
+logger = logging.getLogger("minisweagent.test_log")
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records: list[logging.LogRecord] = []
+        self.threads: set[str] = set()
+
+    def emit(self, record):
+        self.records.append(record)
+        self.threads.add(threading.current_thread().name)
+
+
+@pytest.fixture
+def sink():
+    handler = add_handler(_ListHandler())
+    yield handler
+    remove_handler(handler)
+
+
+def test_context_fields(sink):
+    with log_context(instance_id="a"):
+        update_log_context(step=3)
+        logger.info("in context")
+        logger.info("explicit", extra={"instance_id": "b"})
+    logger.info("outside")
+    assert [(r.instance_id, r.step) for r in sink.records] == [("a", 3), ("b", 3), (None, None)]
+
+
+def test_queue_writes_in_background_thread(sink):
+    with log_queue():
+        with log_context(instance_id="a"):
+            try:
+                raise ValueError("boom")
+            except ValueError:
+                logger.exception("failed %s", "here")
+        flush_log_queue()
+        assert len(sink.records) == 1
+    record = sink.records[0]
+    assert threading.current_thread().name not in sink.threads
+    assert record.getMessage() == "failed here"
+    assert record.instance_id == "a"
+    assert "ValueError: boom" in record.exc_text
+    logger.info("direct")
+    assert threading.current_thread().name in sink.threads
+
+
+def test_json_lines_and_instance_files(tmp_path):
+    run_log = add_file_handler(tmp_path / "run.log.jsonl", print_path=False, json_lines=True)
+    instance_logs = add_instance_file_handler(tmp_path, json_lines=True)
+    try:
+        with log_queue():
+
+            def work(instance_id: str):
+                with log_context(instance_id=instance_id):
+                    for step in range(1, 4):
+                        update_log_context(step=step)
+                        logger.info(f"step of {instance_id}")
+
+            threads = [threading.Thread(target=work, args=(f"inst-{i}",)) for i in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            logger.info("no instance")
+    finally:
+        remove_handler(run_log)
+        remove_handler(instance_logs)
+
+    records = [json.loads(line) for line in (tmp_path / "run.log.jsonl").read_text().splitlines()]
+    assert len(records) == 13
+    assert records[-1] | {"time": None} == {
+        "time": None,
+        "level": "INFO",
+        "logger": "minisweagent.test_log",
+        "message": "no instance",
+        "instance_id": None,
+        "step": None,
+    }
+    for i in range(4):
+        lines = (tmp_path / f"inst-{i}" / f"inst-{i}.log.jsonl").read_text().splitlines()
+        assert [(r["instance_id"], r["step"]) for r in map(json.loads, lines)] == [(f"inst-{i}", s) for s in (1, 2, 3)]
+
+
+def test_instance_files_are_reopened(tmp_path):
+    handler = add_instance_file_handler(tmp_path)
+    handler.max_open_files = 1  # type: ignore[attr-defined]
+    try:
+        for instance_id in ["a", "b", "a"]:
+            with log_context(instance_id=instance_id):
+                logger.info(f"message for {instance_id}")
+    finally:
+        remove_handler(handler)
+    assert (tmp_path / "a" / "a.log").read_text().count("message for a") == 2
+    assert "message for b" in (tmp_path / "b" / "b.log").read_text()